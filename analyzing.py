@@ -12,29 +12,182 @@ import json
 import os
 import ast
 import re
+import hashlib
+import tempfile
 from typing import Dict, List, Any, Tuple
 import math
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import networkx as nx
 
+# Bump whenever a detector changes its output so cached results are not reused
+ANALYZER_VERSION = "4"
+
+class ASTIndex:
+    """
+    Single-pass index over a parsed Python module.
+
+    The tree is visited once, breadth-first like ast.walk, and every node is
+    recorded by type together with its parent and its enclosing function and
+    class. All CodeAnalyzer detectors read from this index instead of parsing
+    or walking the tree again.
+
+    The visitor also tracks the dependency-graph scope of each node while it
+    descends: "Class.method" inside a method of a top-level class, or the
+    function name inside a top-level function.
+    """
+
+    def __init__(self, tree: ast.AST):
+        self.tree = tree
+        self.nodes_by_type: Dict[type, List[ast.AST]] = defaultdict(list)
+        self.position: Dict[ast.AST, int] = {}
+        self.parents: Dict[ast.AST, ast.AST] = {}
+        self.enclosing_function: Dict[ast.AST, ast.AST] = {}
+        self.enclosing_class: Dict[ast.AST, ast.ClassDef] = {}
+        self.caller_scope: Dict[ast.AST, str] = {}
+
+        queue = deque([tree])
+        while queue:
+            node = queue.popleft()
+            self.position[node] = len(self.position)
+            self.nodes_by_type[type(node)].append(node)
+
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                function = node
+            else:
+                function = self.enclosing_function.get(node)
+            class_node = node if isinstance(node, ast.ClassDef) else self.enclosing_class.get(node)
+            is_top_level_class = isinstance(node, ast.ClassDef) and self.parents.get(node) is tree
+            scope = self.caller_scope.get(node)
+
+            for child in ast.iter_child_nodes(node):
+                self.parents[child] = node
+                if function is not None:
+                    self.enclosing_function[child] = function
+                if class_node is not None:
+                    self.enclosing_class[child] = class_node
+
+                if isinstance(child, ast.FunctionDef) and node is tree:
+                    self.caller_scope[child] = child.name
+                elif isinstance(child, ast.FunctionDef) and is_top_level_class:
+                    self.caller_scope[child] = f"{node.name}.{child.name}"
+                elif scope is not None:
+                    self.caller_scope[child] = scope
+                queue.append(child)
+
+    def nodes(self, *node_types: type) -> List[ast.AST]:
+        """Return all nodes of the given types in ast.walk order."""
+        if len(node_types) == 1:
+            return self.nodes_by_type.get(node_types[0], [])
+        merged = [node for node_type in node_types for node in self.nodes_by_type.get(node_type, [])]
+        return sorted(merged, key=self.position.__getitem__)
+
+    def enclosing_functions(self, node: ast.AST):
+        """Yield every function enclosing node, innermost first."""
+        function = self.enclosing_function.get(node)
+        while function is not None:
+            yield function
+            function = self.enclosing_function.get(function)
+
+class AnalysisCache:
+    """
+    On-disk cache of CodeAnalyzer results keyed by source content.
+
+    Entries are stored as JSON files named after the SHA-256 of the analyzer
+    version and the source code. Reading an entry refreshes its modification
+    time, and the least recently used entries are evicted once the cache
+    directory grows beyond max_bytes.
+    """
+    
+    def __init__(self, cache_dir: str = None, max_bytes: int = 64 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.getenv("ANALYSIS_CACHE_DIR", os.path.join(".cache", "analysis"))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def _key(self, code: str) -> str:
+        return hashlib.sha256(f"{ANALYZER_VERSION}\0{code}".encode('utf-8')).hexdigest()
+    
+    def _path(self, code: str) -> str:
+        return os.path.join(self.cache_dir, f"{self._key(code)}.json")
+    
+    def get(self, code: str) -> Dict[str, Any]:
+        """Return the cached analysis results for code, or None on a miss."""
+        path = self._path(code)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return results
+    
+    def put(self, code: str, results: Dict[str, Any]) -> None:
+        """Store analysis results for code and evict old entries if needed."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(results, f)
+        os.replace(tmp_path, self._path(code))
+        self.evict()
+    
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+    
+    def stats(self) -> str:
+        """Return the hit/miss counters formatted for logging."""
+        return f"hits={self.hits}, misses={self.misses}"
+
 class CodeAnalyzer:
     """Analyzes Python code for algorithmic complexity, patterns, and architecture."""
     
-    def __init__(self):
+    def __init__(self, cache: AnalysisCache = None):
         self.complexity_results = {}
         self.dependencies = nx.DiGraph()
         self.algorithms = {}
         self.metrics = {}
+        self.index = None
+        self.cache = cache
         
     def analyze_file(self, file_path: str) -> Dict[str, Any]:
         """Perform comprehensive analysis on the provided Python file."""
         with open(file_path, 'r', encoding='utf-8') as f:
             code = f.read()
+        
+        if self.cache is not None:
+            cached = self.cache.get(code)
+            if cached is not None:
+                self.metrics = cached.get("metrics", {})
+                self.complexity_results = cached.get("complexity", {})
+                self.algorithms = cached.get("algorithms", {})
+                return cached
             
         try:
             tree = ast.parse(code)
             
+            # Index the tree once; every detector below reads from it
+            self.index = ASTIndex(tree)
+            
             # Extract basic metrics
-            self.metrics = self.extract_basic_metrics(code)
+            self.metrics = self.extract_basic_metrics(code, tree)
             
             # Analyze complexity
             self.complexity_results = self.analyze_complexity(tree)
@@ -49,7 +202,7 @@ class CodeAnalyzer:
             data_flow = self.analyze_data_flow(tree)
             
             # Assess code quality
-            code_quality = self.assess_code_quality(code)
+            code_quality = self.assess_code_quality(code, tree)
             
             # Combine all results
             analysis_results = {
@@ -61,13 +214,22 @@ class CodeAnalyzer:
                 "code_quality": code_quality
             }
             
+            if self.cache is not None:
+                self.cache.put(code, analysis_results)
+            
             return analysis_results
             
         except SyntaxError as e:
             print(f"Syntax error in the Python file: {e}")
             return {"error": str(e)}
     
-    def extract_basic_metrics(self, code: str) -> Dict[str, Any]:
+    def _get_index(self, tree: ast.AST) -> ASTIndex:
+        """Return the shared index for tree, building it if tree has not been indexed yet."""
+        if self.index is None or self.index.tree is not tree:
+            self.index = ASTIndex(tree)
+        return self.index
+    
+    def extract_basic_metrics(self, code: str, tree: ast.AST = None) -> Dict[str, Any]:
         """Extract basic code metrics like line count, character count, etc."""
         lines = code.splitlines()
         
@@ -78,9 +240,9 @@ class CodeAnalyzer:
         import_lines = len(re.findall(r'^(?:import|from)\s+\w+', code, re.MULTILINE))
         
         # Count classes and functions
-        tree = ast.parse(code)
-        classes = [node for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
-        functions = [node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
+        index = self._get_index(tree if tree is not None else ast.parse(code))
+        classes = index.nodes(ast.ClassDef)
+        functions = index.nodes(ast.FunctionDef)
         
         return {
             "total_lines": len(lines),
@@ -101,61 +263,67 @@ class CodeAnalyzer:
             "overall": {}
         }
         
+        index = self._get_index(tree)
+        
+        # Control flow statements count towards every function that encloses them
+        branches = defaultdict(int)
+        for node in index.nodes(ast.If, ast.For, ast.While, ast.Try):
+            for function in index.enclosing_functions(node):
+                branches[function] += 1
+        for node in index.nodes(ast.BoolOp):
+            if isinstance(node.op, (ast.And, ast.Or)):
+                for function in index.enclosing_functions(node):
+                    branches[function] += len(node.values) - 1
+        
         # Function complexity analysis
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                name = node.name
-                
-                # Calculate cyclomatic complexity
-                cyclomatic = 1  # Base complexity
-                
-                # Count control flow statements like if, for, while, etc.
-                for inner_node in ast.walk(node):
-                    if isinstance(inner_node, (ast.If, ast.For, ast.While, ast.Try)):
-                        cyclomatic += 1
-                    elif isinstance(inner_node, ast.BoolOp) and isinstance(inner_node.op, (ast.And, ast.Or)):
-                        cyclomatic += len(inner_node.values) - 1
-                
-                # Simple estimation of cognitive complexity
-                cognitive = cyclomatic * 1.5
-                
-                complexity_results["functions"][name] = {
-                    "cyclomatic": cyclomatic,
-                    "cognitive": cognitive,
-                    "lines": node.end_lineno - node.lineno if hasattr(node, 'end_lineno') else 1
-                }
+        for node in index.nodes(ast.FunctionDef):
+            name = node.name
+            
+            # Calculate cyclomatic complexity
+            cyclomatic = 1 + branches[node]  # Base complexity plus branches
+            
+            # Simple estimation of cognitive complexity
+            cognitive = cyclomatic * 1.5
+            
+            complexity_results["functions"][name] = {
+                "cyclomatic": cyclomatic,
+                "cognitive": cognitive,
+                "lines": node.end_lineno - node.lineno if hasattr(node, 'end_lineno') else 1
+            }
         
         # Class complexity analysis
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                name = node.name
-                methods = []
-                class_cyclomatic = 0
-                class_cognitive = 0
-                
-                for child in node.body:
-                    if isinstance(child, ast.FunctionDef):
-                        method_name = child.name
-                        if f"{method_name}" in complexity_results["functions"]:
-                            method_complexity = complexity_results["functions"][f"{method_name}"]
-                            methods.append({
-                                "name": method_name,
-                                "complexity": method_complexity
-                            })
-                            class_cyclomatic += method_complexity["cyclomatic"]
-                            class_cognitive += method_complexity["cognitive"]
-                
-                complexity_results["classes"][name] = {
-                    "methods": methods,
-                    "total_cyclomatic": class_cyclomatic,
-                    "total_cognitive": class_cognitive,
-                    "lines": node.end_lineno - node.lineno if hasattr(node, 'end_lineno') else 1
-                }
+        for node in index.nodes(ast.ClassDef):
+            name = node.name
+            methods = []
+            class_cyclomatic = 0
+            class_cognitive = 0
+            
+            for child in node.body:
+                if isinstance(child, ast.FunctionDef):
+                    method_name = child.name
+                    if f"{method_name}" in complexity_results["functions"]:
+                        method_complexity = complexity_results["functions"][f"{method_name}"]
+                        methods.append({
+                            "name": method_name,
+                            "complexity": method_complexity
+                        })
+                        class_cyclomatic += method_complexity["cyclomatic"]
+                        class_cognitive += method_complexity["cognitive"]
+            
+            complexity_results["classes"][name] = {
+                "methods": methods,
+                "attributes": [{"name": attribute} for attribute in self._class_attributes(node)],
+                "inherits_from": [base.id if isinstance(base, ast.Name) else base.attr
+                                  for base in node.bases if isinstance(base, (ast.Name, ast.Attribute))],
+                "total_cyclomatic": class_cyclomatic,
+                "total_cognitive": class_cognitive,
+                "lines": node.end_lineno - node.lineno if hasattr(node, 'end_lineno') else 1
+            }
         
         # Overall complexity
         total_cyclomatic = sum(func["cyclomatic"] for func in complexity_results["functions"].values())
         total_cognitive = sum(func["cognitive"] for func in complexity_results["functions"].values())
-        total_lines = sum(1 for _ in ast.walk(tree) if isinstance(_, (ast.Expr, ast.Assign, ast.AnnAssign)))
+        total_lines = len(index.nodes(ast.Expr, ast.Assign, ast.AnnAssign))
         
         complexity_results["overall"] = {
             "total_cyclomatic": total_cyclomatic,
@@ -167,14 +335,33 @@ class CodeAnalyzer:
         
         return complexity_results
     
+    @staticmethod
+    def _class_attributes(node: ast.ClassDef) -> List[str]:
+        """Names assigned in the class body and to self in __init__, in definition order."""
+        names = []
+        for child in node.body:
+            if isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                names.extend(target.id for target in targets if isinstance(target, ast.Name))
+            elif isinstance(child, ast.FunctionDef) and child.name == '__init__':
+                for statement in ast.walk(child):
+                    if isinstance(statement, (ast.Assign, ast.AnnAssign)):
+                        targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+                        names.extend(target.attr for target in targets
+                                     if isinstance(target, ast.Attribute) and
+                                     isinstance(target.value, ast.Name) and target.value.id == 'self')
+        return list(dict.fromkeys(names))
+    
     def analyze_dependencies(self, tree: ast.AST) -> None:
         """
         Build a dependency graph between classes and functions.
         """
+        index = self._get_index(tree)
+        
         # First pass: collect all defined names (classes and functions)
         defined_names = {}
         
-        for node in ast.walk(tree):
+        for node in index.nodes(ast.ClassDef, ast.FunctionDef):
             if isinstance(node, ast.ClassDef):
                 defined_names[node.name] = "class"
                 # Add class to dependency graph
@@ -194,39 +381,27 @@ class CodeAnalyzer:
                 self.dependencies.add_node(node.name, type="function")
         
         # Second pass: analyze dependencies
-        for node in ast.walk(tree):
-            # Check function calls
-            if isinstance(node, ast.Call):
-                caller = None
-                
-                # Find the caller context
-                for parent in ast.iter_child_nodes(tree):
-                    if isinstance(parent, ast.ClassDef):
-                        for method in parent.body:
-                            if isinstance(method, ast.FunctionDef) and node in list(ast.walk(method)):
-                                caller = f"{parent.name}.{method.name}"
-                                break
-                    elif isinstance(parent, ast.FunctionDef) and node in list(ast.walk(parent)):
-                        caller = parent.name
-                        break
-                
-                # Get the callee (function being called)
-                callee = None
-                if isinstance(node.func, ast.Name):
-                    callee = node.func.id
-                elif isinstance(node.func, ast.Attribute):
-                    if isinstance(node.func.value, ast.Name):
-                        # This could be a method call on an object
-                        obj_name = node.func.value.id
-                        method_name = node.func.attr
-                        if f"{obj_name}.{method_name}" in defined_names:
-                            callee = f"{obj_name}.{method_name}"
-                        else:
-                            # This might be an external library call
-                            callee = f"{obj_name}.{method_name}"
-                
-                if caller and callee and caller in self.dependencies and callee in self.dependencies:
-                    self.dependencies.add_edge(caller, callee)
+        for node in index.nodes(ast.Call):
+            # Find the caller context
+            caller = index.caller_scope.get(node)
+            
+            # Get the callee (function being called)
+            callee = None
+            if isinstance(node.func, ast.Name):
+                callee = node.func.id
+            elif isinstance(node.func, ast.Attribute):
+                if isinstance(node.func.value, ast.Name):
+                    # This could be a method call on an object
+                    obj_name = node.func.value.id
+                    method_name = node.func.attr
+                    if f"{obj_name}.{method_name}" in defined_names:
+                        callee = f"{obj_name}.{method_name}"
+                    else:
+                        # This might be an external library call
+                        callee = f"{obj_name}.{method_name}"
+            
+            if caller and callee and caller in self.dependencies and callee in self.dependencies:
+                self.dependencies.add_edge(caller, callee)
     
     def get_dependencies_as_dict(self) -> Dict[str, List[str]]:
         """Convert dependency graph to dictionary format."""
@@ -297,50 +472,52 @@ class CodeAnalyzer:
         has_observer = False
         has_singleton = False
         
+        index = self._get_index(tree)
+        classes = index.nodes(ast.ClassDef)
+        functions = index.nodes(ast.FunctionDef)
+        
         # Check for inheritance
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and node.bases:
+        for node in classes:
+            if node.bases:
                 has_inheritance = True
                 break
         
         # Check for composition (instances as class attributes)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                for child in node.body:
-                    if isinstance(child, ast.Assign):
-                        has_composition = True
-                        break
+        for node in classes:
+            for child in node.body:
+                if isinstance(child, ast.Assign):
+                    has_composition = True
+                    break
         
         # Simplistic check for factory pattern (create/get method that returns the class instance)
         factory_patterns = ["create", "factory", "build", "get_instance"]
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and any(pattern in node.name.lower() for pattern in factory_patterns):
+        for node in functions:
+            if any(pattern in node.name.lower() for pattern in factory_patterns):
                 has_factory = True
                 break
         
         # Check for observer pattern (subscribe/notify methods)
         observer_patterns = ["subscribe", "register", "notify", "update", "observer"]
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and any(pattern in node.name.lower() for pattern in observer_patterns):
+        for node in functions:
+            if any(pattern in node.name.lower() for pattern in observer_patterns):
                 has_observer = True
                 break
         
         # Check for singleton pattern (private constructor + getInstance method)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                has_private_init = False
-                has_get_instance = False
-                
-                for child in node.body:
-                    if isinstance(child, ast.FunctionDef):
-                        if child.name == "__init__" and any(d.name == "_" + node.name for d in child.decorator_list):
-                            has_private_init = True
-                        if "get_instance" in child.name.lower() or "instance" in child.name.lower():
-                            has_get_instance = True
-                
-                if has_private_init and has_get_instance:
-                    has_singleton = True
-                    break
+        for node in classes:
+            has_private_init = False
+            has_get_instance = False
+            
+            for child in node.body:
+                if isinstance(child, ast.FunctionDef):
+                    if child.name == "__init__" and any(d.name == "_" + node.name for d in child.decorator_list):
+                        has_private_init = True
+                    if "get_instance" in child.name.lower() or "instance" in child.name.lower():
+                        has_get_instance = True
+            
+            if has_private_init and has_get_instance:
+                has_singleton = True
+                break
         
         return {
             "inheritance": has_inheritance,
@@ -350,88 +527,6 @@ class CodeAnalyzer:
             "singleton": has_singleton
         }
     
-    # def analyze_data_flow(self, tree: ast.AST) -> Dict[str, Any]:
-    #     """
-    #     Analyze data flow through the code, identifying input/output relationships.
-    #     """
-    #     data_flow = {
-    #         "entry_points": [],
-    #         "exit_points": [],
-    #         "data_transformations": [],
-    #         "data_dependencies": []
-    #     }
-        
-    #     # Identify potential entry points (functions that take inputs)
-    #     for node in ast.walk(tree):
-    #         if isinstance(node, ast.FunctionDef) and node.args.args:
-    #             # Skip class methods with self as the only parameter
-    #             if (len(node.args.args) == 1 and 
-    #                 node.args.args[0].arg == 'self' and 
-    #                 any(isinstance(parent, ast.ClassDef) for parent in ast.walk(tree) if node in parent.body)):
-    #                 continue
-                
-    #             data_flow["entry_points"].append({
-    #                 "function": node.name,
-    #                 "parameters": [arg.arg for arg in node.args.args if arg.arg != 'self']
-    #             })
-        
-    #     # Identify potential exit points (return statements)
-    #     for node in ast.walk(tree):
-    #         if isinstance(node, ast.Return) and node.value:
-    #             # Find parent function
-    #             parent_func = None
-    #             for func_node in ast.walk(tree):
-    #                 if isinstance(func_node, ast.FunctionDef) and node in list(ast.walk(func_node)):
-    #                     parent_func = func_node.name
-    #                     break
-                
-    #             if parent_func:
-    #                 data_flow["exit_points"].append({
-    #                     "function": parent_func,
-    #                     "returns": self._get_return_type(node.value)
-    #                 })
-        
-    #     # Identify data transformations
-    #     for node in ast.walk(tree):
-    #         if isinstance(node, ast.Assign):
-    #             if isinstance(node.value, ast.Call):
-    #                 # This might be a function call that transforms data
-    #                 call_func = ""
-    #                 if isinstance(node.value.func, ast.Name):
-    #                     call_func = node.value.func.id
-    #                 elif isinstance(node.value.func, ast.Attribute):
-    #                     if isinstance(node.value.func.value, ast.Name):
-    #                         call_func = f"{node.value.func.value.id}.{node.value.func.attr}"
-                    
-    #                 # Skip common Python functions
-    #                 if call_func and call_func not in ['len', 'dict', 'list', 'set', 'tuple']:
-    #                     data_flow["data_transformations"].append({
-    #                         "function": call_func,
-    #                         "target": self._get_target_name(node.targets[0]),
-    #                         "source": [self._get_arg_name(arg) for arg in node.value.args if hasattr(arg, 'id')]
-    #                     })
-        
-    #     # Identify data dependencies
-    #     variables = {}
-    #     for node in ast.walk(tree):
-    #         if isinstance(node, ast.Assign):
-    #             target_name = self._get_target_name(node.targets[0])
-    #             if target_name:
-    #                 # Get all variable names used in the right side
-    #                 used_vars = []
-    #                 for sub_node in ast.walk(node.value):
-    #                     if isinstance(sub_node, ast.Name):
-    #                         used_vars.append(sub_node.id)
-                    
-    #                 if used_vars:
-    #                     variables[target_name] = used_vars
-    #                     data_flow["data_dependencies"].append({
-    #                         "variable": target_name,
-    #                         "depends_on": used_vars
-    #                     })
-        
-    #     return data_flow
-
     def analyze_data_flow(self, tree: ast.AST) -> Dict[str, Any]:
         """
         Analyze data flow through the code, identifying input/output relationships.
@@ -442,14 +537,15 @@ class CodeAnalyzer:
             "data_transformations": [],
             "data_dependencies": []
         }
+        index = self._get_index(tree)
 
         # Identify potential entry points (functions that take inputs)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef) and node.args.args:
+        for node in index.nodes(ast.FunctionDef):
+            if node.args.args:
                 # Skip class methods with self as the only parameter
                 if (len(node.args.args) == 1 and 
                     node.args.args[0].arg == 'self' and 
-                    any(isinstance(parent, ast.ClassDef) and hasattr(parent, 'body') and node in parent.body for parent in ast.walk(tree))):
+                    isinstance(index.parents.get(node), ast.ClassDef)):
                     continue
                 
                 data_flow["entry_points"].append({
@@ -458,14 +554,13 @@ class CodeAnalyzer:
                 })
 
         # Identify potential exit points (return statements)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Return) and node.value:
-                # Find parent function
+        for node in index.nodes(ast.Return):
+            if node.value:
+                # Attribute the return to its outermost enclosing function
                 parent_func = None
-                for func_node in ast.walk(tree):
-                    if isinstance(func_node, ast.FunctionDef) and node in list(ast.walk(func_node)):
+                for func_node in index.enclosing_functions(node):
+                    if isinstance(func_node, ast.FunctionDef):
                         parent_func = func_node.name
-                        break
 
                 if parent_func:
                     data_flow["exit_points"].append({
@@ -473,11 +568,40 @@ class CodeAnalyzer:
                         "returns": self._get_return_type(node.value)
                     })
 
-        # Other parts of data flow analysis...
+        # Identify data transformations and data dependencies in one pass over
+        # the assignments. Assignment values never contain other assignments,
+        # so walking each value visits every node at most once overall.
+        for node in index.nodes(ast.Assign):
+            if isinstance(node.value, ast.Call):
+                # This might be a function call that transforms data
+                call_func = ""
+                if isinstance(node.value.func, ast.Name):
+                    call_func = node.value.func.id
+                elif isinstance(node.value.func, ast.Attribute):
+                    if isinstance(node.value.func.value, ast.Name):
+                        call_func = f"{node.value.func.value.id}.{node.value.func.attr}"
+
+                # Skip common Python functions
+                if call_func and call_func not in ['len', 'dict', 'list', 'set', 'tuple']:
+                    data_flow["data_transformations"].append({
+                        "function": call_func,
+                        "target": self._get_target_name(node.targets[0]),
+                        "source": [self._get_arg_name(arg) for arg in node.value.args if hasattr(arg, 'id')]
+                    })
+
+            target_name = self._get_target_name(node.targets[0])
+            if target_name:
+                # Get all variable names used in the right side
+                used_vars = [sub_node.id for sub_node in ast.walk(node.value) if isinstance(sub_node, ast.Name)]
+
+                if used_vars:
+                    data_flow["data_dependencies"].append({
+                        "variable": target_name,
+                        "depends_on": used_vars
+                    })
         
         return data_flow
 
-    
     def _get_target_name(self, node: ast.AST) -> str:
         """Extract the name of an assignment target."""
         if isinstance(node, ast.Name):
@@ -509,23 +633,23 @@ class CodeAnalyzer:
             return "list"
         return "unknown"
     
-    def assess_code_quality(self, code: str) -> Dict[str, float]:
+    def assess_code_quality(self, code: str, tree: ast.AST = None) -> Dict[str, float]:
         """
         Assess the code quality based on various metrics.
         """
+        index = self._get_index(tree if tree is not None else ast.parse(code))
+        
         # Docstring coverage
-        tree = ast.parse(code)
         total_defs = 0
         with_docstring = 0
         
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Module)):
-                total_defs += 1
-                
-                # Check for docstring
-                docstring = ast.get_docstring(node)
-                if docstring:
-                    with_docstring += 1
+        for node in index.nodes(ast.FunctionDef, ast.ClassDef, ast.Module):
+            total_defs += 1
+            
+            # Check for docstring
+            docstring = ast.get_docstring(node)
+            if docstring:
+                with_docstring += 1
         
         docstring_coverage = with_docstring / total_defs if total_defs > 0 else 0
         
@@ -535,12 +659,12 @@ class CodeAnalyzer:
         pascal_case_pattern = re.compile(r'^[A-Z][a-zA-Z0-9]*$')
         
         names = []
-        for node in ast.walk(tree):
+        for node in index.nodes(ast.FunctionDef, ast.ClassDef, ast.Name):
             if isinstance(node, ast.FunctionDef):
                 names.append(("function", node.name))
             elif isinstance(node, ast.ClassDef):
                 names.append(("class", node.name))
-            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            elif isinstance(node.ctx, ast.Store):
                 names.append(("variable", node.id))
         
         # Count naming conventions
@@ -576,16 +700,15 @@ class CodeAnalyzer:
         
         # Average function length
         function_lines = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                if hasattr(node, 'end_lineno') and hasattr(node, 'lineno'):
-                    function_lines.append(node.end_lineno - node.lineno)
+        for node in index.nodes(ast.FunctionDef):
+            if hasattr(node, 'end_lineno') and hasattr(node, 'lineno'):
+                function_lines.append(node.end_lineno - node.lineno)
         
         avg_function_length = sum(function_lines) / len(function_lines) if function_lines else 0
         
         # Code complexity ratio (lines of code / number of functions)
         lines_of_code = len(code.splitlines())
-        function_count = len([node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)])
+        function_count = len(index.nodes(ast.FunctionDef))
         complexity_ratio = lines_of_code / function_count if function_count > 0 else lines_of_code
         
         # Calculate overall quality score
@@ -605,12 +728,172 @@ class CodeAnalyzer:
             "dominant_naming_convention": dominant_convention
         }
 
+class RepositorySummary:
+    """Accumulates repo-level aggregates from per-file analysis results."""
+    
+    QUALITY_KEYS = ["docstring_coverage", "naming_consistency", "average_function_length",
+                    "complexity_ratio", "overall_quality"]
+    
+    def __init__(self):
+        self.file_count = 0
+        self.failed_files = []
+        self.skipped_files = []
+        self.total_lines = 0
+        self.function_count = 0
+        self.class_count = 0
+        self.total_cyclomatic = 0
+        self.total_cognitive = 0
+        self.most_complex = []
+        self.dependency_types = defaultdict(int)
+        self.dependency_edges = 0
+        self.quality_sums = defaultdict(float)
+        self.weighted_quality = 0.0
+        self.naming_conventions = defaultdict(int)
+    
+    def add(self, rel_path: str, results: Dict[str, Any]) -> None:
+        """Fold the analysis results of one file into the aggregates."""
+        self.file_count += 1
+        if results.get("skipped"):
+            self.skipped_files.append({"file": rel_path, "error": results["error"]})
+            return
+        if "error" in results:
+            self.failed_files.append({"file": rel_path, "error": results["error"]})
+            return
+        
+        lines = results["metrics"]["total_lines"]
+        self.total_lines += lines
+        self.class_count += results["metrics"]["class_count"]
+        
+        complexity = results["complexity"]
+        self.function_count += len(complexity["functions"])
+        self.total_cyclomatic += complexity["overall"]["total_cyclomatic"]
+        self.total_cognitive += complexity["overall"]["total_cognitive"]
+        for name, info in complexity["functions"].items():
+            self.most_complex.append({"file": rel_path, "function": name, "cyclomatic": info["cyclomatic"]})
+        # Only the top entries are reported, so keep the list short while streaming
+        if len(self.most_complex) > 100:
+            self.most_complex = sorted(self.most_complex, key=lambda f: f["cyclomatic"], reverse=True)[:10]
+        
+        for info in results["dependencies"].values():
+            self.dependency_types[info["type"]] += 1
+            self.dependency_edges += len(info["depends_on"])
+        
+        quality = results["code_quality"]
+        for key in self.QUALITY_KEYS:
+            self.quality_sums[key] += quality[key]
+        self.weighted_quality += quality["overall_quality"] * lines
+        self.naming_conventions[quality["dominant_naming_convention"]] += 1
+    
+    def _mean_quality(self, key: str, analyzed: int) -> float:
+        """Average a per-file quality metric over the successfully analyzed files."""
+        return self.quality_sums[key] / analyzed if analyzed else 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the repo-level aggregates as a JSON-serializable dict."""
+        analyzed = self.file_count - len(self.failed_files) - len(self.skipped_files)
+        return {
+            "file_count": self.file_count,
+            "analyzed_files": analyzed,
+            "failed_files": self.failed_files,
+            "skipped_files": self.skipped_files,
+            "metrics": {
+                "total_lines": self.total_lines,
+                "class_count": self.class_count,
+                "function_count": self.function_count
+            },
+            "complexity": {
+                "total_cyclomatic": self.total_cyclomatic,
+                "total_cognitive": self.total_cognitive,
+                "average_cyclomatic": self.total_cyclomatic / self.function_count if self.function_count else 0,
+                "average_cognitive": self.total_cognitive / self.function_count if self.function_count else 0,
+                "most_complex_functions": sorted(self.most_complex, key=lambda f: f["cyclomatic"], reverse=True)[:10]
+            },
+            "dependencies": {
+                "node_types": dict(self.dependency_types),
+                "total_nodes": sum(self.dependency_types.values()),
+                "total_edges": self.dependency_edges
+            },
+            "code_quality": {
+                "docstring_coverage": self._mean_quality("docstring_coverage", analyzed),
+                "naming_consistency": self._mean_quality("naming_consistency", analyzed),
+                "average_function_length": self._mean_quality("average_function_length", analyzed),
+                "complexity_ratio": self._mean_quality("complexity_ratio", analyzed),
+                "overall_quality": self._mean_quality("overall_quality", analyzed),
+                "line_weighted_quality": self.weighted_quality / self.total_lines if self.total_lines else 0,
+                "naming_conventions": dict(self.naming_conventions)
+            }
+        }
+
+def _analyze_path(file_path: str) -> Dict[str, Any]:
+    """
+    Analyze one file in a worker process with a fresh analyzer.
+
+    Files that cannot be read or analyzed (undecodable, null bytes, nesting too deep
+    for the parser or the detectors) are reported as skipped instead of stopping the run.
+    """
+    try:
+        return CodeAnalyzer().analyze_file(file_path)
+    except (UnicodeDecodeError, OSError, ValueError, RecursionError) as e:
+        print(f"Skipping {file_path} due to error: {e}")
+        return {"error": f"{type(e).__name__}: {e}", "skipped": True}
+
+def collect_python_files(input_dir: str) -> List[str]:
+    """List the Python files under input_dir, skipping hidden and cache directories."""
+    python_files = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__')
+        for file in sorted(files):
+            if file.endswith('.py'):
+                python_files.append(os.path.join(root, file))
+    return python_files
+
+def analyze_directory(input_dir: str, output_file: str, jobs: int = None) -> Dict[str, Any]:
+    """
+    Analyze every Python file under input_dir on a process pool.
+
+    Per-file results are streamed into output_file as they arrive, followed by
+    repo-level aggregates for complexity, dependencies and quality.
+
+    Args:
+        input_dir: Repository directory to analyze
+        output_file: Path to save the merged analysis JSON
+        jobs: Number of worker processes (defaults to the CPU count)
+
+    Returns:
+        Repo-level summary dict
+    """
+    python_files = collect_python_files(input_dir)
+    jobs = jobs or os.cpu_count() or 1
+    # Batch several files per task so IPC overhead stays small on large repos
+    chunksize = max(1, len(python_files) // (jobs * 4))
+    summary = RepositorySummary()
+    
+    with open(output_file, 'w', encoding='utf-8') as f, ProcessPoolExecutor(max_workers=jobs) as executor:
+        f.write('{\n  "files": {')
+        for i, (file_path, results) in enumerate(zip(python_files, executor.map(_analyze_path, python_files, chunksize=chunksize))):
+            rel_path = os.path.relpath(file_path, input_dir)
+            summary.add(rel_path, results)
+            entry = json.dumps(results, indent=2).replace('\n', '\n    ')
+            f.write(f'{"," if i else ""}\n    {json.dumps(rel_path)}: {entry}')
+        repo_summary = summary.to_dict()
+        f.write('\n  },\n  "summary": ' + json.dumps(repo_summary, indent=2).replace('\n', '\n  ') + '\n}\n')
+    
+    return repo_summary
+
 def main():
     parser = argparse.ArgumentParser(description="Analyze Python code for research paper generation.")
-    parser.add_argument("--input_file", required=True, help="Path to the Python file to analyze")
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("--input_file", help="Path to the Python file to analyze")
+    input_group.add_argument("--input_dir", help="Path to a repository to analyze file by file")
     parser.add_argument("--output_file", required=True, help="Path to save analysis results JSON")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for --input_dir (default: CPU count)")
     args = parser.parse_args()
     
+    if args.input_dir:
+        repo_summary = analyze_directory(args.input_dir, args.output_file, args.jobs)
+        print(f"Analyzed {repo_summary['file_count']} files. Results saved to {args.output_file}")
+        return
+    
     analyzer = CodeAnalyzer()
     analysis_results = analyzer.analyze_file(args.input_file)
     
@@ -3,12 +3,13 @@ import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 from readmegen_gemini import generate_readme_from_code
+from llm_client import cached_generative_model
 
 # Load API key từ .env
 load_dotenv()
 GEMINI_API = os.getenv('GEMINI_API')
 genai.configure(api_key=GEMINI_API)
-model = genai.GenerativeModel("gemini-2.0-flash")
+model = cached_generative_model(genai.GenerativeModel("gemini-2.0-flash"))
 
 # Hàm tạo docstring
 def generate_docstring(code):
@@ -0,0 +1,287 @@
+"""
+Clone Pool for Repository Extraction
+
+Keeps one shared bare mirror per repository URL and hands out read-only
+worktrees per commit, so repeated documentation requests for the same
+repository cost a `git fetch` instead of a fresh clone.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from git import Repo
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a Git URL so different spellings of one repository share a mirror.
+
+    Args:
+        url: Git repository URL (https, ssh, scp-like or file).
+
+    Returns:
+        Normalized "host/owner/repo" style key source.
+    """
+    url = url.strip().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-4]
+    scp_match = re.match(r'^[\w.-]+@([^:/]+):(.+)$', url)
+    if scp_match:
+        host, path = scp_match.groups()
+    else:
+        match = re.match(r'^[a-zA-Z][\w+.-]*://(?:[^@/]+@)?([^/]*)(/.*)?$', url)
+        host, path = match.groups() if match else ('', url)
+    host = host.lower().split(':')[0]
+    # GitHub-style hosts treat owner and repository names case-insensitively
+    path = (path or '').strip('/')
+    if host:
+        path = path.lower()
+    return f"{host}/{path}" if host else path
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class ClonePool:
+    """
+    Managed pool of bare mirrors and per-commit worktrees.
+
+    Each normalized URL gets one bare, shallow mirror that is updated with
+    `git fetch`. Every checkout is a detached worktree named after the commit it
+    points to, so a worktree never changes once created and concurrent readers
+    of an older commit are not disturbed by updates. Whole repositories are
+    evicted least recently used first when the pool grows beyond max_bytes;
+    repositories with active leases (see lease) are never evicted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3, fetch_interval: float = 60,
+                 max_worktrees: int = 2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fetch_interval = fetch_interval
+        self.max_worktrees = max_worktrees
+        self.index_file = os.path.join(root, 'pool.json')
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._leases: Dict[str, int] = {}
+        os.makedirs(os.path.join(root, 'mirrors'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'worktrees'), exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_file, self.index_file)
+
+    def key(self, url: str) -> str:
+        """Return the directory-safe pool key for a repository URL."""
+        normalized = normalize_url(url)
+        slug = re.sub(r'[^\w.-]+', '__', normalized.split('/', 1)[-1])[-60:]
+        return f"{slug}-{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:10]}"
+
+    def mirror_path(self, key: str) -> str:
+        return os.path.join(self.root, 'mirrors', f'{key}.git')
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _update_mirror(self, url: str, key: str, refresh: bool = False) -> Repo:
+        """Clone the mirror on first use, otherwise fetch if the last fetch is stale."""
+        mirror_path = self.mirror_path(key)
+        with self._lock:
+            entry = dict(self.index.get(key, {}))
+
+        if not os.path.exists(mirror_path):
+            print(f"Cloning mirror of {url} to {mirror_path}...")
+            mirror = Repo.clone_from(url, mirror_path, bare=True, depth=1)
+            mirror.git.config('remote.origin.fetch', '+refs/heads/*:refs/heads/*')
+            entry = {"url": url, "last_fetch": time.time()}
+        else:
+            mirror = Repo(mirror_path)
+            if refresh or time.time() - entry.get("last_fetch", 0) >= self.fetch_interval:
+                print(f"Fetching updates for {url}...")
+                mirror.remotes.origin.fetch(depth=1, prune=True)
+                entry["last_fetch"] = time.time()
+                entry.pop("mirror_size", None)
+            else:
+                print(f"Using mirror of {url} fetched {time.time() - entry['last_fetch']:.0f}s ago.")
+
+        # Measured only when the mirror changed on disk, under the key lock but not the pool lock
+        if "mirror_size" not in entry:
+            entry["mirror_size"] = _directory_size(mirror_path)
+
+        with self._lock:
+            self.index[key] = {**self.index.get(key, {}), **entry, "url": url}
+        return mirror
+
+    def _add_worktree(self, mirror: Repo, key: str, commit: str) -> str:
+        worktree_dir = os.path.join(self.root, 'worktrees', key)
+        worktree_path = os.path.join(worktree_dir, commit[:12])
+        with self._lock:
+            sizes = dict(self.index[key].get("worktree_sizes", {}))
+            leased = self._leases.get(key, 0) > 0
+        if not os.path.exists(worktree_path):
+            os.makedirs(worktree_dir, exist_ok=True)
+            mirror.git.worktree('add', '--detach', worktree_path, commit)
+            sizes.pop(commit[:12], None)
+        if commit[:12] not in sizes:
+            sizes[commit[:12]] = _directory_size(worktree_path)
+
+        # Keep only the most recently used worktrees of this repository; while it is
+        # leased, older worktrees may still be read and are removed on a later checkout
+        os.utime(worktree_path)
+        if not leased:
+            worktrees = sorted(
+                (os.path.join(worktree_dir, name) for name in os.listdir(worktree_dir)),
+                key=os.path.getmtime, reverse=True
+            )
+            for old_path in worktrees[self.max_worktrees:]:
+                if old_path != worktree_path:
+                    mirror.git.worktree('remove', '--force', old_path)
+            mirror.git.worktree('prune')
+
+        with self._lock:
+            self.index[key]["worktree_sizes"] = {
+                name: size for name, size in sizes.items() if os.path.exists(os.path.join(worktree_dir, name))
+            }
+        return worktree_path
+
+    def _prepare(self, url: str, key: str, refresh: bool, worktree: bool) -> str:
+        """Update the mirror and optionally add a worktree; the caller holds the key lock."""
+        mirror = self._update_mirror(url, key, refresh)
+        if worktree:
+            path = self._add_worktree(mirror, key, mirror.head.commit.hexsha)
+        else:
+            path = self.mirror_path(key)
+        self._touch(key)
+        return path
+
+    def mirror(self, url: str, refresh: bool = False) -> str:
+        """
+        Return the path of an up-to-date bare mirror of a repository.
+
+        Args:
+            url: Git repository URL.
+            refresh: Fetch even if the mirror was fetched within fetch_interval.
+
+        Returns:
+            Path of the bare mirror, whose HEAD is the latest fetched commit.
+        """
+        key = self.key(url)
+        with self._key_lock(key):
+            return self._prepare(url, key, refresh, worktree=False)
+
+    def checkout(self, url: str, refresh: bool = False) -> str:
+        """
+        Return a worktree of the latest commit of a repository.
+
+        Args:
+            url: Git repository URL.
+            refresh: Fetch even if the mirror was fetched within fetch_interval.
+
+        Returns:
+            Path of a detached worktree at the mirror's current HEAD.
+        """
+        key = self.key(url)
+        with self._key_lock(key):
+            return self._prepare(url, key, refresh, worktree=True)
+
+    def acquire(self, url: str, refresh: bool = False, worktree: bool = False) -> str:
+        """
+        Like mirror (or checkout with worktree=True), and lease the repository.
+
+        A leased repository is not evicted and its worktrees are not removed until
+        every lease is returned with release.
+
+        Returns:
+            Path of the bare mirror, or of the worktree with worktree=True.
+        """
+        key = self.key(url)
+        with self._key_lock(key):
+            path = self._prepare(url, key, refresh, worktree)
+            with self._lock:
+                self._leases[key] = self._leases.get(key, 0) + 1
+        return path
+
+    def release(self, url: str) -> None:
+        """Return a lease taken with acquire."""
+        key = self.key(url)
+        with self._lock:
+            count = self._leases.get(key, 0) - 1
+            if count > 0:
+                self._leases[key] = count
+            else:
+                self._leases.pop(key, None)
+
+    @contextmanager
+    def lease(self, url: str, refresh: bool = False, worktree: bool = False) -> Iterator[str]:
+        """Lease a repository for the duration of a with block; see acquire."""
+        path = self.acquire(url, refresh, worktree)
+        try:
+            yield path
+        finally:
+            self.release(url)
+
+    def _touch(self, key: str) -> None:
+        """Record a use of a repository and evict others if over budget."""
+        with self._lock:
+            entry = self.index[key]
+            entry["last_used"] = time.time()
+            entry["size"] = entry.get("mirror_size", 0) + sum(entry.get("worktree_sizes", {}).values())
+            self._evict(keep=key)
+            self._save_index()
+
+    def remove(self, key: str) -> None:
+        """Delete a repository's mirror and worktrees from the pool."""
+        shutil.rmtree(os.path.join(self.root, 'worktrees', key), ignore_errors=True)
+        shutil.rmtree(self.mirror_path(key), ignore_errors=True)
+        self.index.pop(key, None)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Evict least recently used repositories until the pool fits in max_bytes."""
+        total = sum(entry.get("size", 0) for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if (key == keep or self._leases.get(key) or
+                    self._key_locks.get(key, threading.Lock()).locked()):
+                continue
+            total -= self.index[key].get("size", 0)
+            print(f"Evicting {self.index[key].get('url', key)} from clone pool")
+            self.remove(key)
+
+
+_pools: Dict[str, ClonePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_clone_pool(local_dirs: str = './repo') -> ClonePool:
+    """Return the process-wide clone pool stored under local_dirs."""
+    root = os.path.abspath(os.path.join(local_dirs, '.clone_pool'))
+    with _pools_lock:
+        if root not in _pools:
+            _pools[root] = ClonePool(root)
+        return _pools[root]
@@ -0,0 +1,134 @@
+"""
+Content-Addressed Cache for Rendered Diagrams
+
+Rendered images are stored under the hash of everything that determines their
+bytes (Mermaid source, format, scale and background), so re-rendering the same
+diagram in a later pipeline run is a file link instead of a browser render.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import uuid
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "diagrams")
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def diagram_key(code: str, fmt: str, scale: float = 1, background: str = "transparent") -> str:
+    """Return the cache key of a rendered diagram."""
+    payload = json.dumps([code, fmt, scale, background], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _place(source: str, target: str) -> None:
+    """Hard-link (or copy across file systems) source to target, replacing target atomically."""
+    root, ext = os.path.splitext(target)
+    temp_file = f"{root}.{uuid.uuid4().hex[:8]}.tmp{ext}"
+    try:
+        os.link(source, temp_file)
+    except OSError:
+        shutil.copyfile(source, temp_file)
+    try:
+        os.replace(temp_file, target)
+    except OSError:
+        os.unlink(temp_file)
+        raise
+
+
+class DiagramCache:
+    """
+    Directory of rendered diagrams named by content hash, evicted least recently used first.
+
+    Entries are never modified in place: renders and cache hits always replace the target
+    file, so an entry can safely be hard-linked into several figures/ directories.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root or os.getenv("DIAGRAM_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def fetch(self, key: str, fmt: str, output_file: str) -> bool:
+        """
+        Place a cached diagram at output_file.
+
+        Returns:
+            bool: True on a cache hit, False if the diagram has to be rendered.
+        """
+        entry = self.path(key, fmt)
+        try:
+            os.utime(entry)  # mtime marks the last use for eviction
+            _place(entry, output_file)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, fmt: str, rendered_file: str) -> None:
+        """Add a freshly rendered diagram to the cache and evict old entries if over budget."""
+        entry = self.path(key, fmt)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            _place(rendered_file, entry)
+        except OSError as e:
+            print(f"Could not cache diagram {rendered_file}: {e}")
+            return
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                continue
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_diagram_cache = None
+_diagram_cache_lock = threading.Lock()
+
+
+def get_diagram_cache() -> Optional[DiagramCache]:
+    """
+    Return the process-wide diagram cache, or None when DIAGRAM_CACHE_MODE is "off".
+
+    The directory comes from DIAGRAM_CACHE_DIR and the size cap from DIAGRAM_CACHE_MAX_MB.
+    """
+    global _diagram_cache
+    if os.getenv("DIAGRAM_CACHE_MODE", "on").lower() == "off":
+        return None
+    with _diagram_cache_lock:
+        if _diagram_cache is None:
+            max_bytes = int(float(os.getenv("DIAGRAM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 ** 2)) * 1024 ** 2)
+            _diagram_cache = DiagramCache(max_bytes=max_bytes)
+        return _diagram_cache
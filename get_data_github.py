@@ -1,233 +1,999 @@
 import os
 import ast
 import json
-from collections import defaultdict
-from git import Repo
-from typing import List, Dict, Set, Tuple
+import re
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from git import Blob, GitCommandError, Repo
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
 from pathlib import Path
+from clone_pool import get_clone_pool
 
-# Hàm chung để clone và thu thập file (đã có từ trước)
-def _clone_and_collect_files(url: str, local_dirs: str = './repo') -> Tuple[str, List[Dict]]:
+ALLOWED_EXTENSIONS = ['py', 'cpp', 'html', 'js']
+CONFIG_FILES = ['requirements.txt', 'package.json', '.env', 'Dockerfile', '.gitignore']
+
+# Directories that never hold source worth documenting
+IGNORED_DIRS = {
+    '.git', '.hg', '.svn', 'node_modules', 'bower_components', 'jspm_packages',
+    'venv', '.venv', 'virtualenv', 'site-packages', '__pycache__',
+    '.tox', '.nox', '.mypy_cache', '.pytest_cache', '.ruff_cache', '.ipynb_checkpoints',
+    'build', 'dist', 'target', '.next', '.nuxt', '.cache', 'vendor', 'third_party'
+}
+MAX_FILE_BYTES = 1024 * 1024
+MAX_LINE_LENGTH = 1000
+# Conventions code generators use to mark their output, matched on leading comment lines only
+GENERATED_MARKERS = [
+    re.compile(r'@generated\b'),
+    re.compile(r'^Code generated .* DO NOT EDIT\.$'),
+    re.compile(r'^(?:Generated|Auto-?generated|Autogenerated) by .*\bDO NOT EDIT\b'),
+]
+COMMENT_PREFIXES = ('#', '//', '/*', '*', '<!--')
+
+def _gitignore_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob (without leading/trailing slashes) to a regex."""
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            body = pattern[i + 1:end]
+            regex += '[' + ('^' + body[1:] if body.startswith('!') else body) + ']'
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+class IgnoreRules:
+    """Matches repository paths against the .gitignore files found while walking."""
+
+    def __init__(self):
+        self.rules = []
+
+    def add_file(self, gitignore_path: str, base: str) -> None:
+        """
+        Load the patterns of one .gitignore file.
+
+        Args:
+            gitignore_path (str): Path of the .gitignore file.
+            base (str): Directory of the file relative to the repository root ('' for the root).
+        """
+        content = _read_text(gitignore_path)
+        if content is not None:
+            self.add_patterns(content, base)
+
+    def add_patterns(self, content: str, base: str) -> None:
+        """Load the patterns of one .gitignore file from its content."""
+        for line in content.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            if line.startswith('\\'):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.strip('/') if dir_only else line
+            anchored = '/' in line
+            line = line.lstrip('/')
+            if not line:
+                continue
+            regex = _gitignore_to_regex(line)
+            if not anchored:
+                regex = '(?:.*/)?' + regex
+            self.rules.append((base, re.compile(f'^{regex}$'), negate, dir_only))
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Return whether rel_path (with '/' separators) is ignored; the last matching rule wins."""
+        ignored = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + '/'):
+                    continue
+                path = rel_path[len(base) + 1:]
+            else:
+                path = rel_path
+            if regex.match(path):
+                ignored = not negate
+        return ignored
+
+def _leading_comments(sample: str) -> Iterator[str]:
+    """Yield the text of the comment lines at the top of a file, up to the first code line."""
+    for line in sample.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        prefix = next((p for p in COMMENT_PREFIXES if line.startswith(p)), None)
+        if prefix is None:
+            return
+        comment = line[len(prefix):]
+        for suffix in ('*/', '-->'):
+            if comment.endswith(suffix):
+                comment = comment[:-len(suffix)]
+        yield comment.strip()
+
+def _generated_reason(data: bytes) -> Optional[str]:
+    """Return "generated" or "minified" based on the first bytes of a file."""
+    sample = data.decode('utf-8', errors='ignore')
+    if any(marker.search(comment) for comment in _leading_comments(sample) for marker in GENERATED_MARKERS):
+        return "generated"
+    if any(len(line) > MAX_LINE_LENGTH for line in sample.splitlines()):
+        return "minified"
+    return None
+
+def _dir_skip_reason(name: str, rel_dir: str, ignore_rules: IgnoreRules,
+                     is_virtualenv: Callable[[], bool]) -> Optional[str]:
+    """Return why a directory is pruned from ingestion, or None if it is walked."""
+    if name in IGNORED_DIRS:
+        return "ignored directory"
+    if is_virtualenv():
+        return "virtualenv"
+    if ignore_rules.ignored(rel_dir, is_dir=True):
+        return "matched .gitignore"
+    return None
+
+def _file_skip_reason(name: str, git_path: str, ignore_rules: IgnoreRules, size: Callable[[], int],
+                      head: Callable[[], bytes], max_file_bytes: int = MAX_FILE_BYTES) -> Optional[str]:
     """
-    Clone a repository and collect file information.
+    Return why a collectable file is skipped, or None if it is ingested.
 
     Args:
-        url (str): Git repository URL.
-        local_dirs (str): Directory to store the repo.
+        name (str): File name.
+        git_path (str): Path relative to the repository root, with '/' separators.
+        ignore_rules (IgnoreRules): Rules of the .gitignore files above the file.
+        size (Callable[[], int]): Returns the file size.
+        head (Callable[[], bytes]): Returns the first bytes of the file.
+        max_file_bytes (int): Size cap for a single file.
+    """
+    if ignore_rules.ignored(git_path, is_dir=False):
+        return "matched .gitignore"
+    if size() > max_file_bytes:
+        return f"larger than {max_file_bytes} bytes"
+    if name.split('.')[-1].lower() in ALLOWED_EXTENSIONS:
+        return "minified" if '.min.' in name else _generated_reason(head())
+    return None
 
-    Returns:
-        Tuple[str, List[Dict]]: Local path and list of file metadata.
+def _blob_skip_reason(blob: Blob, ignore_rules: IgnoreRules,
+                      max_file_bytes: int = MAX_FILE_BYTES) -> Optional[str]:
+    """Return why a collectable blob is skipped, or None; _file_skip_reason for the object database."""
+    if blob.mode == Blob.link_mode:
+        return "symlink"
+    return _file_skip_reason(blob.name, blob.path, ignore_rules, lambda: blob.size,
+                             lambda: blob.data_stream.read(8192), max_file_bytes)
+
+def _gitignore_patterns(tree) -> Optional[str]:
+    """Return the content of a tree's .gitignore, ignoring symlinks, or None if it has none."""
+    blob = next((b for b in tree.blobs if b.name == '.gitignore' and b.mode != Blob.link_mode), None)
+    return None if blob is None else blob.data_stream.read().decode('utf-8', errors='ignore')
+
+def _read_head(file_path: str, size: int = 8192) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read(size)
+
+def _read_text(file_path: str) -> Optional[str]:
+    """Read a UTF-8 file, returning None (and reporting why) if it cannot be decoded."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except (UnicodeDecodeError, IOError) as e:
+        print(f"Skipping {file_path} due to error: {e}")
+        return None
+
+class FileRecord:
     """
-    repo_name = url.split('/')[-1].split('.')[0]
-    local_path = os.path.join(local_dirs, repo_name)
+    Metadata for one collected file; the content is only read when requested.
 
-    if not os.path.exists(local_path):
-        print(f"Cloning repository from {url} to {local_path}...")
-        Repo.clone_from(url, local_path, depth=1)
-    else:
-        print(f"Repository already exists at {local_path}, skipping clone.")
+    Records from a checkout read `path` from disk. Records from the git object
+    database carry the blob instead, and `path` is the "<commit>:<path>" object name.
+    """
+
+    __slots__ = ("path", "rel_path", "extension", "blob")
 
-    allowed_extensions = ['py', 'cpp', 'html', 'js']
-    file_metadata = []
+    def __init__(self, path: str, rel_path: str, extension: str, blob: Optional[Blob] = None):
+        self.path = path
+        self.rel_path = rel_path
+        self.extension = extension
+        self.blob = blob
+
+    def read(self) -> Optional[str]:
+        """Read the file content, or None if it is not valid UTF-8."""
+        if self.blob is None:
+            return _read_text(self.path)
+        try:
+            content = self.blob.data_stream.read().decode('utf-8')
+        except UnicodeDecodeError as e:
+            print(f"Skipping {self.path} due to error: {e}")
+            return None
+        # Match the universal newline translation of reading a checkout in text mode
+        return content.replace('\r\n', '\n').replace('\r', '\n')
+
+def _iter_files(local_path: str, skipped: Optional[List[Dict]] = None,
+                max_file_bytes: int = MAX_FILE_BYTES) -> Iterator[FileRecord]:
+    """
+    Lazily walk a checkout and yield a record for every collectable file.
+
+    Directories on the IGNORED_DIRS deny list, virtualenvs and paths matched by the
+    repository's .gitignore files are pruned without being descended into. Source files
+    larger than max_file_bytes or that look minified or generated are skipped before
+    their content is decoded.
+
+    Args:
+        local_path (str): Path of the checkout.
+        skipped (Optional[List[Dict]]): If given, receives a {"path", "reason"} entry
+            for every pruned directory and skipped file.
+        max_file_bytes (int): Size cap for a single file.
+
+    Yields:
+        FileRecord: Metadata of each matching file, in os.walk order.
+    """
+    skipped = skipped if skipped is not None else []
+    ignore_rules = IgnoreRules()
+
+    for root, dirs, files in os.walk(local_path):
+        rel_root = os.path.relpath(root, local_path).replace(os.sep, '/')
+        rel_root = '' if rel_root == '.' else rel_root
+        if '.gitignore' in files:
+            ignore_rules.add_file(os.path.join(root, '.gitignore'), rel_root)
+
+        kept_dirs = []
+        for d in dirs:
+            rel_dir = f'{rel_root}/{d}' if rel_root else d
+            reason = _dir_skip_reason(d, rel_dir, ignore_rules,
+                                      lambda: os.path.exists(os.path.join(root, d, 'pyvenv.cfg')))
+            if reason:
+                skipped.append({"path": rel_dir, "reason": reason})
+            else:
+                kept_dirs.append(d)
+        dirs[:] = kept_dirs
 
-    for root, _, files in os.walk(local_path):
         for file in files:
             ext = file.split('.')[-1].lower()
-            if ext in allowed_extensions or file in ['requirements.txt', 'package.json', '.env', 'Dockerfile', '.gitignore']:
+            if ext in ALLOWED_EXTENSIONS or file in CONFIG_FILES:
                 file_path = os.path.join(root, file)
                 rel_path = os.path.relpath(file_path, local_path)
+                git_path = f'{rel_root}/{file}' if rel_root else file
+
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except (UnicodeDecodeError, IOError) as e:
-                    print(f"Skipping {file_path} due to error: {e}")
+                    reason = _file_skip_reason(file, git_path, ignore_rules, lambda: os.path.getsize(file_path),
+                                               lambda: _read_head(file_path), max_file_bytes)
+                except OSError as e:
+                    # e.g. a dangling symlink: skip the file, not the whole walk
+                    reason = f"unreadable: {e.strerror or e}"
+                if reason:
+                    skipped.append({"path": rel_path, "reason": reason})
+                    continue
+
+                yield FileRecord(
+                    path=file_path,
+                    rel_path=rel_path,
+                    extension=ext if ext in ALLOWED_EXTENSIONS else file
+                )
+
+def _iter_blobs(repo: Repo, commit: str = 'HEAD', skipped: Optional[List[Dict]] = None,
+                max_file_bytes: int = MAX_FILE_BYTES) -> Iterator[FileRecord]:
+    """
+    Lazily list the tree of a commit and yield a record for every collectable file.
+
+    Applies the same pruning as _iter_files, but reads the tree entries and blobs straight
+    from the object database, so no working tree is needed. Sizes come from the object
+    headers; only the first bytes of source files are read to detect generated files.
+
+    Args:
+        repo (Repo): Repository (bare or not) holding the commit.
+        commit (str): Commit to list.
+        skipped (Optional[List[Dict]]): If given, receives a {"path", "reason"} entry
+            for every pruned directory and skipped file.
+        max_file_bytes (int): Size cap for a single file.
+
+    Yields:
+        FileRecord: Records with blobs attached, directory by directory in tree order.
+    """
+    skipped = skipped if skipped is not None else []
+    ignore_rules = IgnoreRules()
+    commit_sha = repo.commit(commit).hexsha
+
+    def walk(tree, rel_root: str) -> Iterator[FileRecord]:
+        patterns = _gitignore_patterns(tree)
+        if patterns is not None:
+            ignore_rules.add_patterns(patterns, rel_root)
+
+        kept_trees = []
+        for subtree in tree.trees:
+            reason = _dir_skip_reason(subtree.name, subtree.path, ignore_rules,
+                                      lambda: any(blob.name == 'pyvenv.cfg' for blob in subtree.blobs))
+            if reason:
+                skipped.append({"path": subtree.path, "reason": reason})
+            else:
+                kept_trees.append(subtree)
+
+        for blob in tree.blobs:
+            ext = blob.name.split('.')[-1].lower()
+            if ext in ALLOWED_EXTENSIONS or blob.name in CONFIG_FILES:
+                rel_path = os.path.join(*blob.path.split('/'))
+                reason = _blob_skip_reason(blob, ignore_rules, max_file_bytes)
+                if reason:
+                    skipped.append({"path": rel_path, "reason": reason})
                     continue
 
-                file_metadata.append({
-                    "path": file_path,
-                    "rel_path": rel_path,
-                    "extension": ext if ext in allowed_extensions else file,
-                    "content": content
-                })
+                yield FileRecord(
+                    path=f'{commit_sha}:{blob.path}',
+                    rel_path=rel_path,
+                    extension=ext if ext in ALLOWED_EXTENSIONS else blob.name,
+                    blob=blob
+                )
+
+        for subtree in kept_trees:
+            yield from walk(subtree, subtree.path)
+
+    yield from walk(repo.commit(commit_sha).tree, '')
+
+def _filter_blobs(repo: Repo, commit: str, git_paths: List[str], skipped: Optional[List[Dict]] = None,
+                  max_file_bytes: int = MAX_FILE_BYTES) -> Iterator[FileRecord]:
+    """
+    Yield records for the given paths of a commit that full ingestion would collect.
+
+    Applies the same directory and blob checks as _iter_blobs (including dropping
+    symlinks), but only descends along the given paths, loading each .gitignore on the
+    way once.
+
+    Args:
+        repo (Repo): Repository holding the commit.
+        commit (str): Commit SHA.
+        git_paths (List[str]): Paths relative to the repository root, with '/' separators.
+        skipped (Optional[List[Dict]]): If given, receives a {"path", "reason"} entry per skipped path.
+        max_file_bytes (int): Size cap for a single file.
+
+    Yields:
+        FileRecord: Records with blobs attached, in the order of git_paths.
+    """
+    skipped = skipped if skipped is not None else []
+    ignore_rules = IgnoreRules()
+    root = repo.commit(commit).tree
+    loaded, dir_reasons = set(), {}
+
+    def load_gitignore(tree, rel_dir: str) -> None:
+        if rel_dir not in loaded:
+            loaded.add(rel_dir)
+            patterns = _gitignore_patterns(tree)
+            if patterns is not None:
+                ignore_rules.add_patterns(patterns, rel_dir)
+
+    for git_path in git_paths:
+        parts = git_path.split('/')
+        name = parts[-1]
+        if not (name.split('.')[-1].lower() in ALLOWED_EXTENSIONS or name in CONFIG_FILES):
+            continue
+        rel_path = os.path.join(*parts)
+        tree, rel_dir, reason = root, '', None
+        try:
+            load_gitignore(tree, '')
+            for part in parts[:-1]:
+                subtree = tree / part
+                rel_dir = f'{rel_dir}/{part}' if rel_dir else part
+                if subtree.type != 'tree':
+                    reason = "symlink"  # a symlinked directory, which _iter_blobs does not descend into
+                    break
+                if rel_dir not in dir_reasons:
+                    dir_reasons[rel_dir] = _dir_skip_reason(
+                        part, rel_dir, ignore_rules, lambda: any(b.name == 'pyvenv.cfg' for b in subtree.blobs))
+                reason = dir_reasons[rel_dir]
+                if reason:
+                    break
+                tree = subtree
+                load_gitignore(tree, rel_dir)
+            if reason is None:
+                blob = tree / name
+                reason = _blob_skip_reason(blob, ignore_rules, max_file_bytes)
+        except KeyError:
+            reason = "not in commit"
+        if reason:
+            skipped.append({"path": rel_path, "reason": reason})
+            continue
+        ext = name.split('.')[-1].lower()
+        yield FileRecord(
+            path=f'{commit}:{git_path}',
+            rel_path=rel_path,
+            extension=ext if ext in ALLOWED_EXTENSIONS else name,
+            blob=blob
+        )
+
+def _clone_repo(url: str, local_dirs: str = './repo', refresh: bool = False) -> str:
+    """Return a checkout of the latest commit from the clone pool under local_dirs."""
+    return get_clone_pool(local_dirs).checkout(url, refresh=refresh)
+
+# Hàm chung để clone và thu thập file (đã có từ trước)
+def _clone_and_collect_files(url: str, local_dirs: str = './repo') -> Tuple[str, Iterator[FileRecord]]:
+    """
+    Clone a repository and collect file information.
+
+    Args:
+        url (str): Git repository URL.
+        local_dirs (str): Directory to store the repo.
+
+    Returns:
+        Tuple[str, Iterator[FileRecord]]: Local path and a lazy stream of file records.
+    """
+    local_path = _clone_repo(url, local_dirs)
+    return local_path, _iter_files(local_path)
+
+# "objects" reads blobs from the mirror's object database, "checkout" walks a worktree
+INGEST_BACKEND = 'objects'
+
+class RepoSnapshot:
+    """
+    In-memory view of one repository at one commit.
+
+    The file list is collected once when the snapshot is built, either from the commit's
+    tree in the object database or from a checkout. File contents are read on demand and
+    not kept, so a snapshot of a large repository stays small; Python files are parsed at
+    most once, on first use, and the trees are shared by every extractor served from the
+    snapshot.
+    """
+
+    def __init__(self, url: str, local_path: str, commit: str, backend: str = 'checkout'):
+        self.url = url
+        self.local_path = local_path
+        self.commit = commit
+        self.skipped = []
+        if backend == 'objects':
+            self.files = list(_iter_blobs(Repo(local_path), commit, self.skipped))
+        else:
+            self.files = list(_iter_files(local_path, self.skipped))
+        self.parse_errors = {}
+        self._unreadable = set()
+        self._trees = {}
+        # GitPython reads blobs through one persistent `git cat-file` pipe per Repo,
+        # which is not thread-safe, so blob reads of a snapshot are serialized
+        self._blob_lock = threading.Lock()
+        self._class_summaries = None
+        self._lock = threading.RLock()
+
+    def read(self, file: FileRecord) -> Optional[str]:
+        """Return the content of a file, or None if it is not valid UTF-8."""
+        if file.blob is None:
+            content = file.read()
+        else:
+            with self._blob_lock:
+                content = file.read()
+        if content is None:
+            with self._lock:
+                if file.rel_path not in self._unreadable:
+                    self._unreadable.add(file.rel_path)
+                    self.skipped.append({"path": file.rel_path, "reason": "not valid UTF-8"})
+        return content
+
+    def parse(self, file: FileRecord) -> Optional[ast.AST]:
+        """Return the parsed tree of a Python file, or None if it cannot be read or parsed."""
+        with self._lock:
+            if file.rel_path not in self._trees:
+                content = self.read(file)
+                tree = None
+                if content is not None:
+                    try:
+                        tree = ast.parse(content, filename=file.rel_path)
+                    except SyntaxError as e:
+                        self.parse_errors[file.rel_path] = e
+                self._trees[file.rel_path] = tree
+            return self._trees[file.rel_path]
+
+    def python_files(self) -> List[FileRecord]:
+        return [file for file in self.files if file.extension == 'py']
+
+    def class_summaries(self, workers: int = 1) -> List[Dict]:
+        """
+        Return the per-file class summaries of every parsable Python file.
+
+        Args:
+            workers (int): Number of worker processes; with more than one, file contents
+                are parsed and summarized on a process pool instead of from cached trees.
+
+        Returns:
+            List[Dict]: Output of _summarize_classes for each file, in walk order.
+        """
+        with self._lock:
+            if self._class_summaries is None:
+                python_files = self.python_files()
+                if workers > 1:
+                    summaries = _map(_summarize_source, [self.read(file) for file in python_files],
+                                     [file.rel_path for file in python_files], workers=workers)
+                else:
+                    summaries = []
+                    for file in python_files:
+                        tree = self.parse(file)
+                        if tree is None:
+                            if file.rel_path in self.parse_errors:
+                                print(f"Skipping {file.rel_path} due to error: {self.parse_errors[file.rel_path]}")
+                            summaries.append(None)
+                        else:
+                            summaries.append(_summarize_classes(tree))
+                self._class_summaries = [summary for summary in summaries if summary is not None]
+            return self._class_summaries
+
+MAX_SNAPSHOTS = 4
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+_snapshot_builds: Dict[Tuple, threading.Lock] = {}
+
+def _cached_snapshot(key: Tuple, build: Callable[[], RepoSnapshot]) -> Tuple[RepoSnapshot, bool]:
+    """Return the cached snapshot for key, building it if needed, and whether it was built."""
+    # The global lock only guards the lookup and insert; a snapshot is built under its
+    # own lock, so callers asking for the same commit wait for one build while other
+    # repositories are served meanwhile
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+            return snapshot, False
+        build_lock = _snapshot_builds.setdefault(key, threading.Lock())
 
-    return local_path, file_metadata
+    with build_lock:
+        with _snapshots_lock:
+            snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            return snapshot, False
+        try:
+            snapshot = build()
+            with _snapshots_lock:
+                _snapshots[key] = snapshot
+                while len(_snapshots) > MAX_SNAPSHOTS:
+                    _snapshots.popitem(last=False)
+        finally:
+            with _snapshots_lock:
+                _snapshot_builds.pop(key, None)
+        return snapshot, True
+
+def get_snapshot(url: str, local_dirs: str = './repo', backend: str = INGEST_BACKEND) -> RepoSnapshot:
+    """
+    Return the shared snapshot for a repository URL at its current commit.
+
+    The repository comes from the clone pool, read either from its mirror's object
+    database or from a worktree depending on backend. Snapshots are cached per URL,
+    repository path and commit, keeping the most recently used MAX_SNAPSHOTS in memory.
+    Each snapshot holds a clone pool lease until it is dropped from the cache and no
+    longer referenced, so its files are not evicted while it can still read them.
+
+    Args:
+        url (str): Git repository URL.
+        local_dirs (str): Directory to store the repo.
+        backend (str): "objects" or "checkout".
+
+    Returns:
+        RepoSnapshot: Snapshot serving all extract functions for this repository.
+    """
+    # The clone pool locks per repository, so different URLs are fetched concurrently
+    pool = get_clone_pool(local_dirs)
+    local_path = pool.acquire(url, worktree=backend != 'objects')
+    try:
+        commit = Repo(local_path).head.commit.hexsha
+        key = (url, os.path.abspath(local_path), commit)
+        snapshot, built = _cached_snapshot(key, lambda: RepoSnapshot(url, local_path, commit, backend))
+    except BaseException:
+        pool.release(url)
+        raise
+
+    if built:
+        weakref.finalize(snapshot, pool.release, url)
+    else:
+        pool.release(url)
+    return snapshot
+
+def _save_artifact(output_dir: Optional[str], filename: str, data, description: str) -> None:
+    """
+    Persist an extractor result into output_dir; nothing is written when output_dir is None.
+
+    Args:
+        output_dir (Optional[str]): Per-job artifact directory.
+        filename (str): Artifact file name.
+        data: Text written as is, or any other value written as indented JSON.
+        description (str): What the artifact holds, used in the log message.
+    """
+    if output_dir is None:
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, filename)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        if isinstance(data, str):
+            f.write(data)
+        else:
+            json.dump(data, f, indent=2)
+    print(f"{description} saved to {output_file}")
 
 # Hàm get_repo_data (giữ nguyên từ code trước)
-def get_repo_data(url: str, local_dirs: str = './repo') -> str:
+def get_repo_data(url: str, local_dirs: str = './repo', output_dir: Optional[str] = None) -> str:
     """
     Collect all code content from a repository.
 
     Args:
         url (str): Git repository URL.
         local_dirs (str): Directory to store the repo.
+        output_dir (Optional[str]): If given, code.txt is also written to this directory.
 
     Returns:
         str: Concatenated code content with file markers.
     """
-    local_path, file_metadata = _clone_and_collect_files(url, local_dirs)
+    snapshot = get_snapshot(url, local_dirs)
 
-    content = ""
-    for file in file_metadata:
-        content += f'BEGINFILE {file["rel_path"]}\n{file["content"]}ENDFILE\n'
+    output = None
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, 'code.txt')
+        output = open(output_file, 'w', encoding='utf-8')
 
-    output_file = os.path.join(local_dirs, 'code.txt')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(content)
-    print(f"Code content saved to {output_file}")
+    # code.txt is written file by file instead of from the joined string
+    parts = []
+    try:
+        for file in snapshot.files:
+            content = snapshot.read(file)
+            if content is None:
+                continue
+            part = f'BEGINFILE {file.rel_path}\n{content}ENDFILE\n'
+            if output is not None:
+                output.write(part)
+            parts.append(part)
+    finally:
+        if output is not None:
+            output.close()
+    if output is not None:
+        print(f"Code content saved to {output_file}")
+    return ''.join(parts)
+
+def _summarize_classes(tree: ast.AST) -> Dict:
+    """
+    Summarize the classes of one parsed Python file independently of other files.
+
+    Args:
+        tree (ast.AST): Parsed module.
+
+    Returns:
+        Dict: Defined class names, names imported with `from ... import`, and per-class
+        details with the candidate names each class references.
+    """
+    class_names = []
+    imported = []
+    classes = []
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            class_names.append(node.name)
+            inherits = [base.id for base in node.bases if isinstance(base, ast.Name)]
+            methods = []
+            attributes = set()
+            references = {}
+
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef):
+                    methods.append(item.name)
+
+                    for arg in ast.walk(item):
+                        if isinstance(arg, ast.Name):
+                            references[arg.id] = None
+
+                if isinstance(item, ast.FunctionDef) and item.name == '__init__':
+                    for stmt in item.body:
+                        if isinstance(stmt, ast.Assign):
+                            for target in stmt.targets:
+                                if (isinstance(target, ast.Attribute) and
+                                    isinstance(target.value, ast.Name) and
+                                    target.value.id == 'self'):
+                                    attributes.add(target.attr)
+
+                                    if isinstance(stmt.value, ast.Call):
+                                        func = stmt.value.func
+                                        if isinstance(func, ast.Name):
+                                            references[func.id] = None
+                                        elif isinstance(func, ast.Attribute):
+                                            references[func.attr] = None
+
+            classes.append({
+                "name": node.name,
+                "inherits": inherits,
+                "attributes": list(attributes),
+                "methods": methods,
+                "references": list(references)
+            })
+        elif isinstance(node, ast.ImportFrom):
+            for name in node.names:
+                if name.name not in imported:
+                    imported.append(name.name)
+
+    return {"class_names": class_names, "imported": imported, "classes": classes}
+
+def _summarize_source(content: Optional[str], rel_path: str) -> Optional[Dict]:
+    """
+    Parse one Python file once and summarize its classes.
+
+    Args:
+        content (Optional[str]): File content, or None if it could not be read.
+        rel_path (str): Path relative to the repository root, used in messages.
+
+    Returns:
+        Optional[Dict]: Output of _summarize_classes, or None if the file cannot be read or parsed.
+    """
+    if content is None:
+        return None
+    try:
+        tree = ast.parse(content, filename=rel_path)
+    except SyntaxError as e:
+        print(f"Skipping {rel_path} due to error: {e}")
+        return None
+    return _summarize_classes(tree)
+
+def _map(func, *iterables, workers: int = 1) -> List:
+    """Map func over iterables in order, on a process pool when workers > 1."""
+    if workers <= 1:
+        return list(map(func, *iterables))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, *iterables, chunksize=16))
+
+def _resolve_classes(summary: Dict, class_names: Set[str]) -> List[Dict]:
+    """
+    Turn a per-file class summary into class_list entries against the repo-wide class names.
+
+    Args:
+        summary (Dict): Output of _summarize_classes for one file.
+        class_names (Set[str]): Names of every class defined in the repository.
 
-    return content
+    Returns:
+        List[Dict]: Class details with resolved dependencies.
+    """
+    resolved = []
+    for cls in summary["classes"]:
+        dependencies = {name for name in cls["references"] if name in class_names}
+        dependencies.update(set(summary["imported"]))
+        dependencies.discard(cls["name"])
+
+        resolved.append({
+            "name": cls["name"],
+            "inherits": cls["inherits"],
+            "attributes": cls["attributes"],
+            "methods": cls["methods"],
+            "dependencies": list(dependencies)
+        })
+    return resolved
 
 # Hàm get_repo_class (giữ nguyên từ code trước)
-def get_repo_class(url: str, local_dirs: str = './repo') -> List[Dict]:
+def get_repo_class(url: str, local_dirs: str = './repo', workers: int = 1,
+                   output_dir: Optional[str] = None, incremental: bool = False) -> List[Dict]:
     """
     Extract all classes and their dependencies from Python files in a Git repository.
 
+    Each file is parsed once into a compact class summary; dependencies are then resolved
+    from the summaries against the repo-wide class names. Both phases run on a process
+    pool when workers > 1.
+
     Args:
         url (str): Git repository URL.
         local_dirs (str): Directory to store the repo.
+        workers (int): Number of worker processes (1 runs serially).
+        output_dir (Optional[str]): If given, class_list_enhanced.json is also written
+            to this directory.
+        incremental (bool): Reuse the previous run's results stored in local_dirs and
+            reparse only files changed since (see get_repo_class_incremental); workers
+            is ignored.
 
     Returns:
         List[Dict]: List of dictionaries containing class details.
     """
-    local_path, file_metadata = _clone_and_collect_files(url, local_dirs)
+    if incremental:
+        return get_repo_class_incremental(url, local_dirs, output_dir)
+
+    summaries = get_snapshot(url, local_dirs).class_summaries(workers)
 
+    class_names = {name for summary in summaries for name in summary["class_names"]}
     list_of_classes = []
-    class_names = set()
-    imported_classes = defaultdict(set)
+    for resolved in _map(_resolve_classes, summaries, repeat(class_names, len(summaries)), workers=workers):
+        list_of_classes.extend(resolved)
 
-    for file in file_metadata:
-        if file["extension"] != 'py':
-            continue
+    _save_artifact(output_dir, 'class_list_enhanced.json', list_of_classes, "Class list")
 
-        rel_path = file["rel_path"]
-        try:
-            tree = ast.parse(file["content"], filename=rel_path)
-        except SyntaxError as e:
-            print(f"Skipping {rel_path} due to error: {e}")
-            continue
+    return list_of_classes
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                class_names.add(node.name)
-            elif isinstance(node, ast.ImportFrom):
-                for name in node.names:
-                    imported_classes[rel_path].add(name.name)
+def _summarize_structure(tree: ast.AST) -> Dict:
+    """Collect the top-level classes (with method names) and functions of a module."""
+    structure = {"classes": {}, "functions": []}
+    for node in ast.iter_child_nodes(tree):
+        if isinstance(node, ast.ClassDef):
+            method_names = [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
+            structure["classes"][node.name] = {"methods": method_names}
+        elif isinstance(node, ast.FunctionDef):
+            structure["functions"].append(node.name)
+    return structure
 
-    for file in file_metadata:
-        if file["extension"] != 'py':
-            continue
+def _diff_commits(repo: Repo, old_commit: str, new_commit: str) -> Tuple[Set[str], Set[str]]:
+    """
+    Diff new_commit against old_commit.
 
-        rel_path = file["rel_path"]
-        try:
-            tree = ast.parse(file["content"], filename=rel_path)
-        except SyntaxError:
-            continue
+    Args:
+        repo (Repo): Repository holding both commits.
+        old_commit (str): Commit SHA recorded by the previous run.
+        new_commit (str): Commit SHA being analysed now.
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                class_name = node.name
-                inherits = [base.id for base in node.bases if isinstance(base, ast.Name)]
-                methods = []
-                attributes = set()
-                dependencies = set()
-
-                for item in node.body:
-                    if isinstance(item, ast.FunctionDef):
-                        method_name = item.name
-                        methods.append(method_name)
-
-                        for arg in ast.walk(item):
-                            if isinstance(arg, ast.Name) and arg.id in class_names and arg.id != class_name:
-                                dependencies.add(arg.id)
-
-                    if isinstance(item, ast.FunctionDef) and item.name == '__init__':
-                        for stmt in item.body:
-                            if isinstance(stmt, ast.Assign):
-                                for target in stmt.targets:
-                                    if (isinstance(target, ast.Attribute) and
-                                        isinstance(target.value, ast.Name) and
-                                        target.value.id == 'self'):
-                                        attributes.add(target.attr)
-
-                                        if isinstance(stmt.value, ast.Call):
-                                            func = stmt.value.func
-                                            if isinstance(func, ast.Name) and func.id in class_names:
-                                                dependencies.add(func.id)
-                                            elif isinstance(func, ast.Attribute):
-                                                if func.attr in class_names:
-                                                    dependencies.add(func.attr)
-
-                dependencies.update(imported_classes[rel_path])
-                dependencies.discard(class_name)
-
-                list_of_classes.append({
-                    "name": class_name,
-                    "inherits": inherits,
-                    "attributes": list(attributes),
-                    "methods": methods,
-                    "dependencies": list(dependencies)
-                })
-
-    output_file = os.path.join(local_dirs, 'class_list_enhanced.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(list_of_classes, f, indent=2)
-    print(f"Class list saved to {output_file}")
+    Returns:
+        Tuple[Set[str], Set[str]]: Changed or added paths, and deleted paths.
+    """
+    changed, deleted = set(), set()
+    for diff in repo.commit(old_commit).diff(new_commit):
+        if diff.change_type in ('D', 'R') and diff.a_path:
+            deleted.add(os.path.join(*diff.a_path.split('/')))
+        if diff.change_type != 'D' and diff.b_path:
+            changed.add(os.path.join(*diff.b_path.split('/')))
+    return changed, deleted - changed
 
-    return list_of_classes
+_state_locks: Dict[str, threading.Lock] = {}
+_state_locks_lock = threading.Lock()
+
+def _state_lock(state_file: str) -> threading.Lock:
+    """Return the lock guarding one incremental state file."""
+    with _state_locks_lock:
+        return _state_locks.setdefault(os.path.abspath(state_file), threading.Lock())
+
+def _load_class_state(state_file: str) -> Optional[Dict]:
+    """Load the incremental class state, or None if it is missing or unreadable."""
+    if not os.path.exists(state_file):
+        return None
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if (isinstance(state, dict) and isinstance(state.get("commit"), str) and
+                isinstance(state.get("files"), dict)):
+            return state
+        error = "unexpected content"
+    except (OSError, ValueError) as e:
+        error = e
+    print(f"Cannot read {state_file} ({error}), running a full extraction.")
+    return None
+
+def get_repo_class_incremental(url: str, local_dirs: str = './repo',
+                               output_dir: Optional[str] = None) -> List[Dict]:
+    """
+    Extract classes like get_repo_class, reusing the results of the previous run.
+
+    The analysed commit SHA and per-file class summaries are stored in local_dirs, and
+    files are read from the clone pool's mirror without a checkout. On the next run only
+    files changed upstream since that commit are reparsed, deleted files are dropped, and
+    dependencies are recomputed only for classes in changed files or classes referencing a
+    class name that was added or removed.
+
+    Args:
+        url (str): Git repository URL.
+        local_dirs (str): Directory to store the repo and the incremental state.
+        output_dir (Optional[str]): If given, class_list_enhanced.json is also written
+            to this directory.
+
+    Returns:
+        List[Dict]: List of dictionaries containing class details.
+    """
+    pool = get_clone_pool(local_dirs)
+    # Leased so the mirror is not evicted while blobs are read from it
+    with pool.lease(url, refresh=True) as mirror_path:
+        repo = Repo(mirror_path)
+        state_file = os.path.join(local_dirs, f'{pool.key(url)}_class_state.json')
+        # Jobs for one repository run load -> diff -> save one at a time
+        with _state_lock(state_file):
+            commit = repo.head.commit.hexsha
+
+            state = _load_class_state(state_file)
+            if state is not None:
+                try:
+                    changed, deleted = _diff_commits(repo, state["commit"], commit)
+                except (ValueError, GitCommandError):
+                    print(f"Commit {state['commit']} is no longer available, running a full extraction.")
+                    state = None
+
+                if state is not None and any(os.path.basename(p) in ('.gitignore', 'pyvenv.cfg')
+                                             for p in changed | deleted):
+                    # Which unchanged files are ingested may have changed too
+                    print("Ignore rules changed, running a full extraction.")
+                    state = None
+
+            if state is None:
+                files = {}
+                pending = [file for file in _iter_blobs(repo, commit) if file.extension == 'py']
+                old_class_names = set()
+            else:
+                files = state["files"]
+                old_class_names = {name for entry in files.values() for name in entry["summary"]["class_names"]}
+                for rel_path in deleted:
+                    files.pop(rel_path, None)
+                changed_py = [p for p in sorted(changed) if p.split('.')[-1].lower() == 'py']
+                pending = list(_filter_blobs(repo, commit, [p.replace(os.sep, '/') for p in changed_py]))
+                # Files that no longer pass the filters (e.g. grew too large) leave the result
+                for rel_path in set(changed_py) - {file.rel_path for file in pending}:
+                    files.pop(rel_path, None)
+                print(f"Incremental update to {commit}: {len(pending)} changed, {len(deleted)} deleted files")
+
+            changed = set()
+            for file in pending:
+                summary = _summarize_source(file.read(), file.rel_path)
+                if summary is None:
+                    files.pop(file.rel_path, None)
+                    continue
+                files[file.rel_path] = {"summary": summary}
+                changed.add(file.rel_path)
+
+            # Class dependencies only change when a file changed or the set of class names changed
+            class_names = {name for entry in files.values() for name in entry["summary"]["class_names"]}
+            renamed = class_names ^ old_class_names
+            list_of_classes = []
+            for rel_path, entry in files.items():
+                summary = entry["summary"]
+                if (rel_path in changed or "classes" not in entry or
+                        any(renamed.intersection(cls["references"]) for cls in summary["classes"])):
+                    entry["classes"] = _resolve_classes(summary, class_names)
+                list_of_classes.extend(entry["classes"])
+
+            tmp_file = f'{state_file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"url": url, "commit": commit, "files": files}, f)
+            os.replace(tmp_file, state_file)
+
+            _save_artifact(output_dir, 'class_list_enhanced.json', list_of_classes, "Class list")
+
+            return list_of_classes
 
 # Hàm extract_code_structure (giữ nguyên từ code trước)
-def extract_code_structure(url: str, local_dirs: str = './repo') -> Dict:
+def extract_code_structure(url: str, local_dirs: str = './repo', output_dir: Optional[str] = None) -> Dict:
     """
     Extract code structure from Python files in a repository.
 
     Args:
         url (str): Git repository URL.
         local_dirs (str): Directory to store the repo.
+        output_dir (Optional[str]): If given, repo_summary.json is also written to this directory.
 
     Returns:
         Dict: Code structure with classes and functions.
     """
-    local_path, file_metadata = _clone_and_collect_files(url, local_dirs)
+    snapshot = get_snapshot(url, local_dirs)
 
     code_summary = defaultdict(lambda: {"classes": {}, "functions": []})
 
-    for file in file_metadata:
-        if file["extension"] != 'py':
+    for file in snapshot.python_files():
+        tree = snapshot.parse(file)
+        if tree is None:
             continue
 
-        rel_path = file["rel_path"]
-        try:
-            tree = ast.parse(file["content"], filename=rel_path)
-        except SyntaxError:
-            continue
+        structure = _summarize_structure(tree)
+        if structure["classes"] or structure["functions"]:
+            code_summary[file.rel_path] = structure
 
-        for node in ast.iter_child_nodes(tree):
-            if isinstance(node, ast.ClassDef):
-                method_names = [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
-                code_summary[rel_path]["classes"][node.name] = {"methods": method_names}
-            elif isinstance(node, ast.FunctionDef):
-                code_summary[rel_path]["functions"].append(node.name)
-
-    output_file = os.path.join(local_dirs, 'repo_summary.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(code_summary, f, indent=2)
-    print(f"Code structure saved to {output_file}")
+    _save_artifact(output_dir, 'repo_summary.json', code_summary, "Code structure")
 
     return code_summary
 
 # Hàm mới để lấy thông tin cho README
-def extract_for_readme(url: str, local_dirs: str = './repo') -> Dict:
+def extract_for_readme(url: str, local_dirs: str = './repo', output_dir: Optional[str] = None) -> Dict:
     """
     Extract information from a repository for generating a README.
 
     Args:
         url (str): Git repository URL.
         local_dirs (str): Directory to store the repo.
+        output_dir (Optional[str]): If given, readme_metadata.json and readme_summary.json
+            are also written to this directory.
 
     Returns:
         Dict: Code structure with classes, functions, and additional metadata for README.
     """
-    local_path, file_metadata = _clone_and_collect_files(url, local_dirs)
+    snapshot = get_snapshot(url, local_dirs)
 
     # Output chính (giữ giống extract_code_structure)
     code_summary = defaultdict(lambda: {"classes": {}, "functions": []})
@@ -239,10 +1005,12 @@ def extract_for_readme(url: str, local_dirs: str = './repo') -> Dict:
     file_types = defaultdict(int)
     dependencies = defaultdict(list)
 
-    for file in file_metadata:
-        rel_path = file["rel_path"]
-        ext = file["extension"]
-        content = file["content"]
+    for file in snapshot.files:
+        rel_path = file.rel_path
+        ext = file.extension
+        content = snapshot.read(file)
+        if content is None:
+            continue
 
         # Thu thập cấu trúc thư mục
         dir_name = os.path.dirname(rel_path)
@@ -253,18 +1021,14 @@ def extract_for_readme(url: str, local_dirs: str = './repo') -> Dict:
 
         # Xử lý file Python
         if ext == 'py':
-            try:
-                tree = ast.parse(content, filename=rel_path)
-            except SyntaxError:
+            tree = snapshot.parse(file)
+            if tree is None:
                 continue
 
             # Thu thập classes và functions (giống extract_code_structure)
-            for node in ast.iter_child_nodes(tree):
-                if isinstance(node, ast.ClassDef):
-                    method_names = [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
-                    code_summary[rel_path]["classes"][node.name] = {"methods": method_names}
-                elif isinstance(node, ast.FunctionDef):
-                    code_summary[rel_path]["functions"].append(node.name)
+            structure = _summarize_structure(tree)
+            if structure["classes"] or structure["functions"]:
+                code_summary[rel_path] = structure
 
             # Thu thập docstrings
             for node in ast.walk(tree):
@@ -277,7 +1041,7 @@ def extract_for_readme(url: str, local_dirs: str = './repo') -> Dict:
                     })
 
         # Xử lý file config
-        if ext in ['requirements.txt', 'package.json', '.env', 'Dockerfile', '.gitignore']:
+        if ext in CONFIG_FILES:
             config_files[rel_path] = content
 
             # Phân tích dependencies từ file config
@@ -302,17 +1066,12 @@ def extract_for_readme(url: str, local_dirs: str = './repo') -> Dict:
         "docstrings": dict(docstrings),
         "directory_structure": dict(directory_structure),
         "file_types": dict(file_types),
-        "dependencies": dict(dependencies)
+        "dependencies": dict(dependencies),
+        "skipped_files": snapshot.skipped
     }
-    output_file = os.path.join(local_dirs, 'readme_metadata.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(readme_metadata, f, indent=2)
-    print(f"README metadata saved to {output_file}")
+    _save_artifact(output_dir, 'readme_metadata.json', readme_metadata, "README metadata")
 
     # Output chính chỉ chứa classes và functions
-    output_file = os.path.join(local_dirs, 'readme_summary.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(code_summary, f, indent=2)
-    print(f"Code structure for README saved to {output_file}")
+    _save_artifact(output_dir, 'readme_summary.json', code_summary, "Code structure for README")
 
     return readme_metadata
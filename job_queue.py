@@ -0,0 +1,123 @@
+"""
+Background Job Queue for Repository Documentation
+
+Runs clone, parse and generation work on a bounded thread pool outside the
+Streamlit script thread. Requests for the same job key (e.g. the same kind of
+document for the same repository) attach to the job already in flight instead
+of starting a second one.
+"""
+
+import time
+import uuid
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class Job:
+    """A unit of background work whose status and result can be polled."""
+
+    def __init__(self, key: Hashable):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.future: Optional[Future] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.attached = 0
+
+    @property
+    def status(self) -> str:
+        """One of "queued", "running", "done" or "failed"."""
+        if self.future.running():
+            return "running"
+        if not self.future.done():
+            return "queued"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self) -> Any:
+        """Return the job result, re-raising the exception if the job failed."""
+        return self.future.result()
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self.future.exception() if self.future.done() else None
+
+
+class JobQueue:
+    """
+    Bounded worker pool with per-key deduplication of in-flight jobs.
+
+    Finished jobs are kept for result_ttl seconds so that every session polling
+    them can collect the result.
+    """
+
+    def __init__(self, max_workers: int = 4, result_ttl: float = 600):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docjob")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[Hashable, Job] = {}
+
+    def submit(self, key: Hashable, func: Callable, *args, **kwargs) -> Job:
+        """
+        Start a job, or attach to the job already running for key.
+
+        Args:
+            key: Deduplication key; jobs with equal keys share one execution.
+            func: Callable run on the worker pool.
+            *args, **kwargs: Arguments for func.
+
+        Returns:
+            Job: The new job, or the in-flight job for key.
+        """
+        with self._lock:
+            self._expire()
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.attached += 1
+                return job
+
+            job = Job(key)
+            job.future = self._executor.submit(self._run, job, func, args, kwargs)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by id, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, func: Callable, args: tuple, kwargs: dict) -> Any:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Release the key before the future completes, so waiters see it done
+            self._finish(job)
+
+    def _finish(self, job: Job) -> None:
+        with self._lock:
+            job.finished_at = time.time()
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+
+    def _expire(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of known, in-flight and deduplicated jobs."""
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "in_flight": len(self._in_flight),
+                "attached": sum(job.attached for job in self._jobs.values())
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,412 @@
+"""
+LLM Client Helpers
+
+Wrappers around the OpenAI and Gemini clients shared by the generation modules:
+rate-limit backoff, a persistent response cache and coalescing of identical
+in-flight requests.
+"""
+
+import os
+import json
+import asyncio
+import random
+import sqlite3
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Return whether an API error is a throttling or transient failure.
+
+    Works on OpenAI errors (status_code) and Google API errors (code) without
+    importing either SDK.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(getattr(error, "code", None), int):
+        status = error.code
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, TimeoutError)) or "Connection" in name or "Timeout" in name
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Return the server-requested delay in seconds from a Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitedClient:
+    """
+    Chat-completions client that backs off on rate limits and transient errors.
+
+    Exposes the same `chat.completions.create(**kwargs)` call as openai.OpenAI, so it can
+    be passed anywhere the plain client is used. Retries wait for the server's Retry-After
+    when given, otherwise for an exponentially growing delay with full jitter.
+    """
+
+    def __init__(self, client, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.retries = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        """Call client.chat.completions.create, retrying throttled or transient failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                delay = min(delay, self.max_delay)
+                self.retries += 1
+                print(f"{type(e).__name__} from {kwargs.get('model', 'model')}, retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+                self.sleep(delay)
+
+
+class CacheMissError(LookupError):
+    """Raised in read-only cache mode when a request has no cached response."""
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses.
+
+    Entries are keyed by a SHA-256 hash of the model, the messages or prompt and the
+    sampling parameters. Entries older than ttl seconds are ignored, and the least
+    recently used ones are evicted once the stored responses exceed max_bytes. In
+    read-only mode nothing is written, expired entries are still served and a miss
+    raises CacheMissError, so a regeneration reproduces earlier outputs exactly. A
+    read-only cache without a database file behaves as an empty cache.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 30 * 24 * 3600,
+                 max_bytes: int = 256 * 1024 * 1024, read_only: bool = False):
+        self.path = path or os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm", "responses.sqlite3"))
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if read_only:
+            if os.path.exists(self.path):
+                self._conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True,
+                                             check_same_thread=False)
+                if self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'responses'").fetchone() is None:
+                    self._conn.close()
+                    self._conn = None
+            if self._conn is None:
+                print(f"LLM cache {self.path} does not exist yet; read-only lookups will miss.")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, "
+                "created REAL, accessed REAL, size INTEGER)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._conn.commit()
+
+    @staticmethod
+    def key(model: str, messages: Any, params: Dict[str, Any]) -> str:
+        """Hash the model, messages (or prompt) and sampling parameters of a request."""
+        payload = json.dumps({"model": model, "messages": messages, "params": params},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text, or None if missing or expired."""
+        with self._lock:
+            if self._conn is None:
+                self.misses += 1
+                return None
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and (self.read_only or time.time() - row[1] <= self.ttl):
+                self.hits += 1
+                if not self.read_only:
+                    self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Store a response and evict the least recently used entries if over max_bytes."""
+        if self.read_only:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, now, now, len(response.encode("utf-8")))
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = (0, 0) if self._conn is None else \
+                self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+
+_refresh = threading.local()
+
+
+@contextmanager
+def cache_refresh():
+    """Within this block, cached clients skip lookups and overwrite entries (e.g. to retry a rejected answer)."""
+    previous = getattr(_refresh, "active", False)
+    _refresh.active = True
+    try:
+        yield
+    finally:
+        _refresh.active = previous
+
+
+def _lookup(cache: Optional[ResponseCache], key: str) -> Optional[str]:
+    if cache is None or (getattr(_refresh, "active", False) and not cache.read_only):
+        return None
+    text = cache.get(key)
+    if text is None and cache.read_only:
+        raise CacheMissError(f"No cached response for request {key[:12]} in read-only mode")
+    return text
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight requests.
+
+    The first caller for a key (the leader) runs the request; callers arriving with the
+    same key before it finishes wait for the leader's result instead of issuing a
+    duplicate call. Works across threads and event loops, for sync and async callers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: str):
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                print(f"Coalesced duplicate LLM request {key[:12]} ({self.coalesced} so far)")
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.calls += 1
+            return future, True
+
+    def _settle(self, key: str, future: Future, result=None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """Run func for key, or wait for the identical request already running."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def do_async(self, key: str, func: Callable[[], Awaitable]) -> Any:
+        """Async counterpart of do; func returns the awaitable running the request."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await func()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
+
+
+class CachedChatClient:
+    """
+    OpenAI-compatible chat client that serves repeated requests from a ResponseCache.
+
+    Cached responses expose `choices[0].message.content` like the SDK response.
+    Identical requests already in flight are coalesced through a SingleFlight.
+    Streaming and multi-choice requests bypass both.
+    """
+
+    def __init__(self, client, cache: Optional[ResponseCache], flight: Optional[SingleFlight] = None):
+        self.client = client
+        self.cache = cache
+        self.flight = flight or SingleFlight()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        if kwargs.get("stream") or kwargs.get("n", 1) != 1:
+            return self.client.chat.completions.create(**kwargs)
+
+        params = {k: v for k, v in kwargs.items() if k not in ("model", "messages")}
+        key = ResponseCache.key(kwargs.get("model"), kwargs.get("messages"), params)
+        content = _lookup(self.cache, key)
+        if content is not None:
+            return SimpleNamespace(
+                model=kwargs.get("model"), cached=True,
+                choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                         message=SimpleNamespace(role="assistant", content=content))]
+            )
+
+        def call():
+            response = self.client.chat.completions.create(**kwargs)
+            content = response.choices[0].message.content
+            if self.cache is not None and content is not None:
+                self.cache.put(key, kwargs.get("model"), content)
+            return response
+
+        return self.flight.do(key, call)
+
+
+class CachedGenerativeModel:
+    """
+    Gemini GenerativeModel wrapper that serves repeated prompts from a ResponseCache.
+
+    Cached responses expose `.text` like the SDK response. Identical prompts already
+    in flight are coalesced through a SingleFlight. Other attributes are forwarded
+    to the wrapped model.
+    """
+
+    def __init__(self, model, cache: Optional[ResponseCache], flight: Optional[SingleFlight] = None):
+        self.model = model
+        self.cache = cache
+        self.flight = flight or SingleFlight()
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _key(self, contents, kwargs) -> str:
+        model_name = getattr(self.model, "model_name", type(self.model).__name__)
+        return ResponseCache.key(model_name, contents, kwargs)
+
+    def _store(self, key: str, response) -> None:
+        if self.cache is not None:
+            self.cache.put(key, getattr(self.model, "model_name", ""), response.text)
+
+    def generate_content(self, contents, **kwargs):
+        key = self._key(contents, kwargs)
+        text = _lookup(self.cache, key)
+        if text is not None:
+            return SimpleNamespace(text=text, cached=True)
+
+        def call():
+            response = self.model.generate_content(contents, **kwargs)
+            self._store(key, response)
+            return response
+
+        return self.flight.do(key, call)
+
+    async def generate_content_async(self, contents, **kwargs):
+        key = self._key(contents, kwargs)
+        text = _lookup(self.cache, key)
+        if text is not None:
+            return SimpleNamespace(text=text, cached=True)
+
+        async def call():
+            response = await self.model.generate_content_async(contents, **kwargs)
+            self._store(key, response)
+            return response
+
+        return await self.flight.do_async(key, call)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+_single_flight = SingleFlight()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache configured by LLM_CACHE_MODE.
+
+    "readwrite" (default) caches responses, "readonly" only replays cached ones and
+    "off" disables caching (returns None).
+    """
+    global _response_cache
+    mode = os.getenv("LLM_CACHE_MODE", "readwrite").lower()
+    if mode == "off":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(read_only=mode == "readonly")
+        return _response_cache
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide SingleFlight shared by all wrapped clients."""
+    return _single_flight
+
+
+def cached_chat_client(client) -> CachedChatClient:
+    """Wrap an OpenAI-compatible client with the process-wide response cache and request coalescing."""
+    return CachedChatClient(client, get_response_cache(), _single_flight)
+
+
+def cached_generative_model(model) -> CachedGenerativeModel:
+    """Wrap a Gemini GenerativeModel with the process-wide response cache and request coalescing."""
+    return CachedGenerativeModel(model, get_response_cache(), _single_flight)
+
+
+def llm_stats() -> Dict[str, Dict[str, int]]:
+    """Return response cache and request coalescing metrics for this process."""
+    cache = get_response_cache()
+    return {"cache": cache.stats() if cache is not None else {}, "single_flight": _single_flight.stats()}
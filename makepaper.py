@@ -21,6 +21,8 @@ import subprocess
 import os
 import math
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 import matplotlib.pyplot as plt
 import networkx as nx
@@ -36,21 +38,16 @@ from utils import (
 from mermaid_utils import (
     generate_architecture_diagram, generate_class_diagram, generate_component_flow_diagram
 )
-
-from guardrails import Guard
-from guardrails.hub import (
-    ToxicLanguage,
-    ProfanityFree,
-    DetectPII,
-    RestrictToTopic 
-)
+from llm_client import RateLimitedClient, cache_refresh, cached_chat_client
+from validation import TieredValidator, format_latency, get_validator
 import os
 api_key = os.getenv("OPENAI_API_KEY")
 
 class PaperGenerator:
     """Generates a complete research paper from code analysis."""
     
-    def __init__(self, output_dir: str, paper_plan: Dict, analysis_result: Dict, gpt_version: str = "gpt-3.5-turbo"):
+    def __init__(self, output_dir: str, paper_plan: Dict, analysis_result: Dict, gpt_version: str = "gpt-3.5-turbo",
+                 max_concurrency: int = 4, polish_diagrams: bool = False):
         self.output_dir = output_dir
         self.figures_dir = os.path.join(output_dir, "figures")
         create_directory(self.figures_dir)
@@ -58,68 +55,98 @@ class PaperGenerator:
         self.paper_plan = paper_plan
         self.analysis_result = analysis_result
         self.gpt_version = gpt_version
-        self.openai_client = openai.OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-        
-        paper_name = self.paper_plan.get("paper_name", "Unknown Paper")
-        self.safety_guard = Guard().use_many(
-            ToxicLanguage(validation_method="full", on_fail="exception", threshold=0.5),
-            ProfanityFree(validation_method="full", on_fail="exception", threshold=0.5),
-            DetectPII(["EMAIL_ADDRESS", "PHONE_NUMBER"], "exception"),
-            RestrictToTopic(valid_topics=[paper_name], disable_classifier=True, disable_llm=False, on_fail="exception")
+        # Số request OpenAI chạy đồng thời khi generate_paper
+        self.max_concurrency = max_concurrency
+        # Diagrams are built from the analysis data; polishing adds one LLM call per figure
+        self.polish_diagrams = polish_diagrams
+        # Retries are handled by RateLimitedClient so concurrent sections back off together;
+        # repeated requests are answered from the persistent response cache
+        self.openai_client = cached_chat_client(
+            RateLimitedClient(openai.OpenAI(api_key=os.environ["OPENAI_API_KEY"], max_retries=0))
         )
-    def generate_valid_text(self, generate_func, outline, max_retries=5):
-        """Check generated text validity with truncation for long outputs."""
+        
+        # Thời gian generate / validate của từng section
+        self.section_timings: Dict[str, Dict] = {}
+
+    @property
+    def validator(self) -> TieredValidator:
+        """Validator for this paper's topic; guards are loaded once per process and shared."""
+        return get_validator(self.paper_plan.get("paper_name", "Unknown Paper"))
+
+    def generate_valid_text(self, generate_func, outline, max_retries=5, section: Optional[str] = None):
+        """
+        Generate a section and validate it, cheapest checks first.
+
+        PII and profanity are redacted rather than regenerated; a new generation is only
+        requested when the text cannot be repaired (e.g. it is off topic).
+
+        Args:
+            generate_func: Section generator taking the outline section.
+            outline: Outline section passed to generate_func.
+            max_retries: Maximum number of generations.
+            section: Name under which the latency breakdown is recorded.
+
+        Returns:
+            str: The validated (possibly redacted) text, or the last attempt if none passed.
+        """
+        timing = {"attempts": 0, "generation": 0.0, "validation": {}}
+        self.section_timings[section or generate_func.__name__] = timing
         for attempt in range(max_retries):
-            text = generate_func(outline)
+            start = time.perf_counter()
+            if attempt == 0:
+                text = generate_func(outline)
+            else:
+                # A cached answer that failed validation would fail again, so ask the model anew
+                with cache_refresh():
+                    text = generate_func(outline)
+            timing["generation"] += time.perf_counter() - start
+            timing["attempts"] += 1
             if len(text.split()) > 400:
                 text = " ".join(text.split()[:400])
                 print(f"Truncated text to 400 words on attempt {attempt+1}")
-            try:
-                self.safety_guard.validate(text)
+
+            passed, text, report = self.validator.validate(text)
+            for tier, seconds in report["latency"].items():
+                timing["validation"][tier] = timing["validation"].get(tier, 0.0) + seconds
+            if report["redactions"]:
+                print(f"Redacted {len(report['redactions'])} span(s) on attempt {attempt+1}")
+            if passed:
                 return text
-            except Exception as e:
-                print(f"Failed on attempt {attempt+1}: {e}")
-                if attempt == max_retries - 1:
-                    print("Max retries reached, returning unvalidated text")
-                    return text
+            print(f"Failed {report['failed_tier']} check on attempt {attempt+1}: {report['error']}")
         print("Failed to generate valid text after max retries, returning last attempt")
         return text
+
+    def figure_tasks(self) -> List[tuple]:
+        """Return (figure key, output path without extension, label, generator, inputs) per figure."""
+        classes = self.analysis_result["complexity"]["classes"]
+        return [
+            ("architecture", os.path.join(self.figures_dir, "architecture_diagram"), "architecture diagram",
+             generate_architecture_diagram, (classes,)),
+            ("class_diagram", os.path.join(self.figures_dir, "class_diagram"), "class diagram",
+             generate_class_diagram, (classes, self.analysis_result["dependencies"])),
+            ("component_flow", os.path.join(self.figures_dir, "component_flow"), "component flow diagram",
+             generate_component_flow_diagram, (self.analysis_result["data_flow"],)),
+        ]
+
+    def generate_figure(self, path: str, label: str, generator, inputs: tuple) -> str:
+        """Generate one figure as PNG and return the path of its Mermaid source."""
+        print(f"Generating {label} at: {path}.png")
+        generator(*inputs, path + ".png", self.openai_client, self.gpt_version, polish=self.polish_diagrams)
+        return path + ".mmd"
+
     def generate_figures(self) -> Dict[str, str]:
-        """Generate all figures for the paper as PNG using Mermaid diagrams."""
-        figure_paths = {}
-        
-        architecture_path = os.path.join(self.figures_dir, "architecture_diagram")
-        print(f"Generating architecture diagram at: {architecture_path}.png")
-        generate_architecture_diagram(
-            self.analysis_result["complexity"]["classes"],
-            architecture_path + ".png",
-            self.openai_client,
-            self.gpt_version
-        )
-        figure_paths["architecture"] = architecture_path + ".mmd"
-        
-        class_diagram_path = os.path.join(self.figures_dir, "class_diagram")
-        print(f"Generating class diagram at: {class_diagram_path}.png")
-        generate_class_diagram(
-            self.analysis_result["complexity"]["classes"],
-            self.analysis_result["dependencies"],
-            class_diagram_path + ".png",
-            self.openai_client,
-            self.gpt_version
-        )
-        figure_paths["class_diagram"] = class_diagram_path + ".mmd"
-        
-        component_flow_path = os.path.join(self.figures_dir, "component_flow")
-        print(f"Generating component flow diagram at: {component_flow_path}.png")
-        generate_component_flow_diagram(
-            self.analysis_result["data_flow"],
-            component_flow_path + ".png",
-            self.openai_client,
-            self.gpt_version
-        )
-        figure_paths["component_flow"] = component_flow_path + ".mmd"
-        
-        return figure_paths
+        """
+        Generate all figures for the paper as PNG using Mermaid diagrams.
+
+        Each render runs in its own renderer process (mmdc / Node), so the figures are
+        rendered concurrently from a small thread pool; mermaid_utils bounds how many
+        renderers run at once and writes every PNG atomically.
+        """
+        tasks = self.figure_tasks()
+        with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="figure") as executor:
+            futures = {key: executor.submit(self.generate_figure, path, label, generator, inputs)
+                       for key, path, label, generator, inputs in tasks}
+            return {key: future.result() for key, future in futures.items()}
     
     def generate_abstract(self, outline_section: Dict = None) -> str:
         """
@@ -434,50 +461,66 @@ class PaperGenerator:
             print(f"Error generating conclusion: {e}")
             return "Conclusion generation failed. Please check your code analysis results and try again."
     
-    def generate_paper(self) -> Dict[str, str]:
-        """Generate the complete paper with all sections."""
+    def section_tasks(self) -> List[tuple]:
+        """Return (paper key, label, generator, outline section key) for every text section."""
+        return [
+            ("abstract", "abstract", self.generate_abstract, "section_1"),
+            ("introduction", "introduction", self.generate_introduction, "section_2"),
+            ("related_work", "related work section", self.generate_related_work_section, "section_3"),
+            ("architecture", "architecture section", self.generate_architecture_section, "section_4"),
+            ("code_quality", "code quality section", self.generate_code_quality_section, "section_5"),
+            ("conclusion", "conclusion", self.generate_conclusion, "section_6"),
+        ]
+
+    async def generate_paper_async(self, max_concurrency: Optional[int] = None) -> Dict[str, str]:
+        """
+        Generate the complete paper, running all sections and figures concurrently.
+
+        Sections only depend on the plan and the analysis, so each section (with its
+        validation) and each figure runs as its own task in a worker thread. A semaphore
+        bounds how many OpenAI-bound tasks run at once; throttled requests back off in
+        RateLimitedClient. Figures only take a slot when they are polished by the LLM,
+        otherwise they render alongside the sections, bounded by mermaid_utils.
+
+        Args:
+            max_concurrency: Maximum number of concurrent tasks (defaults to self.max_concurrency).
+
+        Returns:
+            Dict[str, str]: The same paper structure as the sequential generation.
+        """
         paper_name = self.paper_plan.get("paper_name", "Unknown Paper")
         outline = self.paper_plan.get("outline", {})
-        
-        print("Generating diagrams...")
-        figure_paths = self.generate_figures()
-        
-        print("Generating abstract...")
-        abstract_outline = outline.get("section_1", {})
-        abstract = self.generate_valid_text(self.generate_abstract, abstract_outline)
-        
-        print("Generating introduction...")
-        intro_outline = outline.get("section_2", {})
-        introduction = self.generate_valid_text(self.generate_introduction, intro_outline)
-
-        print("Generating related work section...")
-        related_outline = outline.get("section_3", {})
-        related_work_section = self.generate_valid_text(self.generate_related_work_section, related_outline)
-
-        print("Generating architecture section...")
-        arch_outline = outline.get("section_4", {})
-        architecture_section = self.generate_valid_text(self.generate_architecture_section, arch_outline)
-
-        print("Generating code quality section...")
-        quality_outline = outline.get("section_5", {})
-        code_quality_section = self.generate_valid_text(self.generate_code_quality_section, quality_outline)
-
-        print("Generating conclusion...")
-        conclusion_outline = outline.get("section_6", {})
-        conclusion = self.generate_valid_text(self.generate_conclusion, conclusion_outline)
-        
-        paper = {
-            "title": f"Analysis of {paper_name} Implementation",
-            "abstract": abstract,
-            "introduction": introduction,
-            "related_work": related_work_section,
-            "architecture": architecture_section,
-            "code_quality": code_quality_section,
-            "conclusion": conclusion,
-            "figures": figure_paths
-        }
-        
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def run(label, func, *args, uses_llm=True):
+            if not uses_llm:
+                return await asyncio.to_thread(func, *args)
+            async with semaphore:
+                print(f"Generating {label}...")
+                return await asyncio.to_thread(func, *args)
+
+        figure_tasks = self.figure_tasks()
+        section_tasks = self.section_tasks()
+        results = await asyncio.gather(
+            *(run(label, self.generate_figure, path, label, generator, inputs, uses_llm=self.polish_diagrams)
+              for _, path, label, generator, inputs in figure_tasks),
+            *(run(label, self.generate_valid_text, func, outline.get(section, {}), 5, key)
+              for key, label, func, section in section_tasks)
+        )
+        figure_paths = {task[0]: path for task, path in zip(figure_tasks, results)}
+        sections = {task[0]: text for task, text in zip(section_tasks, results[len(figure_tasks):])}
+
+        paper = {"title": f"Analysis of {paper_name} Implementation"}
+        paper.update(sections)
+        paper["figures"] = figure_paths
+        print("Section latency (generation vs validation):")
+        print(format_latency(self.section_timings))
         return paper
+
+    def generate_paper(self) -> Dict[str, str]:
+        """Generate the complete paper with all sections."""
+        # nest_asyncio cho phép gọi asyncio.run cả khi đã có event loop (Jupyter, Streamlit)
+        return asyncio.run(self.generate_paper_async())
     
     def save_paper_markdown(self, paper: Dict[str, str]) -> str:
         """Save the paper in Markdown format with embedded PNG images, matching SAD structure."""
@@ -652,6 +695,8 @@ def main():
     parser = argparse.ArgumentParser(description="Generate a research paper from code analysis results.")
     parser.add_argument("--output_dir", required=True, help="Directory with analysis results and for output")
     parser.add_argument("--gpt_version", default="gpt-3.5-turbo", help="GPT model version to use")
+    parser.add_argument("--max_concurrency", type=int, default=4, help="Maximum number of concurrent OpenAI requests")
+    parser.add_argument("--polish_diagrams", action="store_true", help="Refine the generated Mermaid diagrams with the LLM")
     args = parser.parse_args()
     
     paper_plan_path = os.path.join(args.output_dir, "paper_plan.json")
@@ -676,7 +721,9 @@ def main():
         output_dir=args.output_dir,
         paper_plan=paper_plan,
         analysis_result=analysis_result,
-        gpt_version=args.gpt_version
+        gpt_version=args.gpt_version,
+        max_concurrency=args.max_concurrency,
+        polish_diagrams=args.polish_diagrams
     )
     
     paper = generator.generate_paper()
@@ -0,0 +1,206 @@
+"""
+Persistent Mermaid Renderer
+
+Talks to a long-lived Node worker (mermaid_worker.js) that keeps one headless
+browser open, so rendering a diagram costs a page instead of a Node start plus a
+Chromium launch. Requests from concurrent callers are coalesced into one batch
+per round trip, and the worker is restarted if it crashes or stops answering.
+"""
+
+import os
+import json
+import queue
+import atexit
+import shutil
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mermaid_worker.js")
+RENDER_TIMEOUT = 60
+
+
+class RendererError(Exception):
+    """The worker crashed, exited or did not answer in time."""
+
+
+class MermaidRenderer:
+    """
+    Client for one renderer worker process.
+
+    Each job is a dict with "code", "output" (file path), "format" ("png" or "svg"),
+    and optionally "scale" and "background".
+    """
+
+    def __init__(self, command: Optional[List[str]] = None, timeout: float = RENDER_TIMEOUT,
+                 max_restarts: int = 1):
+        self.command = command or ["node", WORKER_SCRIPT]
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: List[Dict] = []
+
+    def _start(self) -> None:
+        self._process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, encoding="utf-8", bufsize=1,
+            cwd=os.path.dirname(WORKER_SCRIPT)
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_lines, args=(self._process, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read_lines(process: subprocess.Popen, lines: queue.Queue) -> None:
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def close(self) -> None:
+        """Stop the worker process; the next render starts a new one."""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+
+    def _request(self, jobs: List[Dict]) -> List[Dict]:
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        self._next_id += 1
+        request_id = self._next_id
+        try:
+            self._process.stdin.write(json.dumps({"id": request_id, "jobs": jobs}) + "\n")
+            self._process.stdin.flush()
+        except OSError as e:
+            raise RendererError(f"cannot write to worker: {e}")
+
+        while True:
+            try:
+                line = self._lines.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RendererError(f"no answer within {self.timeout}s")
+            if line is None:
+                raise RendererError(f"worker exited with code {self._process.wait()}")
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # stray output from the browser or a library
+            if isinstance(response, dict) and response.get("id") == request_id:
+                results = response.get("results")
+                if not isinstance(results, list) or len(results) != len(jobs):
+                    raise RendererError("malformed response from worker")
+                return results
+
+    def _send(self, jobs: List[Dict]) -> List[Dict]:
+        """Send one batch, restarting the worker after a failure."""
+        for attempt in range(self.max_restarts + 1):
+            try:
+                return self._request(jobs)
+            except Exception as e:
+                # Besides RendererError, e.g. BrokenPipeError or a failed start
+                print(f"Mermaid renderer failed: {e}")
+                if self._process is not None:
+                    self._process.kill()
+                self.close()
+                if attempt < self.max_restarts:
+                    self.restarts += 1
+                    print("Restarting Mermaid renderer...")
+        return [{"ok": False, "error": "renderer unavailable"} for _ in jobs]
+
+    def render_batch(self, jobs: List[Dict]) -> List[bool]:
+        """
+        Render several diagrams in one worker round trip.
+
+        Calls made while another batch is in flight are queued and sent together as
+        the next batch, so concurrent figure renders share round trips.
+
+        Args:
+            jobs: Render jobs (see class docstring).
+
+        Returns:
+            List[bool]: Whether each job was rendered.
+        """
+        entry = {"jobs": jobs, "results": None, "done": threading.Event()}
+        with self._pending_lock:
+            self._pending.append(entry)
+        with self._lock:
+            if not entry["done"].is_set():
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                batch_jobs = [job for item in batch for job in item["jobs"]]
+                results = None
+                try:
+                    results = self._send(batch_jobs)
+                finally:
+                    # Every queued caller gets an answer, even if sending the batch blew up
+                    if results is None:
+                        results = [{"ok": False, "error": "renderer failed"} for _ in batch_jobs]
+                    start = 0
+                    for item in batch:
+                        item["results"] = results[start:start + len(item["jobs"])]
+                        start += len(item["jobs"])
+                        item["done"].set()
+
+        for job, result in zip(jobs, entry["results"]):
+            if not result.get("ok"):
+                print(f"Mermaid renderer could not render {job.get('output')}: {result.get('error')}")
+        return [bool(result.get("ok")) for result in entry["results"]]
+
+    def render(self, code: str, output_file: str, fmt: str = "png", scale: int = 2,
+               background: str = "transparent") -> bool:
+        """Render one diagram; see render_batch."""
+        job = {"code": code, "output": os.path.abspath(output_file), "format": fmt,
+               "scale": scale, "background": background}
+        return self.render_batch([job])[0]
+
+
+_renderer: Optional[MermaidRenderer] = None
+_renderer_lock = threading.Lock()
+_worker_available: Optional[bool] = None
+
+
+def worker_available() -> bool:
+    """Check once whether node, puppeteer and mermaid are installed for the worker."""
+    global _worker_available
+    with _renderer_lock:
+        if _worker_available is None:
+            _worker_available = False
+            reason = "node is not installed"
+            if shutil.which("node") and os.path.exists(WORKER_SCRIPT):
+                reason = "puppeteer or mermaid is not installed (run npm install)"
+                try:
+                    result = subprocess.run(
+                        ["node", "-e", "require.resolve('puppeteer'); require.resolve('mermaid/dist/mermaid.min.js')"],
+                        cwd=os.path.dirname(WORKER_SCRIPT), capture_output=True, timeout=30
+                    )
+                    _worker_available = result.returncode == 0
+                except (subprocess.SubprocessError, OSError) as e:
+                    reason = f"node check failed: {e}"
+            if not _worker_available:
+                print(f"Mermaid worker unavailable, {reason}; using the other diagram renderers.")
+        return _worker_available
+
+
+def get_renderer() -> Optional[MermaidRenderer]:
+    """
+    Return the process-wide renderer, or None if it should not or cannot be used.
+
+    MERMAID_RENDERER selects the backend: "auto" (default) uses the worker when it is
+    installed, "cli" always shells out to mmdc.
+    """
+    global _renderer
+    if os.getenv("MERMAID_RENDERER", "auto").lower() == "cli" or not worker_available():
+        return None
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = MermaidRenderer()
+            atexit.register(_renderer.close)
+        return _renderer
@@ -2,240 +2,18 @@
 """
 Mermaid Diagram Generation Utilities
 
-This module replaces matplotlib-based diagram generation with OpenAI-powered Mermaid diagrams,
-producing more accurate and detailed visualizations.
+This module replaces matplotlib-based diagram generation with Mermaid diagrams. Diagrams are
+built directly from the code analysis results; an optional OpenAI pass can polish them.
 """
 
 import os
-import json
-import subprocess
-import tempfile
 from typing import Dict, List, Any, Optional
-import openai
-import base64
-from io import BytesIO
 import re
-from PIL import Image
-import math
-import requests
-
-def generate_mermaid_architecture_diagram(classes: Dict[str, Any], openai_client, gpt_version: str) -> str:
-    """
-    Generate a Mermaid architecture diagram using OpenAI.
-    
-    Args:
-        classes: Dictionary of class information with methods and properties
-        openai_client: OpenAI client instance
-        gpt_version: GPT model version to use
-        
-    Returns:
-        Mermaid diagram code
-    """
-    # Extract class information for the prompt
-    class_info = []
-    for class_name, info in classes.items():
-        methods = [m.get("name", "") for m in info.get("methods", [])]
-        attributes = [a.get("name", "") for a in info.get("attributes", [])]
-        inherits = info.get("inherits_from", [])
-        
-        class_info.append({
-            "name": class_name,
-            "methods": methods[:5],  # Limit to 5 methods for clarity
-            "attributes": attributes[:5],  # Limit to 5 attributes for clarity
-            "inherits_from": inherits
-        })
-    
-    # Create prompt for GPT
-    prompt = f"""
-    Generate a Mermaid class diagram that represents the architecture of a system with the following classes.
-    For each class, I'll provide its name, key methods, attributes, and inheritance relationships.
-    
-    Class Information:
-    {json.dumps(class_info, indent=2)}
-    
-    Please create a Mermaid class diagram using the classDiagram syntax. Include:
-    1. All classes with their methods and attributes
-    2. Inheritance relationships using <|-- notation
-    3. Reasonable assumptions about relationships between classes based on naming patterns
-    
-    The diagram should be well-organized and easy to read. Use appropriate Mermaid syntax to represent the architecture clearly.
-    Only return the Mermaid code without any explanation or additional text or any additional color.
-    Begin your response with "```mermaid" and end with "```".
-    """
-    
-    try:
-        response = openai_client.chat.completions.create(
-            model=gpt_version,
-            messages=[
-                {"role": "system", "content": "You are an expert software architect who creates clear, accurate Mermaid diagrams."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature = 0.1
-        )
-        
-        # Extract Mermaid code from response
-        mermaid_code = response.choices[0].message.content.strip()
-        
-        # Clean up the code to ensure proper mermaid format
-        mermaid_code = extract_mermaid_code(mermaid_code)
-        
-        return mermaid_code
-        
-    except Exception as e:
-        print(f"Error generating architecture diagram: {e}")
-        # Return fallback simple diagram
-        return """classDiagram
-            class MainClass {
-                +process()
-                +initialize()
-            }
-            class Helper {
-                +support()
-            }
-            MainClass --> Helper"""
-
-def generate_mermaid_class_diagram(classes: Dict[str, Any], dependencies: Dict[str, Any], 
-                                   openai_client, gpt_version: str) -> str:
-    """
-    Generate a more detailed Mermaid class diagram using OpenAI.
-    
-    Args:
-        classes: Dictionary of class information
-        dependencies: Dictionary of dependency information
-        openai_client: OpenAI client instance
-        gpt_version: GPT model version to use
-        
-    Returns:
-        Mermaid diagram code
-    """
-    # Extract relevant dependency information
-    class_dependencies = []
-    for name, dep_info in dependencies.items():
-        if dep_info.get("type") == "class" and name in classes:
-            depends_on = [dep for dep in dep_info.get("depends_on", []) if dep in classes]
-            if depends_on:
-                class_dependencies.append({
-                    "class": name,
-                    "depends_on": depends_on
-                })
-    
-    # Create prompt for GPT
-    prompt = f"""
-    Generate a detailed Mermaid class diagram that shows both class structures and their relationships.
-    
-    Class Information:
-    {json.dumps([{"name": name, "methods": [m.get("name") for m in info.get("methods", [])[:5]], 
-                 "attributes": [a.get("name") for a in info.get("attributes", [])[:3]],
-                 "inherits_from": info.get("inherits_from", [])} 
-                for name, info in classes.items()], indent=2)}
-    
-    Dependencies:
-    {json.dumps(class_dependencies, indent=2)}
-    
-    Please create a comprehensive Mermaid class diagram that shows:
-    1. Classes with their key methods and attributes
-    2. Inheritance relationships with <|-- notation
-    3. Dependencies between classes with --> notation
-    4. Use appropriate relationship types (aggregation, composition, etc.) when they can be inferred
-    
-    Make the diagram as clear and organized as possible. Group related classes together visually.
-    Only return the Mermaid code without any explanation or additional text or any additional color.
-    Begin your response with "```mermaid" and end with "```".
-    """
-    
-    try:
-        response = openai_client.chat.completions.create(
-            model=gpt_version,
-            messages=[
-                {"role": "system", "content": "You are an expert software architect who creates detailed, accurate Mermaid class diagrams."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature = 0.1            
-        )
-        
-        # Extract Mermaid code from response
-        mermaid_code = response.choices[0].message.content.strip()
-        mermaid_code = extract_mermaid_code(mermaid_code)
-        
-        return mermaid_code
-        
-    except Exception as e:
-        print(f"Error generating class diagram: {e}")
-        # Return fallback simple diagram
-        return """classDiagram
-            class Class1 {
-                +method1()
-                +method2()
-            }
-            class Class2 {
-                +method1()
-            }
-            Class1 --> Class2"""
-
-def generate_mermaid_component_flow_diagram(data_flow: Dict[str, Any], 
-                                           openai_client, gpt_version: str) -> str:
-    """
-    Generate a Mermaid component flow diagram using OpenAI.
-    
-    Args:
-        data_flow: Dictionary of data flow information
-        openai_client: OpenAI client instance
-        gpt_version: GPT model version to use
-        
-    Returns:
-        Mermaid diagram code
-    """
-    # Extract data paths
-    data_paths = data_flow.get("data_paths", [])
-    
-    prompt = f"""
-    Generate a Mermaid flowchart diagram that shows the flow of data between components.
-    
-    Data Flow Paths:
-    {json.dumps(data_paths, indent=2)}
-    
-    Please create a Mermaid flowchart diagram that:
-    1. Shows each component as a node with a unique ID (use camelCase for node IDs, e.g., inputData, processData).
-    2. Shows data flow between components with directional arrows (`-->`) from source to destination.
-    3. Labels the arrows with data types (e.g., `|int|` or `|string|`) if available in the data; if not, leave the arrow unlabeled.
-    4. Uses appropriate Mermaid node shapes to represent different types of components:
-       - Use `()` for input/output components (e.g., `(inputData)`).
-       - Use `[]` for processing components (e.g., `[processData]`).
-       - Use `{{}}` for storage/database components (e.g., `{{storage}}`).
-    5. Organizes the flow logically from inputs (left) to outputs (right).
-    6. If a component name contains spaces, wrap it in double quotes (e.g., `["Input Data"]` or `("Input Data")`).
-    
-    The diagram should clearly illustrate the processing pipeline and component interactions.
-    Only return the Mermaid code without any explanation or additional text or any additional color.
-    Begin your response with "```mermaid" and end with "```".
-    Use the following Mermaid flowchart syntax:
-    - Start with: `flowchart LR`
-    - Define nodes with shapes: e.g., `nodeId[Node Name]` or `nodeId("Node Name")`
-    - Define flows: e.g., `nodeId1 --> |dataType| nodeId2`
-    """
-    
-    try:
-        response = openai_client.chat.completions.create(
-            model=gpt_version,
-            messages=[
-                {"role": "system", "content": "You are an expert software architect who creates clear, accurate Mermaid flowchart diagrams."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature = 0.1
-        )
-        
-        # Extract Mermaid code from response
-        mermaid_code = response.choices[0].message.content.strip()
-        mermaid_code = extract_mermaid_code(mermaid_code)
-        
-        return mermaid_code
-        
-    except Exception as e:
-        print(f"Error generating component flow diagram: {e}")
-        # Return fallback simple diagram
-        return """flowchart TD
-            A[Input] --> B[Process]
-            B --> C[Output]"""
+from PIL import Image, ImageDraw, ImageFont
+import uuid
+import threading
+from renderers import render_diagram
+from diagram_cache import diagram_key, get_diagram_cache
 
 def extract_mermaid_code(text: str) -> str:
     """
@@ -277,121 +55,241 @@ def extract_mermaid_code(text: str) -> str:
             # Return the whole text as a fallback, cleaning any markdown formatting
             return text.replace("```mermaid", "").replace("```", "").strip()
 
-# def render_mermaid_to_png(mermaid_code: str, output_file: str) -> bool:
-#     """
-#     Render Mermaid diagram to PNG using the Mermaid CLI (if installed) or Mermaid.ink API.
-    
-#     Args:
-#         mermaid_code: Mermaid diagram code
-#         output_file: Path to save the PNG file
-        
-#     Returns:
-#         Boolean indicating success
-#     """
-#     # First attempt: Try using mermaid-cli if installed
-#     try:
-#         with tempfile.NamedTemporaryFile(suffix='.mmd', mode='w', delete=False) as temp_file:
-#             temp_file.write(mermaid_code)
-#             temp_file_path = temp_file.name
-        
-#         # Try to use mmdc (Mermaid CLI) command if installed
-#         result = subprocess.run(
-#             ['mmdc', '-i', temp_file_path, '-o', output_file, '-b', 'transparent'],
-#             capture_output=True,
-#             text=True,
-#             check=False
-#         )
-        
-#         os.unlink(temp_file_path)
-        
-#         if result.returncode == 0:
-#             print(f"Successfully generated PNG using Mermaid CLI: {output_file}")
-#             return True
-            
-#     except (subprocess.SubprocessError, FileNotFoundError) as e:
-#         print(f"Mermaid CLI not available or failed: {e}")
-        
-#     # Second attempt: Try using the Mermaid.ink online service
-#     try:
-#         # Base64 encode the Mermaid code for the URL
-#         encoded_mermaid = base64.urlsafe_b64encode(mermaid_code.encode('utf-8')).decode('utf-8')
-#         mermaid_url = f"https://mermaid.ink/img/{encoded_mermaid}"
-        
-#         # Request the image
-#         response = requests.get(mermaid_url, timeout=15)
-#         if response.status_code == 200:
-#             # Save the image
-#             with open(output_file, 'wb') as f:
-#                 f.write(response.content)
-#             print(f"Successfully generated PNG using Mermaid.ink: {output_file}")
-#             return True
-#         else:
-#             print(f"Mermaid.ink API request failed: {response.status_code}")
-#     except Exception as e:
-#         print(f"Failed to use Mermaid.ink API: {e}")
-    
-#     # Third attempt: Try using puppeteer-mermaid if available
-#     try:
-#         with tempfile.NamedTemporaryFile(suffix='.mmd', mode='w', delete=False) as temp_file:
-#             temp_file.write(mermaid_code)
-#             temp_file_path = temp_file.name
-        
-#         # Try puppeteer-mermaid if installed
-#         result = subprocess.run(
-#             ['puppeteer-mermaid', '-i', temp_file_path, '-o', output_file],
-#             capture_output=True,
-#             text=True,
-#             check=False
-#         )
-        
-#         os.unlink(temp_file_path)
-        
-#         if result.returncode == 0:
-#             print(f"Successfully generated PNG using puppeteer-mermaid: {output_file}")
-#             return True
-#     except (subprocess.SubprocessError, FileNotFoundError) as e:
-#         print(f"puppeteer-mermaid not available or failed: {e}")
-    
-#     # Create a fallback empty image with text if everything else fails
-#     try:
-#         from PIL import Image, ImageDraw, ImageFont
-        
-#         # Create a blank image with text saying "Mermaid rendering failed"
-#         img = Image.new('RGB', (800, 600), color=(255, 255, 255))
-#         d = ImageDraw.Draw(img)
-        
-#         # Try to get a font, use default if not available
-#         try:
-#             font = ImageFont.truetype("arial.ttf", 20)
-#         except:
-#             font = ImageFont.load_default()
-        
-#         # Add text with diagram code
-#         d.text((10, 10), "Mermaid rendering failed. Diagram code:", fill=(0, 0, 0), font=font)
-        
-#         # Add the mermaid code
-#         wrapped_text = "\n".join([mermaid_code[i:i+80] for i in range(0, len(mermaid_code), 80)])
-#         d.text((10, 50), wrapped_text, fill=(0, 0, 0), font=font)
-        
-#         # Save the image
-#         img.save(output_file)
-#         print(f"Created fallback image with code: {output_file}")
-#         return True
-#     except Exception as e:
-#         print(f"Failed to create fallback image: {e}")
-#         return False
-
-import shutil
-
-import subprocess
-import shutil
-import tempfile
-import os
-from PIL import Image, ImageDraw, ImageFont
+# Template-based diagrams: built directly from CodeAnalyzer output, no LLM round trip
+MAX_DIAGRAM_CLASSES = 25
+MAX_CLASS_MEMBERS = 5
+MAX_FLOW_EDGES = 40
+
+def _mermaid_id(name: str) -> str:
+    """Turn a Python name (possibly dotted) into a valid Mermaid identifier."""
+    node_id = re.sub(r'\W', '_', name) or "_"
+    return f"n_{node_id}" if node_id[0].isdigit() else node_id
+
+def _mermaid_label(text: str) -> str:
+    return str(text).replace('"', "'")
+
+def _diagram_classes(classes: Dict[str, Any]) -> List[str]:
+    """Pick the largest classes (by lines) in a stable order."""
+    ranked = sorted(classes, key=lambda name: (-classes[name].get("lines", 0), name))
+    return sorted(ranked[:MAX_DIAGRAM_CLASSES])
+
+def _class_block(name: str, info: Dict[str, Any]) -> List[str]:
+    lines = [f"    class {_mermaid_id(name)}[\"{_mermaid_label(name)}\"] {{"]
+    for attribute in info.get("attributes", [])[:MAX_CLASS_MEMBERS]:
+        lines.append(f"        +{_mermaid_id(attribute.get('name', ''))}")
+    for method in info.get("methods", [])[:MAX_CLASS_MEMBERS]:
+        lines.append(f"        +{_mermaid_id(method.get('name', ''))}()")
+    lines.append("    }")
+    return lines
+
+def _inheritance_lines(names: List[str], classes: Dict[str, Any]) -> List[str]:
+    return [f"    {_mermaid_id(base)} <|-- {_mermaid_id(name)}"
+            for name in names for base in classes[name].get("inherits_from", []) if base in names]
+
+def class_dependencies(classes: Dict[str, Any], dependencies: Dict[str, Any]) -> List[tuple]:
+    """
+    Derive class-to-class dependencies from the CodeAnalyzer dependency graph.
+
+    Method nodes are named "Class.method", so a method (or the class itself) depending
+    on another class or on one of its methods makes its class depend on that class.
+
+    Returns:
+        Sorted list of (class, depends_on_class) pairs.
+    """
+    def owner(node: str) -> Optional[str]:
+        name = node.split(".", 1)[0]
+        return name if name in classes else None
+
+    relations = set()
+    for node, info in dependencies.items():
+        source = owner(node)
+        if source is None:
+            continue
+        for target_node in info.get("depends_on", []):
+            target = owner(target_node)
+            if target is not None and target != source:
+                relations.add((source, target))
+    return sorted(relations)
+
+def build_mermaid_architecture_diagram(classes: Dict[str, Any]) -> str:
+    """
+    Build a Mermaid class diagram of the system's classes from analysis data.
+
+    Args:
+        classes: analysis_result["complexity"]["classes"]
+
+    Returns:
+        Mermaid diagram code
+    """
+    names = _diagram_classes(classes)
+    if not names:
+        return "classDiagram\n    class NoClasses[\"No classes found\"]"
+    lines = ["classDiagram"]
+    for name in names:
+        lines.extend(_class_block(name, classes[name]))
+    lines.extend(_inheritance_lines(names, classes))
+    return "\n".join(lines)
+
+def build_mermaid_class_diagram(classes: Dict[str, Any], dependencies: Dict[str, Any]) -> str:
+    """
+    Build a Mermaid class diagram with the dependencies between classes.
+
+    Args:
+        classes: analysis_result["complexity"]["classes"]
+        dependencies: analysis_result["dependencies"]
+
+    Returns:
+        Mermaid diagram code
+    """
+    names = _diagram_classes(classes)
+    if not names:
+        return "classDiagram\n    class NoClasses[\"No classes found\"]"
+    lines = ["classDiagram"]
+    for name in names:
+        lines.extend(_class_block(name, classes[name]))
+    lines.extend(_inheritance_lines(names, classes))
+    lines.extend(f"    {_mermaid_id(source)} ..> {_mermaid_id(target)}"
+                 for source, target in class_dependencies(classes, dependencies)
+                 if source in names and target in names)
+    return "\n".join(lines)
+
+def build_mermaid_component_flow_diagram(data_flow: Dict[str, Any]) -> str:
+    """
+    Build a Mermaid flowchart from inputs through transformations to outputs.
+
+    Entry point parameters feed their functions, transformation calls connect their
+    source variables to the assigned target, and functions feed their return values.
+
+    Args:
+        data_flow: analysis_result["data_flow"]
+
+    Returns:
+        Mermaid diagram code
+    """
+    nodes: Dict[str, str] = {}
+    edges: List[str] = []
+
+    def node(kind: str, name: str, shape: str) -> str:
+        node_id = f"{kind}_{_mermaid_id(name)}"
+        if node_id not in nodes:
+            nodes[node_id] = shape.format(id=node_id, label=_mermaid_label(name))
+        return node_id
+
+    def edge(source: str, target: str, label: str = "") -> None:
+        line = f"    {source} -->|{_mermaid_label(label)}| {target}" if label else f"    {source} --> {target}"
+        if line not in edges and len(edges) < MAX_FLOW_EDGES:
+            edges.append(line)
+
+    for entry in data_flow.get("entry_points", []):
+        if entry.get("parameters"):
+            source = node("in", entry["function"], '    {id}(["' + _mermaid_label(", ".join(entry["parameters"])) + '"])')
+            edge(source, node("fn", entry["function"], '    {id}["{label}"]'), "input")
+    for exit_point in data_flow.get("exit_points", []):
+        target = node("out", exit_point["function"], '    {id}(["{label} result"])')
+        returns = exit_point.get("returns", "")
+        edge(node("fn", exit_point["function"], '    {id}["{label}"]'), target, "" if returns == "unknown" else returns)
+    for transformation in data_flow.get("data_transformations", []):
+        call = node("fn", transformation["function"], '    {id}["{label}"]')
+        for source in transformation.get("source", []):
+            if source:
+                edge(node("var", source, '    {id}(("{label}"))'), call)
+        if transformation.get("target"):
+            edge(call, node("var", transformation["target"], '    {id}(("{label}"))'))
+
+    if not edges:
+        return 'flowchart LR\n    input(["Input"]) --> process["Process"]\n    process --> output(["Output"])'
+    used = {part for line in edges for part in line.split() if part in nodes}
+    return "\n".join(["flowchart LR"] + [shape for node_id, shape in nodes.items() if node_id in used] + edges)
+
+def polish_mermaid_diagram(mermaid_code: str, openai_client, gpt_version: str) -> str:
+    """
+    Optionally ask the LLM to tidy a generated diagram, keeping every node and edge.
+
+    Returns:
+        The polished Mermaid code, or the input unchanged if the call fails.
+    """
+    prompt = f"""
+    Improve the readability of this Mermaid diagram: group related elements and fix any syntax problems.
+    Keep every node, class and relationship; do not invent new ones.
+    Only return the Mermaid code without any explanation. Begin your response with "```mermaid" and end with "```".
+
+    {mermaid_code}
+    """
+    try:
+        response = openai_client.chat.completions.create(
+            model=gpt_version,
+            messages=[
+                {"role": "system", "content": "You are an expert software architect who creates clear, accurate Mermaid diagrams."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature = 0.1
+        )
+        return extract_mermaid_code(response.choices[0].message.content.strip()) or mermaid_code
+    except Exception as e:
+        print(f"Error polishing diagram, keeping template output: {e}")
+        return mermaid_code
+
+# Each render starts its own headless browser, so only a few run at once
+MAX_CONCURRENT_RENDERS = 3
+_render_slots = threading.BoundedSemaphore(MAX_CONCURRENT_RENDERS)
+
+def _temp_path(output_file: str) -> str:
+    """Temporary sibling of output_file with the same extension (renderers infer the format from it)."""
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.{uuid.uuid4().hex[:8]}.tmp{ext}"
+
+def _render_atomic(render, mermaid_code: str, output_file: str) -> bool:
+    """
+    Render into a temporary file and move it into place only if rendering succeeded,
+    so a failed or interrupted render never leaves a partial image at output_file.
+    """
+    temp_file = _temp_path(output_file)
+    try:
+        with _render_slots:
+            success = render(mermaid_code, temp_file)
+        if success and os.path.exists(temp_file):
+            os.replace(temp_file, output_file)
+            return True
+        return False
+    finally:
+        if os.path.exists(temp_file):
+            os.unlink(temp_file)
+
+def write_text_atomic(path: str, text: str) -> None:
+    """Write a text file via a temporary file and rename."""
+    temp_file = _temp_path(path)
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_file, path)
+
+def _render_cached(render, mermaid_code: str, output_file: str, fmt: str, scale: float = 1,
+                   background: str = "transparent") -> bool:
+    """Serve a diagram from the diagram cache, or render it atomically and cache the result."""
+    cache = get_diagram_cache()
+    key = diagram_key(mermaid_code, fmt, scale, background)
+    if cache is not None and cache.fetch(key, fmt, output_file):
+        print(f"Using cached {fmt.upper()} for: {output_file}")
+        return True
+    if not _render_atomic(render, mermaid_code, output_file):
+        return False
+    if cache is not None:
+        cache.store(key, fmt, output_file)
+    return True
 
 def render_mermaid_to_png(mermaid_code: str, output_file: str) -> bool:
+    """Render Mermaid diagram to PNG (or reuse a cached render), writing output_file atomically."""
+    if _render_cached(_render_mermaid_to_png, mermaid_code, output_file, "png", scale=2):
+        return True
+    # The placeholder image is not cached, so the diagram is rendered again once a renderer works
+    return _render_atomic(_render_fallback_png, mermaid_code, output_file)
+
+def render_mermaid_to_svg(mermaid_code: str, output_file: str) -> bool:
+    """Render Mermaid diagram to SVG (or reuse a cached render), writing output_file atomically."""
+    return _render_cached(_render_mermaid_to_svg, mermaid_code, output_file, "svg")
+
+def _render_mermaid_to_png(mermaid_code: str, output_file: str) -> bool:
     """
-    Render Mermaid diagram to PNG using Mermaid CLI or Puppeteer (local rendering).
+    Render Mermaid diagram to PNG with the renderer chain (see renderers.py).
     
     Args:
         mermaid_code: Mermaid diagram code
@@ -400,89 +298,10 @@ def render_mermaid_to_png(mermaid_code: str, output_file: str) -> bool:
     Returns:
         Boolean indicating success
     """
-    # First attempt: Try using Mermaid CLI (mmdc) if installed
-    if shutil.which('mmdc'):
-        try:
-            with tempfile.NamedTemporaryFile(suffix='.mmd', mode='w', delete=False) as temp_file:
-                temp_file.write(mermaid_code)
-                temp_file_path = temp_file.name
-            
-            print(f"Attempting to render PNG with Mermaid CLI: {output_file}")
-            result = subprocess.run(
-                ['mmdc', '-i', temp_file_path, '-o', output_file, '-b', 'transparent', '--scale', '2'],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            os.unlink(temp_file_path)
-            
-            if result.returncode == 0 and os.path.exists(output_file):
-                print(f"Successfully generated PNG using Mermaid CLI: {output_file}")
-                return True
-            else:
-                print(f"Mermaid CLI failed: {result.stderr}")
-        except (subprocess.SubprocessError, FileNotFoundError) as e:
-            print(f"Mermaid CLI rendering failed: {e}")
-    
-    # Second attempt: Use Puppeteer to render locally via a Node.js script
-    try:
-        print(f"Attempting to render PNG with Puppeteer: {output_file}")
-        # Create a temporary Node.js script to render Mermaid using Puppeteer
-        node_script = """
-const puppeteer = require('puppeteer');
-const fs = require('fs');
-
-(async () => {
-    const browser = await puppeteer.launch({ headless: true });
-    const page = await browser.newPage();
-    await page.setViewport({ width: 1280, height: 720 });
-    await page.goto('https://mermaid-js.github.io/mermaid-live-editor');
-    
-    // Inject Mermaid code
-    const mermaidCode = `%s`;
-    await page.evaluate((code) => {
-        document.querySelector('#code').value = code;
-        document.querySelector('#code').dispatchEvent(new Event('input'));
-    }, mermaidCode);
-    
-    // Wait for rendering
-    await page.waitForTimeout(2000);
-    
-    // Take screenshot
-    const diagram = await page.$('#container svg');
-    await diagram.screenshot({ path: '%s', type: 'png', omitBackground: true });
-    
-    await browser.close();
-})();
-"""
-        # Replace placeholders with actual values
-        node_script = node_script % (mermaid_code.replace('\n', '\\n'), output_file)
-        
-        # Save the Node.js script to a temporary file
-        with tempfile.NamedTemporaryFile(suffix='.js', mode='w', delete=False) as temp_script:
-            temp_script.write(node_script)
-            temp_script_path = temp_script.name
-        
-        # Run the Node.js script
-        result = subprocess.run(
-            ['node', temp_script_path],
-            capture_output=True,
-            text=True,
-            check=False
-        )
-        
-        os.unlink(temp_script_path)
-        
-        if result.returncode == 0 and os.path.exists(output_file):
-            print(f"Successfully generated PNG using Puppeteer: {output_file}")
-            return True
-        else:
-            print(f"Puppeteer rendering failed: {result.stderr}")
-    except Exception as e:
-        print(f"Failed to render with Puppeteer: {e}")
-    
-    # Final fallback: Create a simple image with the Mermaid code
+    return render_diagram("mermaid", mermaid_code, output_file, "png")
+
+def _render_fallback_png(mermaid_code: str, output_file: str) -> bool:
+    """Final fallback: Create a simple image with the Mermaid code."""
     try:
         print(f"Creating fallback image for: {output_file}")
         img = Image.new('RGB', (800, 600), color=(255, 255, 255))
@@ -503,53 +322,24 @@ const fs = require('fs');
     except Exception as e:
         print(f"Failed to create fallback image: {e}")
         return False
-def render_mermaid_to_svg(mermaid_code: str, output_file: str) -> bool:
-    """Render Mermaid diagram to SVG using Mermaid CLI or Mermaid.ink API."""
-    if shutil.which('mmdc'):
-        try:
-            with tempfile.NamedTemporaryFile(suffix='.mmd', mode='w', delete=False) as temp_file:
-                temp_file.write(mermaid_code)
-                temp_file_path = temp_file.name
-            
-            result = subprocess.run(
-                ['mmdc', '-i', temp_file_path, '-o', output_file, '-e', 'svg', '-b', 'transparent'],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            os.unlink(temp_file_path)
-            
-            if result.returncode == 0:
-                print(f"Successfully generated SVG using Mermaid CLI: {output_file}")
-                return True
-        except (subprocess.SubprocessError, FileNotFoundError) as e:
-            print(f"Mermaid CLI failed for SVG: {e}")
-    
-    try:
-        encoded_mermaid = base64.urlsafe_b64encode(mermaid_code.encode('utf-8')).decode('utf-8')
-        mermaid_url = f"https://mermaid.ink/svg/{encoded_mermaid}"
-        response = requests.get(mermaid_url, timeout=15)
-        if response.status_code == 200:
-            with open(output_file, 'wb') as f:
-                f.write(response.content)
-            print(f"Successfully generated SVG using Mermaid.ink: {output_file}")
-            return True
-        else:
-            print(f"Mermaid.ink API request failed: {response.status_code}")
-    except Exception as e:
-        print(f"Failed to use Mermaid.ink API for SVG: {e}")
-    
+def _render_mermaid_to_svg(mermaid_code: str, output_file: str) -> bool:
+    """Render Mermaid diagram to SVG with the renderer chain (see renderers.py)."""
+    if render_diagram("mermaid", mermaid_code, output_file, "svg"):
+        return True
     print(f"Failed to render SVG: {output_file}")
     return False
+def _polish(mermaid_code: str, polish: bool, openai_client, gpt_version: str) -> str:
+    if polish and openai_client is not None:
+        return polish_mermaid_diagram(mermaid_code, openai_client, gpt_version)
+    return mermaid_code
+
 def generate_architecture_diagram(classes: Dict[str, Any], output_file: str, 
-                                 openai_client=None, gpt_version: str = "gpt-3.5-turbo") -> None:
-    """Generate an architecture diagram and save it as PNG."""
-    mermaid_code = generate_mermaid_architecture_diagram(classes, openai_client, gpt_version)
+                                 openai_client=None, gpt_version: str = "gpt-3.5-turbo", polish: bool = False) -> None:
+    """Generate an architecture diagram from the analysis data (optionally LLM-polished) and save it as PNG."""
+    mermaid_code = _polish(build_mermaid_architecture_diagram(classes), polish, openai_client, gpt_version)
     
     mmd_file = output_file.replace('.png', '.mmd')
-    with open(mmd_file, 'w', encoding='utf-8') as f:
-        f.write(mermaid_code)
+    write_text_atomic(mmd_file, mermaid_code)
     
     print(f"Architecture diagram mermaid code saved to {mmd_file}")
     print(f"Attempting to render PNG to {output_file}")
@@ -561,13 +351,12 @@ def generate_architecture_diagram(classes: Dict[str, Any], output_file: str,
 
 def generate_class_diagram(classes: Dict[str, Any], dependencies: Dict[str, Any],
                           output_file: str, openai_client=None, 
-                          gpt_version: str = "gpt-3.5-turbo") -> None:
-    """Generate a class diagram and save it as PNG."""
-    mermaid_code = generate_mermaid_class_diagram(classes, dependencies, openai_client, gpt_version)
+                          gpt_version: str = "gpt-3.5-turbo", polish: bool = False) -> None:
+    """Generate a class diagram from the analysis data (optionally LLM-polished) and save it as PNG."""
+    mermaid_code = _polish(build_mermaid_class_diagram(classes, dependencies), polish, openai_client, gpt_version)
     
     mmd_file = output_file.replace('.png', '.mmd')
-    with open(mmd_file, 'w', encoding='utf-8') as f:
-        f.write(mermaid_code)
+    write_text_atomic(mmd_file, mermaid_code)
     
     print(f"Class diagram mermaid code saved to {mmd_file}")
     print(f"Attempting to render PNG to {output_file}")
@@ -578,13 +367,12 @@ def generate_class_diagram(classes: Dict[str, Any], dependencies: Dict[str, Any]
         print(f"Failed to render class diagram as PNG: {output_file}")
 
 def generate_component_flow_diagram(data_flow: Dict[str, Any], output_file: str,
-                                   openai_client=None, gpt_version: str = "gpt-3.5-turbo") -> None:
-    """Generate a component flow diagram and save it as PNG."""
-    mermaid_code = generate_mermaid_component_flow_diagram(data_flow, openai_client, gpt_version)
+                                   openai_client=None, gpt_version: str = "gpt-3.5-turbo", polish: bool = False) -> None:
+    """Generate a component flow diagram from the analysis data (optionally LLM-polished) and save it as PNG."""
+    mermaid_code = _polish(build_mermaid_component_flow_diagram(data_flow), polish, openai_client, gpt_version)
     
     mmd_file = output_file.replace('.png', '.mmd')
-    with open(mmd_file, 'w', encoding='utf-8') as f:
-        f.write(mermaid_code)
+    write_text_atomic(mmd_file, mermaid_code)
     
     print(f"Component flow diagram mermaid code saved to {mmd_file}")
     print(f"Attempting to render PNG to {output_file}")
@@ -0,0 +1,77 @@
+// Long-lived Mermaid renderer used by mermaid_renderer.py.
+//
+// Keeps one headless browser open and renders every job of a request on its own page.
+// Protocol: one JSON request per line on stdin
+//   {"id": 1, "jobs": [{"code": "...", "output": "/abs/path.png", "format": "png", "scale": 2, "background": "transparent"}]}
+// and one JSON response per line on stdout
+//   {"id": 1, "results": [{"ok": true}, {"ok": false, "error": "..."}]}
+//
+// Needs puppeteer and mermaid from package.json: npm install
+const fs = require('fs');
+const readline = require('readline');
+const puppeteer = require('puppeteer');
+
+const MERMAID_SCRIPT = require.resolve('mermaid/dist/mermaid.min.js');
+const PAGE_HTML = '<!DOCTYPE html><html><body style="margin:0"><div id="container"></div></body></html>';
+
+let browserPromise = null;
+
+function getBrowser() {
+    if (!browserPromise) {
+        browserPromise = puppeteer.launch({ headless: true, args: ['--no-sandbox', '--disable-dev-shm-usage'] });
+        browserPromise.then((browser) => browser.on('disconnected', () => { browserPromise = null; }),
+                            () => { browserPromise = null; });
+    }
+    return browserPromise;
+}
+
+async function renderJob(job, index) {
+    const browser = await getBrowser();
+    const page = await browser.newPage();
+    try {
+        await page.setViewport({ width: 1280, height: 720, deviceScaleFactor: job.scale || 2 });
+        await page.setContent(PAGE_HTML);
+        await page.addScriptTag({ path: MERMAID_SCRIPT });
+        const svg = await page.evaluate(async (code, id) => {
+            mermaid.initialize({ startOnLoad: false, securityLevel: 'strict' });
+            const { svg } = await mermaid.render(id, code);
+            return svg;
+        }, job.code, `diagram${index}`);
+
+        if (job.format === 'svg') {
+            fs.writeFileSync(job.output, svg);
+            return;
+        }
+        const background = job.background || 'transparent';
+        await page.evaluate((svg, background) => {
+            document.body.style.background = background;
+            document.getElementById('container').innerHTML = svg;
+        }, svg, background);
+        const element = await page.$('#container svg');
+        await element.screenshot({ path: job.output, type: 'png', omitBackground: background === 'transparent' });
+    } finally {
+        await page.close();
+    }
+}
+
+async function handle(line) {
+    const request = JSON.parse(line);
+    const results = await Promise.all(request.jobs.map((job, index) =>
+        renderJob(job, index).then(() => ({ ok: true }),
+                                   (error) => ({ ok: false, error: String((error && error.message) || error) }))
+    ));
+    process.stdout.write(JSON.stringify({ id: request.id, results }) + '\n');
+}
+
+const input = readline.createInterface({ input: process.stdin });
+input.on('line', (line) => {
+    if (line.trim()) {
+        handle(line).catch((error) => process.stderr.write(`mermaid worker: ${error}\n`));
+    }
+});
+input.on('close', async () => {
+    if (browserPromise) {
+        await (await browserPromise).close().catch(() => {});
+    }
+    process.exit(0);
+});
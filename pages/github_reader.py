@@ -1,18 +1,23 @@
 import streamlit as st
 import google.generativeai as genai
 import os
+import time
+import asyncio
+import base64
 from dotenv import load_dotenv
-from readmegen_gemini import generate_readme_from_github_url, generate_class_diagram, generate_usecase_diagram, generate_dependency_graph_diagram, generate_sad
+from readmegen_gemini import generate_readme_from_github_url, generate_class_diagram, generate_usecase_diagram, generate_dependency_graph_diagram, generate_sad_async
 from logzero import logger
 import streamlit_mermaid as stmd
-import requests
 from get_data_github import get_repo_data, get_repo_class, extract_code_structure, extract_for_readme
-from plantuml import PlantUML
+from clone_pool import normalize_url
+from job_queue import JobQueue
+from renderers import get_registry
 
 # Load API key từ .env
 load_dotenv()
 GEMINI_API = os.getenv('GEMINI_API')
 genai.configure(api_key=GEMINI_API)
+JOB_POLL_SECONDS = 1
 
 st.title("GitHub README Generator")
 st.write("Enter a GitHub repository URL to generate a README.")
@@ -36,11 +41,39 @@ with col4:
 with col5:
     generate_sad_docs = st.button("Generate Software Architecture Document")
 
+@st.cache_data(show_spinner=False)
+def render_uml_diagram(uml_code: str) -> bytes:
+    """Render PlantUML code to PNG bytes with the local renderer chain; cached per diagram."""
+    logger.info("Rendering diagram")
+    image = get_registry().render_bytes("plantuml", uml_code, "png")
+    if image is None:
+        # Raising keeps the failure out of the cache, so a later rerun tries again
+        raise RuntimeError("No PlantUML renderer available")
+    return image
+
+def _diagram_link(uml_code: str) -> str:
+    """Image URL for a diagram embedded in the SAD: a renderer server if one may be used, else a data URI."""
+    url = get_registry().image_url("plantuml", uml_code)
+    if url is not None:
+        return url
+    image = get_registry().render_bytes("plantuml", uml_code, "png")
+    return f"data:image/png;base64,{base64.b64encode(image).decode('ascii')}" if image else ""
+
+def show_uml_diagram(title: str, uml_code: str, file_name: str) -> None:
+    st.subheader(title)
+    try:
+        image = render_uml_diagram(uml_code)
+    except RuntimeError as e:
+        st.warning(f"{e}; showing the PlantUML source instead.")
+        st.code(uml_code)
+        return
+    st.image(image)
+    st.download_button('Download Image', image, file_name=file_name)
+
 @st.cache_resource()
-def get_uml_diagram_svg(uml_code):
-    logger.info("Getting diagram from remote")
-    url = PlantUML(url="http://www.plantuml.com/plantuml/img/")
-    return url.get_url(uml_code)
+def get_job_queue():
+    # Shared by every session of this Streamlit process
+    return JobQueue(max_workers=4)
 
 def clear_screen(key_name):
     keys_to_keep = {"url_input", key_name}
@@ -48,77 +81,86 @@ def clear_screen(key_name):
         if key not in keys_to_keep:
             del st.session_state[key]
 
-if generate_readme_button:
-    if url_input.strip():
-        try:
-            clear_screen("github_output")
-            all_code_content = extract_for_readme(url_input)
-            read_me_all = generate_readme_from_github_url(all_code_content)
-            st.session_state.github_output = read_me_all
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
+# Các job chạy nền, không gọi Streamlit bên trong
+def readme_job(url):
+    return generate_readme_from_github_url(extract_for_readme(url))
+
+def class_diagram_job(url):
+    return generate_class_diagram(get_repo_class(url, incremental=True))
+
+def usecase_diagram_job(url):
+    return generate_usecase_diagram(extract_code_structure(url))
+
+def dependency_graph_job(url):
+    return generate_dependency_graph_diagram(extract_code_structure(url))
+
+def sad_job(url):
+    summary = extract_code_structure(url)
+    # Ba diagram chạy song song, sau đó mới tạo SAD
+    # The prompt only gets short placeholders; data URIs would bloat it, so links are filled in afterwards
+    diagrams = {}
+    def placeholder(uml_code):
+        ref = f"diagram-{len(diagrams) + 1}.png"
+        diagrams[ref] = uml_code
+        return ref
+    result = asyncio.run(generate_sad_async(summary, get_repo_class(url, incremental=True), placeholder))
+
+    links = {ref: _diagram_link(uml_code) for ref, uml_code in diagrams.items()}
+    sad = result["sad"]
+    for ref, link in links.items():
+        sad = sad.replace(f"({ref})", f"({link})")
+    return {
+        "sad_usecase": links[result["usecase_url"]],
+        "sad_deploy": links[result["deploy_url"]],
+        "sad_class": links[result["class_url"]],
+        "sad_output": sad
+    }
+
+def start_job(output_key, job_func):
+    """Submit a job for the entered URL; requests for the same URL and output share one job."""
+    url = url_input.strip()
+    if url:
+        clear_screen(output_key)
+        job = get_job_queue().submit((output_key, normalize_url(url)), job_func, url)
+        st.session_state.pending_job = (output_key, job.id)
     else:
         st.warning("Please enter a valid GitHub URL.")
 
+if generate_readme_button:
+    start_job("github_output", readme_job)
+
 if generate_class_diagram_button:
-    if url_input.strip():
-        try:
-            clear_screen("class_output")
-            all_code_content = get_repo_class(url_input)
-            class_content = generate_class_diagram(all_code_content)
-            st.session_state.class_output = class_content
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
-    else:
-        st.warning("Please enter a valid GitHub URL.")
+    start_job("class_output", class_diagram_job)
 
 if generate_usecase_diagram_button:
-    if url_input.strip():
-        try:
-            clear_screen("usecase_output")
-            all_code_content = extract_code_structure(url_input)
-            read_me_all = generate_usecase_diagram(all_code_content)
-            st.session_state.usecase_output = read_me_all
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
-    else:
-        st.warning("Please enter a valid GitHub URL.")
+    start_job("usecase_output", usecase_diagram_job)
 
 if generate_dependency_graph_diagram_button:
-    if url_input.strip():
-        try:
-            clear_screen("graph_output")
-            all_code_content = extract_code_structure(url_input)
-            read_me_all = generate_dependency_graph_diagram(all_code_content)
-            st.session_state.graph_output = read_me_all
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
-    else:
-        st.warning("Please enter a valid GitHub URL.")
+    start_job("graph_output", dependency_graph_job)
 
 if generate_sad_docs:
-    if url_input.strip():
+    start_job("sad_output", sad_job)
+
+# Poll the background job; the script thread only sleeps between reruns
+if "pending_job" in st.session_state:
+    output_key, job_id = st.session_state.pending_job
+    job = get_job_queue().get(job_id)
+    if job is None:
+        del st.session_state.pending_job
+        st.warning("The job has expired, please try again.")
+    elif not job.done():
+        st.info(f"Job {job.status}, this page refreshes automatically...")
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+    else:
+        del st.session_state.pending_job
         try:
-            clear_screen("sad_output")
-            summary = extract_code_structure(url_input)
-            usecase_code = generate_usecase_diagram(summary)
-            deploy_code = generate_dependency_graph_diagram(summary)
-            class_code = generate_class_diagram(get_repo_class(url_input))
-
-            # Lấy URL cho các diagram
-            usecase_url = get_uml_diagram_svg(usecase_code)
-            deploy_url = get_uml_diagram_svg(deploy_code)
-            class_url = get_uml_diagram_svg(class_code)
-
-            # Lưu các URL vào session_state
-            st.session_state.sad_usecase = usecase_url
-            st.session_state.sad_deploy = deploy_url
-            st.session_state.sad_class = class_url
-
-            # Tạo và lưu SAD
-            sad_doc = generate_sad(summary, usecase_url, deploy_url, class_url)
-            st.session_state.sad_output = sad_doc
-
+            result = job.result()
+            if output_key == "sad_output":
+                # Lưu các URL và SAD vào session_state
+                st.session_state.update(result)
+            else:
+                st.session_state[output_key] = result
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
@@ -127,25 +169,13 @@ if "github_output" in st.session_state:
     st.markdown(st.session_state.github_output)
 
 if "class_output" in st.session_state:
-    st.subheader("Generated Class Diagram:")
-    img_url = get_uml_diagram_svg(st.session_state.class_output)
-    img_response = requests.get(img_url)
-    st.image(img_response.content)
-    st.download_button('Download Image', img_response.content, file_name='class_diagram.png')
+    show_uml_diagram("Generated Class Diagram:", st.session_state.class_output, 'class_diagram.png')
 
 if "usecase_output" in st.session_state:
-    st.subheader("Generated Use Case Diagram:")
-    img_url = get_uml_diagram_svg(st.session_state.usecase_output)
-    img_response = requests.get(img_url)
-    st.image(img_response.content)
-    st.download_button('Download Image', img_response.content, file_name='usecase.png')
+    show_uml_diagram("Generated Use Case Diagram:", st.session_state.usecase_output, 'usecase.png')
 
 if "graph_output" in st.session_state:
-    st.subheader("Generated Deployment Diagram:")
-    img_url = get_uml_diagram_svg(st.session_state.graph_output)
-    img_response = requests.get(img_url)
-    st.image(img_response.content)
-    st.download_button('Download Image', img_response.content, file_name='dependency_graph.png')
+    show_uml_diagram("Generated Deployment Diagram:", st.session_state.graph_output, 'dependency_graph.png')
 
 if "sad_output" in st.session_state:
     st.subheader("Generated SAD:")
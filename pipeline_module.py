@@ -2,8 +2,19 @@ import os
 import json
 from code_process import preprocess_code
 from planning import PaperPlanner
-from analyzing import CodeAnalyzer
+from analyzing import AnalysisCache, CodeAnalyzer
 from makepaper import PaperGenerator
+from llm_client import llm_stats
+from diagram_cache import get_diagram_cache
+
+# Shared across pipeline runs so repeated uploads of the same file skip analysis
+_analysis_cache = None
+
+def get_analysis_cache() -> AnalysisCache:
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache()
+    return _analysis_cache
 
 class CodeToDocPipeline:
     def __init__(self, input_file: str, output_dir: str, paper_name: str, gpt_version: str = "gpt-3.5-turbo"):
@@ -27,8 +38,11 @@ class CodeToDocPipeline:
 
     def analyze(self):
         print("[*] Analyzing code quality & complexity...")
-        analyzer = CodeAnalyzer()
+        cache = get_analysis_cache()
+        hits = cache.hits
+        analyzer = CodeAnalyzer(cache=cache)
         results = analyzer.analyze_file(self.cleaned_file)
+        print(f"[*] Analysis cache {'hit' if cache.hits > hits else 'miss'} ({cache.stats()})")
 
         with open(self.analysis_file, 'w', encoding='utf-8') as f:
             json.dump(results, f, indent=2)
@@ -64,6 +78,11 @@ class CodeToDocPipeline:
             gpt_version=self.gpt_version
         )
         paper = generator.generate_paper()
+        stats = llm_stats()
+        print(f"[*] LLM response cache {stats['cache']}, coalesced requests {stats['single_flight']}")
+        diagram_cache = get_diagram_cache()
+        if diagram_cache is not None:
+            print(f"[*] Diagram cache {diagram_cache.stats()}")
         markdown_path = generator.save_paper_markdown(paper)
         tex_path = generator.save_paper_tex(paper)
         generator.save_paper_pdf(tex_path)
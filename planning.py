@@ -13,6 +13,7 @@ import ast
 import re
 from typing import Dict, List, Any, Optional
 import openai
+from llm_client import cached_chat_client
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -23,7 +24,7 @@ class PaperPlanner:
     def __init__(self, paper_name: str, gpt_version: str):
         self.paper_name = paper_name
         self.gpt_version = gpt_version
-        self.openai_client = openai.OpenAI(api_key = os.environ["OPENAI_API_KEY"])
+        self.openai_client = cached_chat_client(openai.OpenAI(api_key = os.environ["OPENAI_API_KEY"]))
         
     def analyze_code_structure(self, python_file: str) -> Dict[str, Any]:
         """
@@ -3,7 +3,10 @@ import google.generativeai as genai
 # import re
 genai.configure(api_key="")
 import json
-model = genai.GenerativeModel("gemini-2.0-flash-lite")
+from llm_client import cached_generative_model
+import asyncio
+from typing import Callable, Dict
+model = cached_generative_model(genai.GenerativeModel("gemini-2.0-flash-lite"))
 
 def clean_readme_output(text: str) -> str:
     lines = text.strip().splitlines()
@@ -24,6 +27,15 @@ def clean_markdown_fence(text: str) -> str:
         lines[-1] = lines[-1].replace('```"""', '').strip()
     return '\n'.join(lines).strip()
 
+def _clean_diagram(text: str) -> str:
+    diagram_code = text.strip().strip('"').strip("'")
+    diagram_code = clean_readme_output(diagram_code)
+    return diagram_code.rstrip('\n```')
+
+def _clean_sad(text: str) -> str:
+    sad_markdown = text.strip().strip('"').strip("'")
+    return clean_readme_output(sad_markdown)
+
 def generate_readme_from_github_url(code : str) -> str:
     # with open(filename, "r") as f:
     #     code = f.read()
@@ -77,10 +89,10 @@ Here is the code:
     except Exception as e:
         return f'"""[ERROR generating docstring: {str(e)}]"""'
 
-def generate_class_diagram(code):
-    with open('class_list_enhanced.json', 'r') as f:
-        data = json.load(f)
-    prompt = f'''
+def _class_diagram_prompt(code) -> str:
+    # code là list class từ get_repo_class (hoặc chuỗi JSON sẵn có)
+    data = code if isinstance(code, str) else json.dumps(code, indent=2)
+    return f'''
 I have a list of Python classes in JSON format. Each class includes:
 - "name": class name
 - "attributes": list of attribute names
@@ -101,21 +113,20 @@ Here is the JSON:
 ```json
 {data}
     '''
+
+def generate_class_diagram(code) -> str:
     try:
-        response = model.generate_content(prompt)
-        mermaid_class_code = response.text.strip().strip('"').strip("'")
-        mermaid_class_code = clean_readme_output(mermaid_class_code)
-        mermaid_class_code = mermaid_class_code.rstrip('\n```')
-        return f'{mermaid_class_code}'
+        response = model.generate_content(_class_diagram_prompt(code))
+        return _clean_diagram(response.text)
     except Exception as e:
         return f'"""[ERROR generating docstring: {str(e)}]"""'
 
 
-def generate_usecase_diagram(code : str) -> str:
+def _usecase_diagram_prompt(code : str) -> str:
     # with open(filename, "r") as f:
     #     code = f.read()
 
-    prompt = f'''
+    return f'''
 You are a software architect assistant.
 
 Given this JSON summary of a Python codebase, Generate the use case diagram.
@@ -129,21 +140,20 @@ Here is the JSON summary of the codebase:
 {code}
 
     '''
+
+def generate_usecase_diagram(code : str) -> str:
     try:
-        response = model.generate_content(prompt)
-        usecase_code= response.text.strip().strip('"').strip("'")
-        usecase_code= clean_readme_output(usecase_code)
-        usecase_code=usecase_code.rstrip('\n```')
-        return f'{usecase_code}'
+        response = model.generate_content(_usecase_diagram_prompt(code))
+        return _clean_diagram(response.text)
     except Exception as e:
         return f'"""[ERROR generating docstring: {str(e)}]"""'
 
 
-def generate_dependency_graph_diagram(code : str) -> str:
+def _dependency_graph_prompt(code : str) -> str:
     # with open(filename, "r") as f:
     #     code = f.read()
 
-    prompt = f'''
+    return f'''
     You are a software architecture assistant.
 
     Generate a **Deployment Diagram** using **PlantUML**, using only built-in syntax (`node`, `component`, `database`, `artifact`). 
@@ -176,19 +186,17 @@ def generate_dependency_graph_diagram(code : str) -> str:
     Here is the system summary in JSON format:
     {code}
     '''
- 
+
+def generate_dependency_graph_diagram(code : str) -> str:
     try:
-        response = model.generate_content(prompt)
-        usecase_code= response.text.strip().strip('"').strip("'")
-        usecase_code= clean_readme_output(usecase_code)
-        usecase_code=usecase_code.rstrip('\n```')
-        return f'{usecase_code}'
+        response = model.generate_content(_dependency_graph_prompt(code))
+        return _clean_diagram(response.text)
     except Exception as e:
         return f'"""[ERROR generating docstring: {str(e)}]"""'
     
 
-def generate_sad(summary: str, usecase_url: str, deploy_url: str, class_url: str) -> str:
-    prompt = f'''
+def _sad_prompt(summary: str, usecase_url: str, deploy_url: str, class_url: str) -> str:
+    return f'''
 You are a software architect assistant.
 
 Given the following **JSON summary of a Python codebase**, generate a **Software Architecture Document (SAD)** in **pure markdown**, based on the following structure (from a real-world software architecture PDF):
@@ -237,10 +245,84 @@ Show the deployment diagram:
 System summary:
 {summary}
 '''
+
+def generate_sad(summary: str, usecase_url: str, deploy_url: str, class_url: str) -> str:
     try:
-        response = model.generate_content(prompt)
-        sad_markdown = response.text.strip().strip('"').strip("'")
-        sad_markdown = clean_readme_output(sad_markdown)
-        return f'{sad_markdown}'
+        response = model.generate_content(_sad_prompt(summary, usecase_url, deploy_url, class_url))
+        return _clean_sad(response.text)
     except Exception as e:
-        return f'[ERROR generating SAD: {str(e)}]'
\ No newline at end of file
+        return f'[ERROR generating SAD: {str(e)}]'
+
+
+# Phiên bản async: các diagram độc lập chạy song song, SAD chạy sau cùng
+MAX_CONCURRENT_REQUESTS = 3
+
+DIAGRAM_ERROR = '"""[ERROR generating docstring: {}]"""'
+SAD_ERROR = '[ERROR generating SAD: {}]'
+
+async def _generate_async(prompt: str, clean: Callable[[str], str], error_format: str,
+                          semaphore: asyncio.Semaphore, llm=None) -> str:
+    """
+    Run one prompt through generate_content_async, bounded by semaphore.
+
+    Args:
+        prompt: Prompt text.
+        clean: Post-processing applied to the response text.
+        error_format: Error string returned when the call fails, formatted with the exception.
+        semaphore: Limits the number of requests in flight.
+        llm: Model exposing generate_content_async; defaults to the module model.
+
+    Returns:
+        The cleaned response, or an error string like the sync generators.
+    """
+    async with semaphore:
+        try:
+            response = await (llm or model).generate_content_async(prompt)
+            return clean(response.text)
+        except Exception as e:
+            return error_format.format(str(e))
+
+async def generate_diagrams_async(summary, class_list, max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                                  llm=None) -> Dict[str, str]:
+    """
+    Generate the use case, deployment and class diagrams concurrently.
+
+    Args:
+        summary: Output of extract_code_structure.
+        class_list: Output of get_repo_class.
+        max_concurrency: Maximum number of Gemini requests in flight.
+        llm: Model exposing generate_content_async; defaults to the module model.
+
+    Returns:
+        Dict with the PlantUML code under "usecase", "deploy" and "class".
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    usecase, deploy, class_code = await asyncio.gather(
+        _generate_async(_usecase_diagram_prompt(summary), _clean_diagram, DIAGRAM_ERROR, semaphore, llm),
+        _generate_async(_dependency_graph_prompt(summary), _clean_diagram, DIAGRAM_ERROR, semaphore, llm),
+        _generate_async(_class_diagram_prompt(class_list), _clean_diagram, DIAGRAM_ERROR, semaphore, llm),
+    )
+    return {"usecase": usecase, "deploy": deploy, "class": class_code}
+
+async def generate_sad_async(summary, class_list, diagram_url: Callable[[str], str],
+                             max_concurrency: int = MAX_CONCURRENT_REQUESTS, llm=None) -> Dict[str, str]:
+    """
+    Generate the three diagrams concurrently, then the SAD that embeds them.
+
+    Args:
+        summary: Output of extract_code_structure.
+        class_list: Output of get_repo_class.
+        diagram_url: Turns PlantUML code into an image URL for the SAD.
+        max_concurrency: Maximum number of Gemini requests in flight.
+        llm: Model exposing generate_content_async; defaults to the module model.
+
+    Returns:
+        Dict with "usecase_url", "deploy_url", "class_url" and the "sad" markdown.
+    """
+    diagrams = await generate_diagrams_async(summary, class_list, max_concurrency, llm)
+    urls = {f"{key}_url": diagram_url(code) for key, code in diagrams.items()}
+    sad = await _generate_async(
+        _sad_prompt(summary, urls["usecase_url"], urls["deploy_url"], urls["class_url"]),
+        _clean_sad, SAD_ERROR, asyncio.Semaphore(1), llm
+    )
+    return {**urls, "sad": sad}
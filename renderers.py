@@ -0,0 +1,374 @@
+"""
+Diagram Renderer Registry
+
+Every diagram language (Mermaid, PlantUML) has an ordered chain of renderer
+backends. The default chain only uses local renderers: the persistent browser
+worker with the bundled mermaid.js, the Mermaid CLI, and a PlantUML command/jar
+or a self-hosted PlantUML server. Public web renderers stay in the chain but are
+skipped unless RENDER_ALLOW_NETWORK is set. Each backend has its own timeout and
+a circuit breaker, so a renderer that keeps failing or hanging is skipped for a
+while instead of stalling every diagram.
+"""
+
+import os
+import time
+import shutil
+import base64
+import tempfile
+import threading
+import subprocess
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from mermaid_renderer import get_renderer
+
+PLANTUML_PUBLIC_URL = "http://www.plantuml.com/plantuml"
+
+
+def network_enabled() -> bool:
+    """Whether renderers that call public web services may be used (RENDER_ALLOW_NETWORK)."""
+    return os.getenv("RENDER_ALLOW_NETWORK", "").lower() in ("1", "true", "yes", "on")
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for reset_after
+    seconds; then a single trial call is let through (half-open) and decides whether the
+    circuit closes again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_after: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: restart the timer so only this caller gets the trial
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+
+
+class RendererBackend(ABC):
+    """
+    A named way of rendering one diagram language to a PNG or SVG file.
+
+    Subclasses implement render; a backend missing it cannot be instantiated.
+    """
+
+    name = "backend"
+    network = False
+
+    def __init__(self, timeout: float = 30, failure_threshold: int = 3, reset_after: float = 60):
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+
+    def available(self) -> bool:
+        """Whether the backend is installed or configured; unavailable backends are skipped."""
+        return True
+
+    @abstractmethod
+    def render(self, code: str, output_file: str, fmt: str) -> bool:
+        """Write the rendered diagram to output_file and return whether it succeeded."""
+
+
+class MermaidWorkerBackend(RendererBackend):
+    """Persistent browser worker (mermaid_worker.js) rendering with the locally installed mermaid.js."""
+
+    name = "mermaid-worker"
+
+    def available(self) -> bool:
+        return get_renderer() is not None
+
+    def render(self, code: str, output_file: str, fmt: str) -> bool:
+        renderer = get_renderer()
+        renderer.timeout = self.timeout
+        return renderer.render(code, output_file, fmt, scale=2)
+
+
+class MermaidCliBackend(RendererBackend):
+    """Mermaid CLI (mmdc); starts a browser per diagram."""
+
+    name = "mmdc"
+
+    def available(self) -> bool:
+        return shutil.which('mmdc') is not None
+
+    def render(self, code: str, output_file: str, fmt: str) -> bool:
+        with tempfile.NamedTemporaryFile(suffix='.mmd', mode='w', delete=False) as temp_file:
+            temp_file.write(code)
+            temp_file_path = temp_file.name
+        try:
+            args = ['-e', 'svg', '-b', 'transparent'] if fmt == 'svg' else ['-b', 'transparent', '--scale', '2']
+            result = subprocess.run(
+                ['mmdc', '-i', temp_file_path, '-o', output_file] + args,
+                capture_output=True, text=True, check=False, timeout=self.timeout
+            )
+        finally:
+            os.unlink(temp_file_path)
+        if result.returncode != 0:
+            print(f"Mermaid CLI failed: {result.stderr}")
+        return result.returncode == 0
+
+
+class MermaidLiveEditorBackend(RendererBackend):
+    """Puppeteer script driving the public Mermaid live editor (PNG only)."""
+
+    name = "mermaid-live-editor"
+    network = True
+
+    NODE_SCRIPT = """
+const puppeteer = require('puppeteer');
+
+(async () => {
+    const browser = await puppeteer.launch({ headless: true });
+    const page = await browser.newPage();
+    await page.setViewport({ width: 1280, height: 720 });
+    await page.goto('https://mermaid-js.github.io/mermaid-live-editor');
+
+    // Inject Mermaid code
+    const mermaidCode = `%s`;
+    await page.evaluate((code) => {
+        document.querySelector('#code').value = code;
+        document.querySelector('#code').dispatchEvent(new Event('input'));
+    }, mermaidCode);
+
+    // Wait for rendering
+    await page.waitForTimeout(2000);
+
+    // Take screenshot
+    const diagram = await page.$('#container svg');
+    await diagram.screenshot({ path: '%s', type: 'png', omitBackground: true });
+
+    await browser.close();
+})();
+"""
+
+    def available(self) -> bool:
+        return shutil.which('node') is not None
+
+    def render(self, code: str, output_file: str, fmt: str) -> bool:
+        if fmt != 'png':
+            return False
+        node_script = self.NODE_SCRIPT % (code.replace('\n', '\\n'), output_file)
+        with tempfile.NamedTemporaryFile(suffix='.js', mode='w', delete=False) as temp_script:
+            temp_script.write(node_script)
+            temp_script_path = temp_script.name
+        try:
+            result = subprocess.run(['node', temp_script_path], capture_output=True, text=True,
+                                    check=False, timeout=self.timeout)
+        finally:
+            os.unlink(temp_script_path)
+        if result.returncode != 0:
+            print(f"Puppeteer rendering failed: {result.stderr}")
+        return result.returncode == 0
+
+
+class HttpRendererBackend(RendererBackend):
+    """Renderer behind an HTTP GET that returns the image for an encoded diagram."""
+
+    @abstractmethod
+    def url(self, code: str, fmt: str) -> str:
+        """URL that returns the rendered diagram."""
+
+    def render(self, code: str, output_file: str, fmt: str) -> bool:
+        import requests
+
+        response = requests.get(self.url(code, fmt), timeout=self.timeout)
+        if response.status_code != 200:
+            print(f"{self.name} request failed: {response.status_code}")
+            return False
+        with open(output_file, 'wb') as f:
+            f.write(response.content)
+        return True
+
+
+class MermaidInkBackend(HttpRendererBackend):
+    """Public mermaid.ink service."""
+
+    name = "mermaid.ink"
+    network = True
+
+    def url(self, code: str, fmt: str) -> str:
+        encoded = base64.urlsafe_b64encode(code.encode('utf-8')).decode('utf-8')
+        return f"https://mermaid.ink/{'svg' if fmt == 'svg' else 'img'}/{encoded}"
+
+
+class PlantUMLServerBackend(HttpRendererBackend):
+    """PlantUML server: a self-hosted one (PLANTUML_SERVER_URL) or, as a network backend, plantuml.com."""
+
+    def __init__(self, name: str, base_url: Optional[str], network: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.network = network
+
+    def available(self) -> bool:
+        return self.base_url is not None
+
+    def url(self, code: str, fmt: str) -> str:
+        from plantuml import deflate_and_encode
+
+        return f"{self.base_url}/{fmt}/{deflate_and_encode(code)}"
+
+
+class PlantUMLCommandBackend(RendererBackend):
+    """Local PlantUML: the `plantuml` command, or `java -jar $PLANTUML_JAR`."""
+
+    name = "plantuml-local"
+
+    def command(self) -> Optional[List[str]]:
+        if shutil.which('plantuml'):
+            return ['plantuml']
+        jar = os.getenv("PLANTUML_JAR")
+        if jar and os.path.exists(jar) and shutil.which('java'):
+            return ['java', '-Djava.awt.headless=true', '-jar', jar]
+        return None
+
+    def available(self) -> bool:
+        return self.command() is not None
+
+    def render(self, code: str, output_file: str, fmt: str) -> bool:
+        result = subprocess.run(self.command() + ['-pipe', f'-t{fmt}'], input=code.encode('utf-8'),
+                                capture_output=True, check=False, timeout=self.timeout)
+        if result.returncode != 0 or not result.stdout:
+            print(f"PlantUML failed: {result.stderr.decode('utf-8', 'replace')}")
+            return False
+        with open(output_file, 'wb') as f:
+            f.write(result.stdout)
+        return True
+
+
+class RendererRegistry:
+    """Ordered renderer chains per diagram language ("mermaid", "plantuml")."""
+
+    def __init__(self):
+        self._chains: Dict[str, List[RendererBackend]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, backend: RendererBackend, position: Optional[int] = None) -> None:
+        """Add a backend to the chain of kind, at the end or at position."""
+        if not isinstance(backend, RendererBackend):
+            raise TypeError(f"{backend!r} is not a RendererBackend")
+        with self._lock:
+            chain = self._chains.setdefault(kind, [])
+            chain.insert(len(chain) if position is None else position, backend)
+
+    def backends(self, kind: str) -> List[RendererBackend]:
+        with self._lock:
+            return list(self._chains.get(kind, []))
+
+    def get(self, kind: str, name: str) -> Optional[RendererBackend]:
+        return next((backend for backend in self.backends(kind) if backend.name == name), None)
+
+    def render(self, kind: str, code: str, output_file: str, fmt: str = "png",
+               allow_network: Optional[bool] = None) -> bool:
+        """
+        Render a diagram with the first backend of the chain that succeeds.
+
+        Args:
+            kind: Diagram language.
+            code: Diagram source.
+            output_file: Target image path.
+            fmt: "png" or "svg".
+            allow_network: Also try public web renderers (defaults to RENDER_ALLOW_NETWORK).
+
+        Returns:
+            bool: Whether any backend rendered the diagram.
+        """
+        allow_network = network_enabled() if allow_network is None else allow_network
+        for backend in self.backends(kind):
+            if backend.network and not allow_network:
+                continue
+            if not backend.available():
+                continue
+            if not backend.breaker.allow():
+                print(f"Skipping {backend.name}: circuit open after repeated failures")
+                continue
+
+            start = time.perf_counter()
+            try:
+                success = backend.render(code, output_file, fmt) and os.path.exists(output_file) \
+                    and os.path.getsize(output_file) > 0
+            except subprocess.TimeoutExpired:
+                print(f"{backend.name} timed out after {backend.timeout}s")
+                success = False
+            except Exception as e:
+                print(f"{backend.name} failed: {e}")
+                success = False
+            backend.breaker.record(success)
+            if success:
+                print(f"Rendered {fmt.upper()} with {backend.name} in {time.perf_counter() - start:.2f}s: {output_file}")
+                return True
+        return False
+
+    def render_bytes(self, kind: str, code: str, fmt: str = "png",
+                     allow_network: Optional[bool] = None) -> Optional[bytes]:
+        """Render a diagram and return the image bytes, or None if no backend could."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_file = os.path.join(temp_dir, f"diagram.{fmt}")
+            if not self.render(kind, code, output_file, fmt, allow_network):
+                return None
+            with open(output_file, 'rb') as f:
+                return f.read()
+
+    def image_url(self, kind: str, code: str, fmt: str = "png",
+                  allow_network: Optional[bool] = None) -> Optional[str]:
+        """URL of the diagram on the first usable HTTP backend, for embedding in documents."""
+        allow_network = network_enabled() if allow_network is None else allow_network
+        for backend in self.backends(kind):
+            if isinstance(backend, HttpRendererBackend) and backend.available() \
+                    and (allow_network or not backend.network) and not backend.breaker.is_open:
+                return backend.url(code, fmt)
+        return None
+
+
+def default_registry() -> RendererRegistry:
+    """Build the default chains: local renderers first, network renderers last."""
+    registry = RendererRegistry()
+    registry.register("mermaid", MermaidWorkerBackend(timeout=60))
+    registry.register("mermaid", MermaidCliBackend(timeout=60))
+    registry.register("mermaid", MermaidLiveEditorBackend(timeout=30))
+    registry.register("mermaid", MermaidInkBackend(timeout=15))
+    registry.register("plantuml", PlantUMLCommandBackend(timeout=30))
+    registry.register("plantuml", PlantUMLServerBackend("plantuml-server", os.getenv("PLANTUML_SERVER_URL"), timeout=15))
+    registry.register("plantuml", PlantUMLServerBackend("plantuml.com", PLANTUML_PUBLIC_URL, network=True, timeout=15))
+    return registry
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> RendererRegistry:
+    """Return the process-wide renderer registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = default_registry()
+        return _registry
+
+
+def render_diagram(kind: str, code: str, output_file: str, fmt: str = "png") -> bool:
+    """Render a diagram with the process-wide registry."""
+    return get_registry().render(kind, code, output_file, fmt)
@@ -0,0 +1,119 @@
+import ast
+import json
+import os
+import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzing import AnalysisCache, ASTIndex, CodeAnalyzer, RepositorySummary, _analyze_path, analyze_directory
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example", "transformer.py")
+
+
+def test_ast_index_matches_ast_walk_order():
+    with open(EXAMPLE_FILE, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    index = ASTIndex(tree)
+
+    walked = [node for node in ast.walk(tree) if isinstance(node, (ast.ClassDef, ast.FunctionDef))]
+    assert index.nodes(ast.ClassDef, ast.FunctionDef) == walked
+    assert index.nodes(ast.Call) == [node for node in ast.walk(tree) if isinstance(node, ast.Call)]
+
+
+def test_ast_index_tracks_parents_and_scopes():
+    tree = ast.parse("class A:\n    def f(self):\n        def g():\n            return 1\n        return g()\n")
+    index = ASTIndex(tree)
+    class_node = index.nodes(ast.ClassDef)[0]
+    f_node, g_node = index.nodes(ast.FunctionDef)
+    inner_return = g_node.body[0]
+
+    assert index.parents[f_node] is class_node
+    assert index.enclosing_class[inner_return] is class_node
+    assert list(index.enclosing_functions(inner_return)) == [g_node, f_node]
+    assert index.caller_scope[index.nodes(ast.Call)[0]] == "A.f"
+    assert index.caller_scope[inner_return] == "A.f"
+
+
+def test_class_complexity_lists_attributes_and_bases(tmp_path):
+    path = tmp_path / "shapes.py"
+    path.write_text(
+        "import abc\n\n"
+        "class Shape(abc.ABC):\n    sides: int = 0\n\n"
+        "class Square(Shape, Mixin):\n    def __init__(self, size):\n        self.size = size\n"
+        "        self.area: int = size * size\n        other.x = 1\n"
+    )
+    classes = CodeAnalyzer().analyze_file(str(path))["complexity"]["classes"]
+
+    assert classes["Shape"]["inherits_from"] == ["ABC"]
+    assert classes["Shape"]["attributes"] == [{"name": "sides"}]
+    assert classes["Square"]["inherits_from"] == ["Shape", "Mixin"]
+    assert classes["Square"]["attributes"] == [{"name": "size"}, {"name": "area"}]
+
+
+def test_analyze_file_parses_source_once(monkeypatch):
+    calls = []
+    original_parse = ast.parse
+
+    def counting_parse(*args, **kwargs):
+        calls.append(args)
+        return original_parse(*args, **kwargs)
+
+    monkeypatch.setattr(ast, "parse", counting_parse)
+    results = CodeAnalyzer().analyze_file(EXAMPLE_FILE)
+
+    assert len(calls) == 1
+    assert results["metrics"]["class_count"] == len(results["complexity"]["classes"])
+
+
+def test_analyze_directory_merges_per_file_results(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    shutil.copy(EXAMPLE_FILE, repo / "pkg" / "transformer.py")
+    (repo / "broken.py").write_text("def broken(:\n", encoding='utf-8')
+    output_file = tmp_path / "analysis.json"
+
+    summary = analyze_directory(str(repo), str(output_file), jobs=2)
+
+    with open(output_file, 'r', encoding='utf-8') as f:
+        merged = json.load(f)
+    expected = CodeAnalyzer().analyze_file(str(repo / "pkg" / "transformer.py"))
+    assert merged["files"][os.path.join("pkg", "transformer.py")] == expected
+    assert "error" in merged["files"]["broken.py"]
+    assert merged["summary"] == summary
+    assert summary["analyzed_files"] == 1
+    assert summary["complexity"]["total_cyclomatic"] == expected["complexity"]["overall"]["total_cyclomatic"]
+
+
+def test_unanalyzable_files_are_reported_as_skipped(tmp_path, monkeypatch):
+    path = tmp_path / "broken.py"
+    path.write_text("x = 1\n")
+    summary = RepositorySummary()
+    for error in (ValueError("source code string cannot contain null bytes"),
+                  RecursionError("maximum recursion depth exceeded")):
+        def raise_error(self, file_path, error=error):
+            raise error
+
+        monkeypatch.setattr(CodeAnalyzer, "analyze_file", raise_error)
+        summary.add(type(error).__name__, _analyze_path(str(path)))
+    monkeypatch.undo()
+    summary.add("ok.py", _analyze_path(str(path)))
+
+    result = summary.to_dict()
+    assert [entry["file"] for entry in result["skipped_files"]] == ["ValueError", "RecursionError"]
+    assert result["skipped_files"][1]["error"].startswith("RecursionError")
+    assert result["file_count"] == 3 and result["analyzed_files"] == 1
+    assert result["failed_files"] == []
+
+
+def test_analysis_cache_hits_and_evicts(tmp_path):
+    cache = AnalysisCache(cache_dir=str(tmp_path / "cache"))
+    first = CodeAnalyzer(cache=cache).analyze_file(EXAMPLE_FILE)
+    second = CodeAnalyzer(cache=cache).analyze_file(EXAMPLE_FILE)
+
+    assert second == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.max_bytes = 0
+    cache.put("x = 1\n", {"metrics": {}})
+    assert os.listdir(cache.cache_dir) == []
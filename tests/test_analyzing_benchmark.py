@@ -0,0 +1,71 @@
+import ast
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzing import ASTIndex, CodeAnalyzer
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example", "transformer.py")
+
+# Timing-based and slow, so only run on request: RUN_BENCHMARKS=1 pytest tests/test_analyzing_benchmark.py
+pytestmark = pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run benchmarks")
+
+
+def replicate_example(tmp_path, target_lines: int) -> str:
+    """Write example/transformer.py repeated until the file reaches target_lines."""
+    with open(EXAMPLE_FILE, 'r', encoding='utf-8') as f:
+        source = f.read().rstrip('\n') + '\n\n'
+    copies = max(1, target_lines // len(source.splitlines()))
+    path = tmp_path / f"transformer_{target_lines}.py"
+    path.write_text(source * copies, encoding='utf-8')
+    return str(path)
+
+
+def time_dependencies(file_path: str) -> float:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    analyzer = CodeAnalyzer()
+    analyzer.index = ASTIndex(tree)
+
+    start = time.perf_counter()
+    analyzer.analyze_dependencies(tree)
+    elapsed = time.perf_counter() - start
+    assert analyzer.dependencies.number_of_edges() > 0
+    return elapsed
+
+
+@pytest.mark.parametrize("target_lines", [50000])
+def test_analyze_dependencies_scales_linearly(tmp_path, record_property, target_lines):
+    small = time_dependencies(replicate_example(tmp_path, target_lines // 10))
+    large = time_dependencies(replicate_example(tmp_path, target_lines))
+    record_property("seconds_small", small)
+    record_property("seconds_large", large)
+
+    # Ten times the input should cost about ten times as much; quadratic
+    # caller resolution would be closer to a hundred.
+    assert large < max(small, 0.05) * 30
+
+
+@pytest.mark.parametrize("target_lines", [50000])
+def test_analyze_file_scales_linearly(tmp_path, record_property, target_lines):
+    def time_analysis(file_path: str) -> float:
+        start = time.perf_counter()
+        results = CodeAnalyzer().analyze_file(file_path)
+        assert results["data_flow"]["exit_points"]
+        return time.perf_counter() - start
+
+    small = time_analysis(replicate_example(tmp_path, target_lines // 10))
+    large = time_analysis(replicate_example(tmp_path, target_lines))
+    record_property("seconds_small", small)
+    record_property("seconds_large", large)
+
+    assert large < max(small, 0.05) * 30
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("RUN_BENCHMARKS", "1")
+    pytest.main([__file__])
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diagram_cache import DiagramCache, diagram_key
+
+
+def test_key_covers_everything_that_changes_the_image():
+    base = diagram_key("graph LR", "png", 2, "transparent")
+    assert base == diagram_key("graph LR", "png", 2, "transparent")
+    assert len({base, diagram_key("graph TD", "png", 2, "transparent"), diagram_key("graph LR", "svg", 2, "transparent"),
+                diagram_key("graph LR", "png", 1, "transparent"), diagram_key("graph LR", "png", 2, "white")}) == 5
+
+
+def test_hit_links_stored_render_into_place(tmp_path):
+    cache = DiagramCache(str(tmp_path / "cache"))
+    key = diagram_key("graph LR", "png")
+    figures = tmp_path / "figures"
+    figures.mkdir()
+    assert not cache.fetch(key, "png", str(figures / "a.png"))
+
+    rendered = figures / "a.png"
+    rendered.write_bytes(b"png bytes")
+    cache.store(key, "png", str(rendered))
+
+    other_run = tmp_path / "other"
+    other_run.mkdir()
+    assert cache.fetch(key, "png", str(other_run / "a.png"))
+    assert (other_run / "a.png").read_bytes() == b"png bytes"
+    assert os.path.samefile(other_run / "a.png", cache.path(key, "png"))
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiagramCache(str(tmp_path / "cache"), max_bytes=35)
+    source = tmp_path / "render.png"
+    keys = [diagram_key(f"graph {i}", "png") for i in range(3)]
+    for i, key in enumerate(keys):
+        source.write_bytes(b"x" * 10)
+        cache.store(key, "png", str(source))
+        os.utime(cache.path(key, "png"), (1000 + i, 1000 + i))
+        source.unlink()
+
+    cache.fetch(keys[0], "png", str(tmp_path / "used.png"))
+    source.write_bytes(b"x" * 10)
+    cache.store(diagram_key("graph new", "png"), "png", str(source))
+
+    remaining = [key for key in keys if os.path.exists(cache.path(key, "png"))]
+    assert remaining == [keys[0], keys[2]]
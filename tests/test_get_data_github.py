@@ -0,0 +1,397 @@
+import ast
+import json
+import os
+import sys
+import threading
+
+import pytest
+from git import Actor, Repo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clone_pool
+import get_data_github
+from clone_pool import ClonePool
+from get_data_github import (
+    extract_code_structure, extract_for_readme, get_repo_class, get_repo_class_incremental, get_repo_data
+)
+
+AUTHOR = Actor("Test", "test@example.com")
+
+
+def commit_files(repo: Repo, files: dict, message: str) -> None:
+    """Write, delete (content None) and commit files in a fixture repository."""
+    for rel_path, content in files.items():
+        path = os.path.join(repo.working_tree_dir, rel_path)
+        if content is None:
+            repo.index.remove([rel_path], working_tree=True)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        repo.index.add([rel_path])
+    repo.index.commit(message, author=AUTHOR, committer=AUTHOR)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    repo = Repo.init(tmp_path / "upstream" / "sample")
+    commit_files(repo, {
+        "models.py": "class Engine:\n    def run(self):\n        return Wheel()\n",
+        "car.py": "from models import Engine\n\nclass Car:\n    def __init__(self):\n        self.engine = Engine()\n",
+        "old.py": "class Legacy:\n    pass\n",
+    }, "initial")
+    return repo
+
+
+def normalized(classes):
+    return sorted((c["name"], sorted(c["dependencies"]), sorted(c["attributes"]), c["methods"]) for c in classes)
+
+
+def test_incremental_class_extraction_matches_full_run(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+
+    first = get_repo_class_incremental(url, work_dir)
+    assert normalized(first) == normalized(get_repo_class(url, str(tmp_path / "full1")))
+
+    commit_files(upstream, {
+        "car.py": "from models import Engine\n\nclass Car:\n    def __init__(self):\n        self.engine = Engine()\n        self.radio = Radio()\n",
+        "old.py": None,
+        "parts/wheel.py": "class Wheel:\n    pass\n",
+    }, "update")
+
+    second = get_repo_class_incremental(url, work_dir)
+    assert normalized(second) == normalized(get_repo_class(url, str(tmp_path / "full2")))
+
+    engine = next(c for c in second if c["name"] == "Engine")
+    assert engine["dependencies"] == ["Wheel"]
+    assert "Legacy" not in [c["name"] for c in second]
+
+
+def test_get_repo_class_incremental_option_reparses_changed_files(tmp_path, upstream, monkeypatch):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+    assert normalized(get_repo_class(url, work_dir, incremental=True)) == normalized(get_repo_class(url, work_dir))
+
+    commit_files(upstream, {"parts/wheel.py": "class Wheel:\n    pass\n"}, "add wheel")
+    parsed = []
+    original_summarize = get_data_github._summarize_source
+
+    def counting_summarize(content, rel_path):
+        parsed.append(rel_path)
+        return original_summarize(content, rel_path)
+
+    monkeypatch.setattr(get_data_github, "_summarize_source", counting_summarize)
+    job_dir = tmp_path / "job"
+    classes = get_repo_class(url, work_dir, output_dir=str(job_dir), incremental=True)
+
+    assert parsed == [os.path.join("parts", "wheel.py")]
+    assert next(c for c in classes if c["name"] == "Engine")["dependencies"] == ["Wheel"]
+    assert (job_dir / "class_list_enhanced.json").exists()
+
+
+def test_incremental_state_survives_concurrent_and_corrupt_runs(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+    expected = normalized(get_repo_class(url, str(tmp_path / "full")))
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(normalized(get_repo_class(url, work_dir, incremental=True)))
+        except Exception as e:
+            errors.append(e)
+
+    for _ in range(3):
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert errors == [] and results == [expected] * 12
+
+    state_file = os.path.join(work_dir, f"{get_data_github.get_clone_pool(work_dir).key(url)}_class_state.json")
+    with open(state_file, 'w', encoding='utf-8') as f:
+        f.write('{"commit": "abc", "fi')
+    assert normalized(get_repo_class(url, work_dir, incremental=True)) == expected
+    with open(state_file, encoding='utf-8') as f:
+        assert json.load(f)["commit"] == upstream.head.commit.hexsha
+
+
+def test_incremental_extraction_applies_ingestion_filters(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+    commit_files(upstream, {".gitignore": "gen/\n"}, "ignore generated code")
+    get_repo_class_incremental(url, work_dir)
+
+    # Files committed despite .gitignore, inside a virtualenv, or marked generated
+    commit_files(upstream, {
+        "gen/g.py": "class G:\n    pass\n",
+        "env/pyvenv.cfg": "home = /usr/bin\n",
+        "env/lib/site.py": "class G2:\n    pass\n",
+        "proto_pb2.py": "# @generated by protoc\nclass G3:\n    pass\n",
+        "a.py": "class A:\n    pass\n",
+    }, "update")
+
+    incremental = get_repo_class_incremental(url, work_dir)
+    assert normalized(incremental) == normalized(get_repo_class(url, str(tmp_path / "full")))
+    assert {"G", "G2", "G3"}.isdisjoint(c["name"] for c in incremental)
+    assert "A" in [c["name"] for c in incremental]
+
+
+def test_incremental_extraction_drops_symlinks_like_full_run(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+    get_repo_class_incremental(url, work_dir)
+
+    root = upstream.working_tree_dir
+    commit_files(upstream, {"lib/real.py": "class Real:\n    pass\n"}, "add lib")
+    os.symlink("lib/real.py", os.path.join(root, "alias.py"))
+    os.symlink("lib", os.path.join(root, "linked"))
+    upstream.index.add(["alias.py", "linked"])
+    upstream.index.commit("add symlinks", author=AUTHOR, committer=AUTHOR)
+
+    skipped = []
+    records = list(get_data_github._filter_blobs(upstream, upstream.head.commit.hexsha,
+                                                 ["alias.py", "linked/real.py", "lib/real.py"], skipped))
+    assert [record.rel_path for record in records] == [os.path.join("lib", "real.py")]
+    assert [entry["reason"] for entry in skipped] == ["symlink", "symlink"]
+
+    incremental = get_repo_class_incremental(url, work_dir)
+    assert normalized(incremental) == normalized(get_repo_class(url, str(tmp_path / "full")))
+    assert [c["name"] for c in incremental].count("Real") == 1
+
+
+def test_get_repo_class_parallel_matches_serial(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+
+    serial = get_repo_class(url, str(tmp_path / "serial"))
+    parallel = get_repo_class(url, str(tmp_path / "parallel"), workers=2)
+
+    assert normalized(parallel) == normalized(serial)
+
+
+def test_extractors_share_one_parse_per_file(tmp_path, upstream, monkeypatch):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+    parsed = []
+    original_parse = ast.parse
+
+    def counting_parse(source, filename='<unknown>', *args, **kwargs):
+        parsed.append(filename)
+        return original_parse(source, filename, *args, **kwargs)
+
+    monkeypatch.setattr(get_data_github.ast, "parse", counting_parse)
+    get_repo_data(url, work_dir)
+    extract_code_structure(url, work_dir)
+    get_repo_class(url, work_dir)
+    extract_for_readme(url, work_dir)
+
+    assert sorted(parsed) == ["car.py", "models.py", "old.py"]
+
+
+def test_snapshot_builds_do_not_block_other_repositories(tmp_path, upstream, monkeypatch):
+    other = Repo.init(tmp_path / "upstream" / "other")
+    commit_files(other, {"b.py": "class B:\n    pass\n"}, "initial")
+    slow_url = f"file://{upstream.working_tree_dir}"
+    fast_url = f"file://{other.working_tree_dir}"
+    work_dir = str(tmp_path / "work")
+    get_data_github.get_clone_pool(work_dir).mirror(slow_url)
+
+    release, built = threading.Event(), []
+    original_init = get_data_github.RepoSnapshot.__init__
+
+    def slow_init(self, url, *args, **kwargs):
+        built.append(url)
+        if url == slow_url:
+            assert release.wait(10)
+        original_init(self, url, *args, **kwargs)
+
+    monkeypatch.setattr(get_data_github.RepoSnapshot, "__init__", slow_init)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_data_github.get_snapshot(slow_url, work_dir)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+
+    # Served while the other repository is still being built
+    assert get_data_github.get_snapshot(fast_url, work_dir).url == fast_url
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results[0] is results[1]
+    assert built.count(slow_url) == 1
+
+
+def test_concurrent_reads_share_one_snapshot(tmp_path, upstream):
+    commit_files(upstream, {f"mod{i}.py": f"class M{i}:\n" + "    x = 1\n" * 400 for i in range(40)}, "many files")
+    url = f"file://{upstream.working_tree_dir}"
+    snapshot = get_data_github.get_snapshot(url, str(tmp_path / "work"))
+    expected = {file.rel_path: file.read() for file in snapshot.files}
+    results, errors = [], []
+
+    def read_all():
+        try:
+            results.extend(snapshot.read(file) == expected[file.rel_path] for file in snapshot.files)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read_all, daemon=True) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+    assert len(results) == 4 * len(expected) and all(results)
+
+
+def test_iter_files_prunes_ignored_and_generated_files(tmp_path):
+    files = {
+        ".gitignore": "generated/\n*.tmp.py\n!keep.tmp.py\n",
+        "app.py": "def main():\n    pass\n",
+        "keep.tmp.py": "x = 1\n",
+        "scratch.tmp.py": "x = 2\n",
+        "generated/models.py": "class Model:\n    pass\n",
+        "node_modules/lib/index.js": "module.exports = 1;\n",
+        "static/app.min.js": "var a=1;\n",
+        "static/bundle.js": "var a=1;" * 200 + "\n",
+        "proto/service_pb2.py": "# Generated by the protocol buffer compiler.  DO NOT EDIT!\n",
+        "api/client.js": "/**\n * @generated by codegen\n */\nmodule.exports = 1;\n",
+        "mentions.py": '"""Files generated by protoc are skipped; do not edit them."""\nMARKER = "auto-generated"\n',
+        "big.py": "x = 1\n" * 1000,
+    }
+    for rel_path, content in files.items():
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+    skipped = []
+    collected = [record.rel_path for record in get_data_github._iter_files(str(tmp_path), skipped, max_file_bytes=5000)]
+
+    assert sorted(collected) == [".gitignore", "app.py", "keep.tmp.py", "mentions.py"]
+    reasons = {entry["path"]: entry["reason"] for entry in skipped}
+    assert reasons["node_modules"] == "ignored directory"
+    assert reasons["generated"] == "matched .gitignore"
+    assert reasons["scratch.tmp.py"] == "matched .gitignore"
+    assert reasons[os.path.join("static", "app.min.js")] == "minified"
+    assert reasons[os.path.join("static", "bundle.js")] == "minified"
+    assert reasons[os.path.join("proto", "service_pb2.py")] == "generated"
+    assert reasons[os.path.join("api", "client.js")] == "generated"
+    assert reasons["big.py"] == "larger than 5000 bytes"
+
+
+def test_generated_markers_only_match_leading_comments():
+    assert get_data_github._generated_reason(b"// Code generated by protoc-gen-go. DO NOT EDIT.\npackage pb\n") == "generated"
+    assert get_data_github._generated_reason(b"#!/usr/bin/env python\n# @generated\nx = 1\n") == "generated"
+    assert get_data_github._generated_reason(b"x = 1\n# @generated\n") is None
+    assert get_data_github._generated_reason(b'"""Code generated by tools, do not edit by hand."""\n') is None
+    # This module documents the markers itself and must still be collected
+    with open(get_data_github.__file__, 'rb') as f:
+        assert get_data_github._generated_reason(f.read(8192)) is None
+
+
+def test_iter_files_skips_dangling_symlink(tmp_path):
+    (tmp_path / "app.py").write_text("x = 1\n", encoding='utf-8')
+    os.symlink(tmp_path / "missing.py", tmp_path / "broken.py")
+
+    skipped = []
+    collected = [record.rel_path for record in get_data_github._iter_files(str(tmp_path), skipped)]
+
+    assert collected == ["app.py"]
+    assert skipped[0]["path"] == "broken.py"
+    assert skipped[0]["reason"].startswith("unreadable")
+
+
+def test_clone_pool_reuses_mirror_and_separates_owners(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+    pool = ClonePool(str(tmp_path / "pool"), fetch_interval=0)
+
+    first = pool.checkout(url)
+    assert sorted(os.listdir(first)) == [".git", "car.py", "models.py", "old.py"]
+
+    commit_files(upstream, {"parts/wheel.py": "class Wheel:\n    pass\n"}, "update")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Repo, "clone_from", lambda *args, **kwargs: pytest.fail("mirror was cloned again"))
+        second = pool.checkout(url + ".git/")
+    assert second != first
+    assert os.path.exists(os.path.join(second, "parts", "wheel.py"))
+    assert not os.path.exists(os.path.join(first, "parts"))
+
+    other = Repo.init(tmp_path / "other_owner" / "sample")
+    commit_files(other, {"other.py": "x = 1\n"}, "initial")
+    assert pool.key(f"file://{other.working_tree_dir}") != pool.key(url)
+    assert pool.key("https://github.com/Owner/Repo.git") == pool.key("git@github.com:owner/repo")
+    assert sorted(os.listdir(pool.checkout(f"file://{other.working_tree_dir}"))) == [".git", "other.py"]
+
+    pool.max_bytes = 0
+    pool.checkout(url)
+    assert list(pool.index) == [pool.key(url)]
+
+
+def test_clone_pool_never_evicts_leased_repositories(tmp_path, upstream, monkeypatch):
+    url = f"file://{upstream.working_tree_dir}"
+    other = Repo.init(tmp_path / "other_owner" / "sample")
+    commit_files(other, {"other.py": "x = 1\n"}, "initial")
+    other_url = f"file://{other.working_tree_dir}"
+    pool = ClonePool(str(tmp_path / "pool"), max_bytes=0)
+
+    with pool.lease(url, worktree=True) as path:
+        pool.checkout(other_url)
+        assert set(pool.index) == {pool.key(url), pool.key(other_url)}
+        assert sorted(os.listdir(path)) == [".git", "car.py", "models.py", "old.py"]
+
+        # Sizes are recorded after clone and checkout, not re-measured on every use
+        monkeypatch.setattr(clone_pool, "_directory_size", lambda path: pytest.fail("size was re-measured"))
+        pool.checkout(other_url)
+
+    pool.checkout(other_url)
+    assert list(pool.index) == [pool.key(other_url)]
+    assert not os.path.exists(path)
+
+
+def test_object_backend_matches_checkout_without_worktree(tmp_path, upstream):
+    commit_files(upstream, {
+        ".gitignore": "scratch/\n",
+        "scratch/notes.py": "x = 1\n",
+        "dos.py": "class Dos:\r\n    pass\r\n",
+        "static/app.min.js": "var a=1;\n",
+    }, "more files")
+    url = f"file://{upstream.working_tree_dir}"
+
+    from_objects = get_data_github.get_snapshot(url, str(tmp_path / "objects"), backend="objects")
+    from_checkout = get_data_github.get_snapshot(url, str(tmp_path / "checkout"), backend="checkout")
+
+    def contents(snapshot):
+        return sorted((file.rel_path, snapshot.read(file)) for file in snapshot.files)
+
+    assert contents(from_objects) == contents(from_checkout)
+    assert sorted(map(str, from_objects.skipped)) == sorted(map(str, from_checkout.skipped))
+    assert os.listdir(tmp_path / "objects" / ".clone_pool" / "worktrees") == []
+
+
+def test_artifacts_are_only_written_to_output_dir(tmp_path, upstream):
+    url = f"file://{upstream.working_tree_dir}"
+    work_dir = tmp_path / "work"
+
+    code = get_repo_data(url, str(work_dir))
+    classes = get_repo_class(url, str(work_dir))
+    extract_code_structure(url, str(work_dir))
+    extract_for_readme(url, str(work_dir))
+    assert "BEGINFILE models.py\nclass Engine:" in code
+    assert os.listdir(work_dir) == [".clone_pool"]
+
+    job_dir = tmp_path / "jobs" / "job-1"
+    assert get_repo_data(url, str(work_dir), output_dir=str(job_dir)) == code
+    get_repo_class(url, str(work_dir), output_dir=str(job_dir))
+    extract_code_structure(url, str(work_dir), output_dir=str(job_dir))
+    extract_for_readme(url, str(work_dir), output_dir=str(job_dir))
+    assert sorted(os.listdir(job_dir)) == [
+        "class_list_enhanced.json", "code.txt", "readme_metadata.json", "readme_summary.json", "repo_summary.json"
+    ]
+    assert (job_dir / "code.txt").read_text(encoding='utf-8') == code
+    with open(job_dir / "class_list_enhanced.json", encoding='utf-8') as f:
+        assert normalized(json.load(f)) == normalized(classes)
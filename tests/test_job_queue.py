@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobQueue
+
+
+def test_same_key_attaches_to_in_flight_job():
+    queue = JobQueue(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(url):
+        calls.append(url)
+        release.wait(5)
+        return f"docs for {url}"
+
+    first = queue.submit(("readme", "github.com/a/b"), work, "https://github.com/a/b")
+    second = queue.submit(("readme", "github.com/a/b"), work, "https://github.com/A/b.git")
+    other = queue.submit(("readme", "github.com/c/d"), work, "https://github.com/c/d")
+    assert second is first
+    assert other is not first
+    assert queue.stats()["in_flight"] == 2
+
+    release.set()
+    assert first.result() == "docs for https://github.com/a/b"
+    assert other.result() == "docs for https://github.com/c/d"
+    assert sorted(calls) == ["https://github.com/a/b", "https://github.com/c/d"]
+    assert queue.stats() == {"jobs": 2, "in_flight": 0, "attached": 1}
+
+    # A finished job is no longer in flight, so a new request runs again
+    again = queue.submit(("readme", "github.com/a/b"), work, "https://github.com/a/b")
+    assert again is not first and again.result() == "docs for https://github.com/a/b"
+    queue.shutdown()
+
+
+def test_worker_pool_is_bounded_and_failures_are_reported():
+    queue = JobQueue(max_workers=2)
+    release = threading.Event()
+    running = []
+
+    def work(i):
+        running.append(i)
+        release.wait(5)
+        if i == 0:
+            raise ValueError("clone failed")
+        return i
+
+    jobs = [queue.submit(i, work, i) for i in range(4)]
+    for _ in range(100):
+        if len(running) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert len(running) == 2
+    assert [job.status for job in jobs[2:]] == ["queued", "queued"]
+
+    release.set()
+    assert [job.result() for job in jobs[1:]] == [1, 2, 3]
+    with pytest.raises(ValueError):
+        jobs[0].result()
+    assert jobs[0].status == "failed"
+    assert queue.get(jobs[0].id) is jobs[0]
+    queue.shutdown()
@@ -0,0 +1,217 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import (
+    CachedChatClient, CachedGenerativeModel, CacheMissError, RateLimitedClient, ResponseCache, SingleFlight,
+    cache_refresh, is_retryable
+)
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        self.status_code = 429
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class FakeClient:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return f"reply to {kwargs['messages'][-1]['content']}"
+
+
+def test_retries_rate_limits_with_backoff_and_retry_after():
+    delays = []
+    client = RateLimitedClient(FakeClient([RateLimitError(), RateLimitError(retry_after="2")]),
+                               base_delay=1.0, sleep=delays.append)
+
+    reply = client.chat.completions.create(model="gpt", messages=[{"role": "user", "content": "hi"}])
+
+    assert reply == "reply to hi"
+    assert client.retries == 2
+    assert 0 <= delays[0] <= 1.0
+    assert delays[1] == 2.0
+
+
+def test_gives_up_after_max_retries_and_does_not_retry_client_errors():
+    delays = []
+    client = RateLimitedClient(FakeClient([RateLimitError()] * 3), max_retries=2, sleep=delays.append)
+    with pytest.raises(RateLimitError):
+        client.create(model="gpt", messages=[{"role": "user", "content": "hi"}])
+    assert len(delays) == 2
+
+    fake = FakeClient([BadRequestError()])
+    with pytest.raises(BadRequestError):
+        RateLimitedClient(fake, sleep=delays.append).create(model="gpt", messages=[])
+    assert fake.calls == 1
+    assert is_retryable(ConnectionError()) and not is_retryable(ValueError())
+
+
+class FakeChatResponse:
+    def __init__(self, content):
+        self.choices = [SimpleNamespace(message=SimpleNamespace(content=content))]
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return FakeChatResponse(f"answer {self.calls}")
+
+
+def ask(client, content="Write an abstract", temperature=0.2):
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo", messages=[{"role": "user", "content": content}], temperature=temperature
+    )
+    return response.choices[0].message.content
+
+
+def test_response_cache_hits_on_identical_requests_only(tmp_path):
+    backend = CountingClient()
+    client = CachedChatClient(backend, ResponseCache(str(tmp_path / "llm.sqlite3")))
+
+    assert ask(client) == "answer 1"
+    assert ask(client) == "answer 1"
+    assert ask(client, temperature=0.7) == "answer 2"
+    assert ask(client, content="Write a conclusion") == "answer 3"
+    assert backend.calls == 3
+
+    with cache_refresh():
+        assert ask(client) == "answer 4"
+    assert ask(client) == "answer 4"
+
+    # A new process reuses the file; expired entries are not served
+    reopened = CachedChatClient(backend, ResponseCache(str(tmp_path / "llm.sqlite3")))
+    assert ask(reopened) == "answer 4"
+    expired = CachedChatClient(backend, ResponseCache(str(tmp_path / "llm.sqlite3"), ttl=-1))
+    assert ask(expired) == "answer 5"
+
+
+def test_read_only_mode_replays_and_fails_on_miss(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    ask(CachedChatClient(CountingClient(), ResponseCache(path)))
+
+    backend = CountingClient()
+    replay = CachedChatClient(backend, ResponseCache(path, ttl=-1, read_only=True))
+    assert ask(replay) == "answer 1"
+    with pytest.raises(CacheMissError):
+        ask(replay, content="Something new")
+    assert backend.calls == 0
+
+
+def test_read_only_mode_without_database_misses(tmp_path):
+    path = tmp_path / "missing" / "llm.sqlite3"
+    cache = ResponseCache(str(path), read_only=True)
+    backend = CountingClient()
+
+    with pytest.raises(CacheMissError):
+        ask(CachedChatClient(backend, cache))
+    assert backend.calls == 0 and not path.exists()
+    assert cache.stats() == {"entries": 0, "bytes": 0, "hits": 0, "misses": 1}
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), max_bytes=25)
+    cache.put("a", "m", "x" * 10)
+    cache.put("b", "m", "y" * 10)
+    assert cache.get("a") == "x" * 10
+    cache.put("c", "m", "z" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "z" * 10
+
+
+def test_gemini_model_wrapper_caches_sync_and_async(tmp_path):
+    class FakeGemini:
+        model_name = "models/gemini-2.0-flash"
+        calls = 0
+
+        def generate_content(self, prompt):
+            self.calls += 1
+            return SimpleNamespace(text=f"readme {self.calls}")
+
+        async def generate_content_async(self, prompt):
+            return self.generate_content(prompt)
+
+    gemini = FakeGemini()
+    model = CachedGenerativeModel(gemini, ResponseCache(str(tmp_path / "llm.sqlite3")))
+    assert model.generate_content("def add(a, b): ...").text == "readme 1"
+    assert asyncio.run(model.generate_content_async("def add(a, b): ...")).text == "readme 1"
+    assert model.generate_content("def sub(a, b): ...").text == "readme 2"
+    assert model.model_name == "models/gemini-2.0-flash"
+
+
+def test_single_flight_coalesces_concurrent_identical_requests():
+    started = threading.Event()
+    release = threading.Event()
+
+    class SlowClient(CountingClient):
+        def create(self, **kwargs):
+            started.set()
+            release.wait(5)
+            return super().create(**kwargs)
+
+    backend = SlowClient()
+    flight = SingleFlight()
+    client = CachedChatClient(backend, None, flight)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(ask, client)
+        started.wait(5)
+        followers = [executor.submit(ask, client) for _ in range(3)]
+        while flight.stats()["coalesced"] < 3:
+            time.sleep(0.01)
+        other = executor.submit(ask, client, "Write a conclusion")
+        release.set()
+        answers = [leader.result()] + [f.result() for f in followers]
+
+    assert answers == ["answer 1"] * 4
+    assert other.result() == "answer 2"
+    assert backend.calls == 2
+    assert flight.stats() == {"calls": 2, "coalesced": 3, "in_flight": 0}
+
+
+def test_single_flight_async_followers_share_result_and_errors():
+    flight = SingleFlight()
+    calls = []
+
+    async def request(fail):
+        calls.append(fail)
+        await asyncio.sleep(0.05)
+        if fail:
+            raise RuntimeError("quota exceeded")
+        return "diagram"
+
+    async def main():
+        ok = await asyncio.gather(*(flight.do_async("k", lambda: request(False)) for _ in range(3)))
+        failed = await asyncio.gather(*(flight.do_async("e", lambda: request(True)) for _ in range(2)),
+                                      return_exceptions=True)
+        return ok, failed
+
+    ok, failed = asyncio.run(main())
+    assert ok == ["diagram"] * 3
+    assert all(isinstance(error, RuntimeError) for error in failed)
+    assert calls == [False, True]
+    assert flight.stats()["coalesced"] == 3
@@ -0,0 +1,130 @@
+import json
+import os
+import sys
+import textwrap
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mermaid_renderer
+from mermaid_renderer import MermaidRenderer
+
+# Speaks the mermaid_worker.js protocol: writes the diagram source as the "image"
+FAKE_WORKER = textwrap.dedent('''
+    import json, os, sys, time
+    log, marker = sys.argv[1], sys.argv[2]
+    for line in sys.stdin:
+        request = json.loads(line)
+        with open(log, "a") as f:
+            f.write(json.dumps([job["code"] for job in request["jobs"]]) + "\\n")
+        results = []
+        for job in request["jobs"]:
+            if job["code"] == "crash" and not os.path.exists(marker):
+                open(marker, "w").close()
+                sys.exit(1)
+            if job["code"] == "hang":
+                time.sleep(10)
+            if job["code"] == "slow":
+                time.sleep(0.3)
+            if job["code"] == "invalid":
+                results.append({"ok": False, "error": "Parse error"})
+                continue
+            with open(job["output"], "w") as f:
+                f.write(job["code"])
+            results.append({"ok": True})
+        print("noise from the browser")
+        print(json.dumps({"id": request["id"], "results": results}), flush=True)
+''')
+
+
+@pytest.fixture
+def make_renderer(tmp_path):
+    script = tmp_path / "worker.py"
+    script.write_text(FAKE_WORKER)
+    log = tmp_path / "requests.log"
+    renderers = []
+
+    def make(**kwargs):
+        renderer = MermaidRenderer([sys.executable, str(script), str(log), str(tmp_path / "crashed")], **kwargs)
+        renderers.append(renderer)
+        return renderer
+
+    make.requests = lambda: [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+    yield make
+    for renderer in renderers:
+        renderer.close()
+
+
+def test_batch_renders_in_one_round_trip(make_renderer, tmp_path):
+    renderer = make_renderer()
+    jobs = [{"code": code, "output": str(tmp_path / f"{i}.png"), "format": "png"}
+            for i, code in enumerate(["graph A", "invalid", "graph C"])]
+
+    assert renderer.render_batch(jobs) == [True, False, True]
+    assert (tmp_path / "2.png").read_text() == "graph C"
+    assert renderer.render("graph D", str(tmp_path / "d.png"))
+    assert make_renderer.requests() == [["graph A", "invalid", "graph C"], ["graph D"]]
+
+
+def test_worker_is_restarted_after_crash(make_renderer, tmp_path):
+    renderer = make_renderer()
+    assert renderer.render("crash", str(tmp_path / "a.png"))
+    assert renderer.restarts == 1
+
+
+def test_hung_worker_times_out(make_renderer, tmp_path):
+    renderer = make_renderer(timeout=0.5, max_restarts=0)
+    assert not renderer.render("hang", str(tmp_path / "a.png"))
+    assert renderer.render("graph B", str(tmp_path / "b.png"))
+
+
+def test_concurrent_renders_are_coalesced(make_renderer, tmp_path):
+    renderer = make_renderer()
+    renderer.render("graph warmup", str(tmp_path / "warmup.png"))
+    results = {}
+
+    def render(code):
+        results[code] = renderer.render(code, str(tmp_path / f"{code}.png"))
+
+    first = threading.Thread(target=render, args=("slow",))
+    first.start()
+    while len(make_renderer.requests()) < 2:
+        pass
+    others = [threading.Thread(target=render, args=(f"g{i}",)) for i in range(4)]
+    for thread in others:
+        thread.start()
+    for thread in [first] + others:
+        thread.join()
+
+    assert all(results.values()) and len(results) == 5
+    assert len(make_renderer.requests()) == 3
+    assert sorted(make_renderer.requests()[-1]) == ["g0", "g1", "g2", "g3"]
+
+
+def test_unexpected_errors_fail_jobs_and_restart_worker(make_renderer, tmp_path):
+    renderer = make_renderer(max_restarts=0)
+    original_request = renderer._request
+    calls = []
+
+    def broken_request(jobs):
+        calls.append(jobs)
+        if len(calls) == 1:
+            raise BrokenPipeError(32, "Broken pipe")
+        return original_request(jobs)
+
+    renderer._request = broken_request
+    jobs = [{"code": code, "output": str(tmp_path / f"{code}.png"), "format": "png"} for code in ["a", "b"]]
+
+    assert renderer.render_batch(jobs) == [False, False]
+    assert renderer._process is None
+    assert renderer.render("graph C", str(tmp_path / "c.png"))
+
+
+def test_worker_unavailable_is_logged_once(monkeypatch, capsys):
+    monkeypatch.setattr(mermaid_renderer, "_worker_available", None)
+    monkeypatch.setattr(mermaid_renderer.shutil, "which", lambda name: None)
+    assert mermaid_renderer.get_renderer() is None
+    assert mermaid_renderer.get_renderer() is None
+    assert capsys.readouterr().out.count("Mermaid worker unavailable") == 1
@@ -0,0 +1,146 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("PIL")
+
+import mermaid_utils
+from analyzing import CodeAnalyzer
+from mermaid_utils import (
+    build_mermaid_architecture_diagram, build_mermaid_class_diagram,
+    build_mermaid_component_flow_diagram, class_dependencies
+)
+
+SOURCE = '''
+class Store:
+    def save(self, item):
+        return item
+
+class Service:
+    def __init__(self):
+        self.store = Store()
+
+    def handle(self, request):
+        item = parse(request)
+        self.store.save(item)
+        return item
+
+class CachedStore(Store):
+    pass
+
+def parse(request):
+    data = request.strip()
+    return data
+'''
+
+
+@pytest.fixture
+def analysis(tmp_path):
+    path = tmp_path / "sample.py"
+    path.write_text(SOURCE)
+    return CodeAnalyzer().analyze_file(str(path))
+
+
+def test_class_diagram_is_built_from_analysis(analysis):
+    classes = analysis["complexity"]["classes"]
+    code = build_mermaid_class_diagram(classes, analysis["dependencies"])
+
+    assert code.startswith("classDiagram")
+    assert "class Service" in code and "+handle()" in code
+    assert ("Service", "Store") in class_dependencies(classes, analysis["dependencies"])
+    assert "Service ..> Store" in code
+    assert "+store" in code
+    assert "Store <|-- CachedStore" in code
+    # Output is deterministic, so rendered figures can be cached by content
+    assert code == build_mermaid_class_diagram(classes, analysis["dependencies"])
+    assert build_mermaid_architecture_diagram(classes).startswith("classDiagram")
+
+
+def test_component_flow_connects_inputs_to_outputs(analysis):
+    code = build_mermaid_component_flow_diagram(analysis["data_flow"])
+
+    assert code.startswith("flowchart LR")
+    assert "in_parse -->|input| fn_parse" in code
+    assert "fn_parse -->" in code and "out_parse" in code
+
+
+def test_empty_analysis_gives_placeholder_diagrams():
+    assert "No classes found" in build_mermaid_class_diagram({}, {})
+    assert build_mermaid_component_flow_diagram({}).startswith("flowchart LR")
+
+
+def test_failed_render_leaves_no_partial_png(tmp_path):
+    output = tmp_path / "diagram.png"
+
+    def broken(code, path):
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG half")
+        return False
+
+    assert not mermaid_utils._render_atomic(broken, "flowchart LR", str(output))
+    assert os.listdir(tmp_path) == []
+
+    def working(code, path):
+        with open(path, "wb") as f:
+            f.write(code.encode())
+        return True
+
+    assert mermaid_utils._render_atomic(working, "flowchart LR", str(output))
+    assert output.read_bytes() == b"flowchart LR"
+    assert os.listdir(tmp_path) == ["diagram.png"]
+
+
+def test_concurrent_renders_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(mermaid_utils, "_render_slots", threading.BoundedSemaphore(2))
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow(code, path):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        open(path, "w").close()
+        return True
+
+    threads = [threading.Thread(target=mermaid_utils._render_atomic, args=(slow, "x", str(tmp_path / f"{i}.png")))
+               for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert sorted(os.listdir(tmp_path)) == [f"{i}.png" for i in range(6)]
+
+
+def test_cached_diagram_skips_renderer(tmp_path, monkeypatch):
+    from diagram_cache import DiagramCache
+    monkeypatch.setattr(mermaid_utils, "get_diagram_cache", lambda: cache)
+    cache = DiagramCache(str(tmp_path / "cache"))
+    renders = []
+
+    def render(code, path):
+        renders.append(code)
+        with open(path, "w") as f:
+            f.write(code)
+        return True
+
+    monkeypatch.setattr(mermaid_utils, "_render_mermaid_to_png", render)
+    for run in ("first", "second"):
+        os.makedirs(tmp_path / run)
+        assert mermaid_utils.render_mermaid_to_png("graph LR", str(tmp_path / run / "d.png"))
+    assert renders == ["graph LR"]
+    assert (tmp_path / "second" / "d.png").read_text() == "graph LR"
+
+    # A placeholder image for a failed render is written but never cached
+    monkeypatch.setattr(mermaid_utils, "_render_mermaid_to_png", lambda code, path: False)
+    monkeypatch.setattr(mermaid_utils, "_render_fallback_png", render)
+    assert mermaid_utils.render_mermaid_to_png("graph TD", str(tmp_path / "second" / "e.png"))
+    assert not cache.fetch(mermaid_utils.diagram_key("graph TD", "png", 2, "transparent"), "png",
+                           str(tmp_path / "e.png"))
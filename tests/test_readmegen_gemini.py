@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("google.generativeai")
+
+import readmegen_gemini
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Local stand-in for GenerativeModel that tracks concurrent requests."""
+
+    def __init__(self, delay=0.1, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.active = 0
+        self.max_active = 0
+        self.prompts = []
+
+    async def generate_content_async(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_on and self.fail_on in prompt:
+                raise RuntimeError("quota exceeded")
+            return FakeResponse(f"```plantuml\n@startuml\n' reply {len(self.prompts)}\n@enduml\n```")
+        finally:
+            self.active -= 1
+
+
+SUMMARY = {"app.py": {"classes": {"App": {"methods": ["run"]}}, "functions": ["main"]}}
+CLASSES = [{"name": "App", "inherits": [], "attributes": [], "methods": ["run"], "dependencies": []}]
+
+
+def test_sad_runs_diagrams_concurrently_then_sad():
+    model = FakeModel(delay=0.2)
+    started = time.perf_counter()
+    result = asyncio.run(readmegen_gemini.generate_sad_async(
+        SUMMARY, CLASSES, lambda code: f"http://diagrams/{len(code)}", llm=model))
+    elapsed = time.perf_counter() - started
+
+    assert model.max_active == 3
+    assert elapsed < 0.2 * 3
+    assert len(model.prompts) == 4
+    assert result["usecase_url"] in model.prompts[-1]
+    assert result["class_url"] in model.prompts[-1]
+    assert '"name": "App"' in model.prompts[2]
+    assert set(result) == {"usecase_url", "deploy_url", "class_url", "sad"}
+
+
+def test_semaphore_bounds_requests_and_errors_match_sync_format():
+    model = FakeModel(delay=0.01, fail_on="Deployment Diagram")
+    diagrams = asyncio.run(readmegen_gemini.generate_diagrams_async(SUMMARY, CLASSES, max_concurrency=1, llm=model))
+
+    assert model.max_active == 1
+    assert diagrams["deploy"] == '"""[ERROR generating docstring: quota exceeded]"""'
+    assert diagrams["usecase"].startswith("@startuml")
@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import renderers
+from renderers import CircuitBreaker, HttpRendererBackend, RendererBackend, RendererRegistry, default_registry
+
+
+class FakeBackend(RendererBackend):
+    def __init__(self, name, network=False, outcome="ok", **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.network = network
+        self.outcome = outcome
+        self.calls = 0
+
+    def render(self, code, output_file, fmt):
+        self.calls += 1
+        if self.outcome == "timeout":
+            raise subprocess.TimeoutExpired(self.name, self.timeout)
+        if self.outcome == "fail":
+            return False
+        with open(output_file, "w") as f:
+            f.write(f"{self.name}:{code}")
+        return True
+
+
+def test_network_backends_only_run_when_enabled(tmp_path, monkeypatch):
+    monkeypatch.delenv("RENDER_ALLOW_NETWORK", raising=False)
+    registry = RendererRegistry()
+    local = FakeBackend("local", outcome="fail")
+    remote = FakeBackend("remote", network=True)
+    registry.register("mermaid", local)
+    registry.register("mermaid", remote)
+
+    assert not registry.render("mermaid", "graph LR", str(tmp_path / "a.png"))
+    assert remote.calls == 0
+
+    monkeypatch.setenv("RENDER_ALLOW_NETWORK", "1")
+    assert registry.render("mermaid", "graph LR", str(tmp_path / "a.png"))
+    assert (tmp_path / "a.png").read_text() == "remote:graph LR"
+
+
+def test_hanging_backend_trips_circuit_breaker(tmp_path):
+    registry = RendererRegistry()
+    slow = FakeBackend("slow", outcome="timeout", failure_threshold=2, reset_after=3600)
+    fallback = FakeBackend("fallback")
+    registry.register("plantuml", slow)
+    registry.register("plantuml", fallback)
+
+    for _ in range(4):
+        assert registry.render_bytes("plantuml", "@startuml\n@enduml") == b"fallback:@startuml\n@enduml"
+    assert slow.calls == 2
+    assert slow.breaker.is_open
+
+
+def test_circuit_breaker_half_opens_after_reset(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(renderers.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=10)
+    breaker.record(False)
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial call while half-open
+    breaker.record(True)
+    assert breaker.allow() and not breaker.is_open
+
+
+def test_image_url_prefers_local_server(monkeypatch):
+    class Server(HttpRendererBackend):
+        def __init__(self, name, network):
+            super().__init__()
+            self.name, self.network = name, network
+
+        def url(self, code, fmt):
+            return f"http://{self.name}/{fmt}/{code}"
+
+    registry = RendererRegistry()
+    registry.register("plantuml", Server("public", network=True))
+    assert registry.image_url("plantuml", "x", allow_network=False) is None
+    assert registry.image_url("plantuml", "x", allow_network=True) == "http://public/png/x"
+    registry.register("plantuml", Server("localhost:8080", network=False), position=0)
+    assert registry.image_url("plantuml", "x", allow_network=True) == "http://localhost:8080/png/x"
+
+
+def test_incomplete_backends_are_rejected():
+    class NoRender(RendererBackend):
+        name = "broken"
+
+    class NoUrl(HttpRendererBackend):
+        name = "broken-http"
+
+    for backend_class in (NoRender, NoUrl):
+        with pytest.raises(TypeError):
+            backend_class()
+    with pytest.raises(TypeError):
+        RendererRegistry().register("mermaid", object())
+
+
+def test_default_chains_are_local_first(monkeypatch):
+    monkeypatch.delenv("PLANTUML_SERVER_URL", raising=False)
+    registry = default_registry()
+    for kind in ("mermaid", "plantuml"):
+        backends = registry.backends(kind)
+        flags = [backend.network for backend in backends]
+        assert flags == sorted(flags) and not flags[0] and flags[-1]
+    assert not registry.get("plantuml", "plantuml-server").available()
@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validation
+from validation import TieredValidator, format_latency, redact_local
+
+
+class FakeGuard:
+    def __init__(self, fix=None, fail=False):
+        self.fix = fix
+        self.fail = fail
+        self.calls = []
+
+    def validate(self, text):
+        self.calls.append(text)
+        if self.fail:
+            raise ValueError("off topic")
+        return type("Outcome", (), {"validated_output": self.fix(text) if self.fix else text})()
+
+
+def test_redact_local_masks_pii_and_blocked_words():
+    text, findings = redact_local(
+        "Contact jane.doe@example.com or +1 555-123-4567. This shit works for 2019-2020 and 3.14."
+    )
+    assert text == "Contact <EMAIL_ADDRESS> or <PHONE_NUMBER>. This [REDACTED] works for 2019-2020 and 3.14."
+    assert [f["type"] for f in findings] == ["EMAIL_ADDRESS", "PHONE_NUMBER", "PROFANITY"]
+
+
+def test_profanity_fix_redacts_only_flagged_sentences():
+    class FakeProfanity:
+        def validate(self, value, metadata):
+            return type("Result", (), {"outcome": "fail" if "darn" in value else "pass"})()
+
+    fix = validation._redact_with(FakeProfanity)
+    text = "The model is fast. This darn cache works!\nResults follow."
+    assert fix(text, None) == "The model is fast. [REDACTED]\nResults follow."
+
+
+def test_topic_guard_only_sees_redacted_text():
+    safety = FakeGuard(fix=lambda t: t.replace("awful", ""))
+    topic = FakeGuard()
+    passed, text, report = TieredValidator(safety, topic).validate("Mail a@b.io, awful design")
+
+    assert passed
+    assert topic.calls == ["Mail <EMAIL_ADDRESS>,  design"]
+    assert text == topic.calls[0]
+    assert len(report["redactions"]) == 2
+    assert set(report["latency"]) == {"local", "safety", "topic"}
+
+
+def test_failed_tier_stops_later_tiers():
+    topic = FakeGuard()
+    passed, _, report = TieredValidator(FakeGuard(fail=True), topic).validate("text")
+    assert not passed
+    assert report["failed_tier"] == "safety"
+    assert topic.calls == []
+
+
+def test_format_latency_lists_each_section():
+    table = format_latency({"abstract": {"attempts": 1, "generation": 1.5,
+                                         "validation": {"local": 0.0, "topic": 0.25}}})
+    assert "abstract" in table.splitlines()[1]
+    assert "topic 0.25s" in table
+
+
+def test_guards_are_built_once_and_shared(monkeypatch):
+    monkeypatch.setattr(validation, "_guards", validation.OrderedDict())
+    monkeypatch.setattr(validation, "MAX_TOPIC_GUARDS", 2)
+    builds = []
+    monkeypatch.setattr(validation, "_build_safety_guard", lambda: builds.append("safety") or FakeGuard())
+    monkeypatch.setattr(validation, "_build_topic_guard", lambda topic: builds.append(topic) or FakeGuard())
+
+    validators = []
+    threads = [threading.Thread(target=lambda: validators.append(validation.get_validator("Paper A")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert builds == ["safety", "Paper A"]
+    assert len({id(v.safety_guard) for v in validators}) == 1
+    assert len({id(v.topic_guard) for v in validators}) == 1
+
+    validation.get_topic_guard("Paper B")
+    validation.get_topic_guard("Paper C")
+    validation.get_topic_guard("Paper A ")
+    assert builds == ["safety", "Paper A", "Paper B", "Paper C", "Paper A"]
+    assert ("safety",) in validation._guards
@@ -0,0 +1,190 @@
+"""
+Tiered Validation for Generated Paper Sections
+
+Validates generated text from the cheapest check to the most expensive one:
+local regex and word-list checks first, then the model-based safety guard, and
+the LLM-backed topic guard last, only for text that passed everything else.
+Offending spans are redacted instead of regenerating the whole section.
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+# Local equivalents of the DetectPII entities used by the safety guard
+PII_PATTERNS = {
+    "EMAIL_ADDRESS": re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'),
+    "PHONE_NUMBER": re.compile(r'(?:\+\d{1,3}[\s.-]?)?(?:\(\d{2,4}\)\s?|\b\d{3}[.-])\d{3,4}[.-]\d{4}\b'),
+}
+
+BLOCKED_WORDS = [
+    "fuck", "fucking", "shit", "bullshit", "bitch", "bastard", "asshole", "cunt", "motherfucker", "wanker",
+]
+BLOCKED_WORDS_PATTERN = re.compile(r'\b(?:' + '|'.join(map(re.escape, BLOCKED_WORDS)) + r')s?\b', re.IGNORECASE)
+
+
+def redact_local(text: str) -> Tuple[str, List[Dict]]:
+    """
+    Redact PII and blocked words found by local regex and word-list checks.
+
+    Args:
+        text: Generated text.
+
+    Returns:
+        Tuple of the redacted text and one {"type", "span"} finding per redaction.
+    """
+    findings = []
+
+    def replace(kind: str, replacement: str):
+        def _sub(match):
+            findings.append({"type": kind, "span": match.group(0)})
+            return replacement
+        return _sub
+
+    for entity, pattern in PII_PATTERNS.items():
+        text = pattern.sub(replace(entity, f"<{entity}>"), text)
+    text = BLOCKED_WORDS_PATTERN.sub(replace("PROFANITY", "[REDACTED]"), text)
+    return text, findings
+
+
+def redact_flagged_sentences(text: str, is_flagged: Callable[[str], bool]) -> str:
+    """Replace every sentence is_flagged returns True for with [REDACTED], keeping the rest."""
+    parts = re.split(r'(?<=[.!?])(\s+)', text)
+    return "".join("[REDACTED]" if part.strip() and is_flagged(part) else part for part in parts)
+
+
+def _redact_with(get_validator: Callable[[], Any]) -> Callable[[str, Any], str]:
+    """
+    Return an on_fail handler that redacts only the sentences the validator flags.
+
+    Validators such as ProfanityFree check the whole text and say nothing about where
+    the problem is, so the handler re-checks each sentence with the same validator.
+    """
+    def fix(value: str, fail_result: Any) -> str:
+        validator = get_validator()
+        return redact_flagged_sentences(
+            value, lambda sentence: getattr(validator.validate(sentence, {}), "outcome", None) == "fail"
+        )
+    return fix
+
+
+class TieredValidator:
+    """
+    Runs local checks, the safety guard and the topic guard in order of cost.
+
+    The safety guard is expected to repair text itself (validators with on_fail="fix"),
+    so its validated output replaces the text. Only an exception from a guard fails
+    the validation; the caller then decides whether to regenerate.
+    """
+
+    def __init__(self, safety_guard=None, topic_guard=None):
+        self.safety_guard = safety_guard
+        self.topic_guard = topic_guard
+
+    def validate(self, text: str) -> Tuple[bool, str, Dict]:
+        """
+        Validate and repair one section.
+
+        Args:
+            text: Generated text.
+
+        Returns:
+            Tuple of whether the text passed, the (possibly redacted) text, and a report
+            with the findings, the tier that failed (if any) and per-tier latency.
+        """
+        report = {"redactions": [], "failed_tier": None, "error": None, "latency": {}}
+
+        start = time.perf_counter()
+        text, report["redactions"] = redact_local(text)
+        report["latency"]["local"] = time.perf_counter() - start
+
+        for tier, guard in (("safety", self.safety_guard), ("topic", self.topic_guard)):
+            if guard is None:
+                continue
+            start = time.perf_counter()
+            try:
+                outcome = guard.validate(text)
+                validated = getattr(outcome, "validated_output", None)
+                if isinstance(validated, str) and validated != text:
+                    report["redactions"].append({"type": tier, "span": None})
+                    text = validated
+            except Exception as e:
+                report["failed_tier"], report["error"] = tier, str(e)
+                return False, text, report
+            finally:
+                report["latency"][tier] = time.perf_counter() - start
+
+        return True, text, report
+
+
+# Guards are shared by every PaperGenerator in the process: the safety validators load
+# their models once, and one topic guard is kept per paper topic
+MAX_TOPIC_GUARDS = 32
+
+_guards: "OrderedDict[Hashable, Any]" = OrderedDict()
+_guards_lock = threading.Lock()
+
+
+def _get_guard(key: Hashable, build: Callable[[], Any]) -> Any:
+    """Return the registered guard for key, building it on first use."""
+    with _guards_lock:
+        guard = _guards.get(key)
+        if guard is None:
+            guard = _guards[key] = build()
+        _guards.move_to_end(key)
+        topic_keys = [k for k in _guards if k[0] == "topic"]
+        for old_key in topic_keys[:-MAX_TOPIC_GUARDS]:
+            del _guards[old_key]
+        return guard
+
+
+def _build_safety_guard():
+    from guardrails import Guard
+    from guardrails.hub import ToxicLanguage, ProfanityFree, DetectPII
+
+    # Safety validators repair text in place (drop toxic sentences, redact profane ones,
+    # anonymize PII) instead of failing, so a flagged word never costs a regeneration
+    profanity = ProfanityFree(on_fail=_redact_with(lambda: profanity))
+    return Guard().use_many(
+        ToxicLanguage(validation_method="sentence", on_fail="fix", threshold=0.5),
+        profanity,
+        DetectPII(["EMAIL_ADDRESS", "PHONE_NUMBER"], "fix"),
+    )
+
+
+def _build_topic_guard(topic: str):
+    from guardrails import Guard
+    from guardrails.hub import RestrictToTopic
+
+    return Guard().use(
+        RestrictToTopic(valid_topics=[topic], disable_classifier=True, disable_llm=False, on_fail="exception")
+    )
+
+
+def get_safety_guard():
+    """Return the process-wide safety guard (toxicity, profanity, PII), loading it on first use."""
+    return _get_guard(("safety",), _build_safety_guard)
+
+
+def get_topic_guard(topic: str):
+    """Return the process-wide RestrictToTopic guard for a paper topic, building it on first use."""
+    topic = topic.strip()
+    return _get_guard(("topic", topic), lambda: _build_topic_guard(topic))
+
+
+def get_validator(topic: str) -> TieredValidator:
+    """Return a TieredValidator backed by the shared guards for a paper topic."""
+    return TieredValidator(get_safety_guard(), get_topic_guard(topic))
+
+
+def format_latency(timings: Dict[str, Dict]) -> str:
+    """Format per-section generation and validation latency as an aligned table."""
+    lines = [f"{'section':<14}{'attempts':>9}{'generate':>10}{'validate':>10}  breakdown"]
+    for section, timing in timings.items():
+        validation = timing["validation"]
+        breakdown = ", ".join(f"{tier} {seconds:.2f}s" for tier, seconds in validation.items())
+        lines.append(f"{section:<14}{timing['attempts']:>9}{timing['generation']:>9.2f}s"
+                     f"{sum(validation.values()):>9.2f}s  {breakdown}")
+    return "\n".join(lines)